@@ -1,8 +1,9 @@
-from typing import List
+from typing import Any, Dict, List, Optional, Tuple, Type
 
 from netqasm.lang import instr as ins
 from netqasm.logging.output import InstrLogger as NQInstrLogger
 from netqasm.logging.output import QubitGroups, QubitState
+from netqasm.util.yaml import dump_yaml
 from netsquid.qubits import qubitapi as qapi
 from netsquid.qubits.qubit import Qubit
 
@@ -10,11 +11,65 @@ from squidasm.sim.glob import QubitInfo, get_running_backend
 
 
 class InstrLogger(NQInstrLogger):
-    @classmethod
-    def _get_qubit_groups(cls) -> QubitGroups:
+    # Whether an instruction type starts (True) or stops (False) using its qubits,
+    # or None if it does neither.
+    _QUBIT_UPDATES: Dict[Type[ins.NetQASMInstruction], Optional[bool]] = {}
+
+    def __init__(self, filepath: str, executor) -> None:
+        super().__init__(filepath, executor)
+        # Qubit groups (QGR) are captured for every `_capture_every`-th logged qubit
+        # instruction, and for every instruction of the types in `_capture_at`.
+        self._capture_every: int = 1
+        self._capture_at: Tuple[Type[ins.NetQASMInstruction], ...] = ()
+        self._num_qubit_instrs = 0
+        self._current_instr: Optional[ins.NetQASMInstruction] = None
+
+    def set_state_capture(
+        self,
+        every: int = 1,
+        at_instructions: Tuple[Type[ins.NetQASMInstruction], ...] = (),
+    ) -> None:
+        """Set for which logged instructions the qubit groups and states are
+        captured. Capturing them for every instruction makes logged runs much
+        slower than unlogged ones. Other instructions are logged without qubit
+        groups. This only applies to this logger, i.e. to the node it logs for.
+
+        :param every: capture the states for every `every`-th logged qubit
+            instruction, or for none of them if 0
+        :param at_instructions: also capture the states for instructions of these
+            types, e.g. `(MeasInstruction,)`
+        """
+        if every < 0:
+            raise ValueError(f"every must be non-negative, got {every}")
+        self._capture_every = every
+        self._capture_at = tuple(at_instructions)
+
+    def _construct_entry(self, *args, **kwargs):
+        self._current_instr = kwargs["command"]
+        return super()._construct_entry(*args, **kwargs)
+
+    def _get_qubit_groups(self) -> Optional[QubitGroups]:
         # """Returns the current qubit groups in the simulation (qubits which have interacted
         # and therefore may or may not be entangled)"""
-        return QubitInfo.get_qubit_groups()
+        # Only called for qubit instructions that are logged.
+        self._num_qubit_instrs += 1
+        if isinstance(self._current_instr, self._capture_at) or (
+            self._capture_every > 0
+            and (self._num_qubit_instrs - 1) % self._capture_every == 0
+        ):
+            # States are converted to lists when the log is saved.
+            return QubitInfo.get_qubit_groups(as_arrays=True)
+        return None
+
+    def save(self) -> None:
+        for entry in self._storage:
+            groups: Optional[Dict[Any, Dict[str, Any]]] = entry.get("QGR")
+            if groups is None:
+                continue
+            for group in groups.values():
+                if hasattr(group.get("state"), "tolist"):
+                    group["state"] = group["state"].tolist()
+        dump_yaml(self._storage, self._filepath)
 
     @classmethod
     def _get_qubit_in_mem(
@@ -62,19 +117,27 @@ class InstrLogger(NQInstrLogger):
         instr: ins.NetQASMInstruction,
         qubit_ids: List[int],
     ) -> None:
-        add_qubit_instrs = [
-            ins.core.InitInstruction,
-            ins.core.CreateEPRInstruction,
-            ins.core.RecvEPRInstruction,
-        ]
-        remove_qubit_instrs = [
-            ins.core.QFreeInstruction,
-            ins.core.MeasInstruction,
-        ]
+        instr_type = type(instr)
+        if instr_type not in self._QUBIT_UPDATES:
+            if isinstance(
+                instr,
+                (
+                    ins.core.InitInstruction,
+                    ins.core.CreateEPRInstruction,
+                    ins.core.RecvEPRInstruction,
+                ),
+            ):
+                self._QUBIT_UPDATES[instr_type] = True
+            elif isinstance(
+                instr, (ins.core.QFreeInstruction, ins.core.MeasInstruction)
+            ):
+                self._QUBIT_UPDATES[instr_type] = False
+            else:
+                self._QUBIT_UPDATES[instr_type] = None
+
+        used = self._QUBIT_UPDATES[instr_type]
+        if used is None:
+            return
         node_name = self._get_node_name()
-        if any(isinstance(instr, cmd_cls) for cmd_cls in add_qubit_instrs):
-            for qubit_id in qubit_ids:
-                QubitInfo.update_qubits_used(node_name, qubit_id, True)
-        elif any(isinstance(instr, cmd_cls) for cmd_cls in remove_qubit_instrs):
-            for qubit_id in qubit_ids:
-                QubitInfo.update_qubits_used(node_name, qubit_id, False)
+        for qubit_id in qubit_ids:
+            QubitInfo.update_qubits_used(node_name, qubit_id, used)
@@ -1,6 +1,18 @@
-import random
+import heapq
+from collections import deque
 from queue import Empty
-from typing import Any, Callable, Generator, List, Optional, Type, Union
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Generator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
 
 from netqasm.backend.executor import Executor
 from netqasm.backend.messages import Message, MessageType, Signal, SignalMessage
@@ -34,6 +46,45 @@ def is_waiting_event(event: Union[EventType, EventExpression]) -> bool:
     return tp.name in _WAIT_EVENT_NAMES
 
 
+# Scheduled for an idle subroutine handler when a message arrived in its queue.
+_MESSAGE_ARRIVED: EventType = EventType("MESSAGE_ARRIVED", "New message in queue")
+
+
+class IdleHandlers:
+    """Keeps track of which subroutine handlers of a simulation are idle, i.e.
+    have no tasks and wait for a message from their host.
+
+    Messages are put in the queues by application threads, which cannot schedule
+    simulation events themselves. Instead, handlers that are busy wake up the idle
+    handlers that got a message, each time they continue with a task. When all
+    handlers are idle, nothing can happen in the simulation until a message is
+    put, so the simulator thread blocks until that happens.
+    """
+
+    def __init__(self) -> None:
+        self._running: Set["SubroutineHandler"] = set()
+        self._idle: Set["SubroutineHandler"] = set()
+
+    def add(self, handler: "SubroutineHandler") -> None:
+        self._running.add(handler)
+
+    def wait_for_message(
+        self, handler: "SubroutineHandler"
+    ) -> Generator[EventExpression, None, None]:
+        """Wait until a message arrives in the queue of an idle handler."""
+        self._idle.add(handler)
+        if self._idle == self._running:
+            QueueManager.wait_for_item(h.message_queue for h in self._idle)
+            self.wake_up()
+        yield EventExpression(source=handler, event_type=_MESSAGE_ARRIVED)
+
+    def wake_up(self) -> None:
+        """Wake up the idle handlers that have a message in their queue."""
+        for handler in [h for h in self._idle if not h.message_queue.empty()]:
+            self._idle.remove(handler)
+            handler._schedule_now(_MESSAGE_ARRIVED)
+
+
 class Task:
     """Keeps track of a task qnodeos has and if it's finished or waiting."""
 
@@ -90,8 +141,14 @@ class SubroutineHandler(QNodeController, NodeProtocol):
         flavour: Optional[Flavour] = None,
         instr_proc_time: int = 0,
         host_latency: int = 0,
+        idle_handlers: Optional[IdleHandlers] = None,
     ):
-        """An extremely simplified version of QNodeOS for handling NetQASM subroutines"""
+        """An extremely simplified version of QNodeOS for handling NetQASM subroutines
+
+        :param idle_handlers: if given, the handler waits for an event when it has
+            no tasks, instead of polling its message queue every sleeper tick.
+            All handlers of a simulation must share the same `IdleHandlers`.
+        """
         QNodeController.__init__(
             self,
             name=node.name,
@@ -106,10 +163,16 @@ class SubroutineHandler(QNodeController, NodeProtocol):
         self._message_queue: TaskQueue = QueueManager.create_queue(self.node.name)
 
         # Keep track of tasks to execute
-        self._subroutine_tasks: List[Task] = []
-        self._other_tasks: List[Task] = []
+        # Subroutine tasks are kept with their arrival number. Tasks that are not
+        # waiting are executed in order of arrival; if all tasks are waiting, they
+        # take turns.
+        self._num_subroutine_tasks: int = 0
+        self._ready_subroutine_tasks: List[Tuple[int, Task]] = []  # heap
+        self._waiting_subroutine_tasks: Deque[Tuple[int, Task]] = deque()
+        self._other_tasks: Deque[Task] = deque()
 
         self._sleeper: Sleeper = Sleeper()
+        self._idle_handlers: Optional[IdleHandlers] = idle_handlers
 
     @classmethod
     def _get_executor_class(cls, flavour: Optional[Flavour] = None) -> Type[Executor]:
@@ -120,6 +183,10 @@ class SubroutineHandler(QNodeController, NodeProtocol):
         else:
             raise ValueError(f"Flavour {flavour} is not supported.")
 
+    @property
+    def message_queue(self) -> TaskQueue:
+        return self._message_queue
+
     @property
     def has_active_apps(self) -> bool:
         return len(self._active_app_ids) > 0
@@ -136,6 +203,8 @@ class SubroutineHandler(QNodeController, NodeProtocol):
         return self._executor._handle_epr_response  # type: ignore
 
     def run(self) -> Generator[EventExpression, None, None]:
+        if self._idle_handlers is not None:
+            self._idle_handlers.add(self)
         while self.is_running:
             # print("running")
             # Check if there is a new message
@@ -146,10 +215,15 @@ class SubroutineHandler(QNodeController, NodeProtocol):
                 self._handle_message(msg=msg)
             ev = self._get_next_task_event()
             if ev is None:
-                # No tasks so wait a bit before checking next msg
-                self._logger.debug("No more events so wait for next message")
-                yield self._sleeper.sleep()
+                if self._idle_handlers is None:
+                    # No tasks so wait a bit before checking next msg
+                    self._logger.debug("No more events so wait for next message")
+                    yield self._sleeper.sleep()
+                elif not self._has_tasks() and self._message_queue.empty():
+                    yield from self._idle_handlers.wait_for_message(self)
             else:
+                if self._idle_handlers is not None:
+                    self._idle_handlers.wake_up()
                 yield ev
 
     def _handle_message(self, msg: Message) -> None:
@@ -160,7 +234,11 @@ class SubroutineHandler(QNodeController, NodeProtocol):
             # Distinguish subroutines from others to prioritize others
             if msg.TYPE == MessageType.SUBROUTINE:
                 self._logger.debug("Adding to subroutine tasks")
-                self._subroutine_tasks.append(Task(gen=output, msg=msg))
+                heapq.heappush(
+                    self._ready_subroutine_tasks,
+                    (self._num_subroutine_tasks, Task(gen=output, msg=msg)),
+                )
+                self._num_subroutine_tasks += 1
             else:
                 self._logger.debug("Adding to other tasks")
                 self._other_tasks.append(Task(gen=output, msg=msg))
@@ -179,16 +257,14 @@ class SubroutineHandler(QNodeController, NodeProtocol):
                 return None
         # Only subroutine handlers left
         # Execute in order unless a subroutine is waiting
-        # self._logger.debug('Executing subroutine task')
-        task = self._get_next_subroutine_task()
-        if task is None:
-            self._logger.debug("No more subroutine tasks")
-            return None
-        else:
-            try:
-                return task.pop_next_event()
-            except IndexError:
-                return None
+        return self._get_next_subroutine_event()
+
+    def _has_tasks(self) -> bool:
+        return (
+            len(self._other_tasks) > 0
+            or len(self._ready_subroutine_tasks) > 0
+            or len(self._waiting_subroutine_tasks) > 0
+        )
 
     def _mark_message_finished(self, msg: Message) -> None:
         # `msg` is here just for prettier log
@@ -201,28 +277,35 @@ class SubroutineHandler(QNodeController, NodeProtocol):
             return None
         task = self._other_tasks[0]
         if task.is_finished:
-            self._other_tasks.pop(0)
+            self._other_tasks.popleft()
             self._mark_message_finished(msg=task.msg)
             return self._get_next_other_task()
         return task
 
-    def _get_next_subroutine_task(self) -> Optional[Task]:
-        # Check for finished tasks
-        to_remove = []
-        for i, task in enumerate(self._subroutine_tasks):
-            if task.is_finished:
-                to_remove.append(i)
+    def _get_next_subroutine_event(self) -> Optional[EventExpression]:
+        """Get the next event of the first subroutine task (in order of arrival)
+        that is not waiting. If all tasks are waiting, they take turns in
+        round-robin order. Finished tasks are marked as such and removed."""
+        while (
+            len(self._ready_subroutine_tasks) > 0
+            or len(self._waiting_subroutine_tasks) > 0
+        ):
+            if len(self._ready_subroutine_tasks) > 0:
+                number, task = heapq.heappop(self._ready_subroutine_tasks)
+            else:
+                number, task = self._waiting_subroutine_tasks.popleft()
+            try:
+                event = task.pop_next_event()
+            except IndexError:
                 self._mark_message_finished(msg=task.msg)
-        for i in reversed(to_remove):
-            self._subroutine_tasks.pop(i)
-        if len(self._subroutine_tasks) == 0:
-            return None
-        for i, task in enumerate(self._subroutine_tasks):
-            if not task.is_waiting:
-                return task
-        # All tasks are waiting so return first
-        # self._logger.info('All subroutines are waiting')
-        return random.choice(self._subroutine_tasks)
+                continue
+            if task.is_waiting:
+                self._waiting_subroutine_tasks.append((number, task))
+            else:
+                heapq.heappush(self._ready_subroutine_tasks, (number, task))
+            return event
+        self._logger.debug("No more subroutine tasks")
+        return None
 
     def _next_message(self) -> Optional[bytes]:
         item: Optional[bytes]
@@ -0,0 +1,106 @@
+import json
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from netqasm.logging.glob import get_netqasm_logger
+
+_logger = get_netqasm_logger()
+
+
+def _to_json(obj: Any) -> Any:
+    """Convert a result value to a value that `json` can serialize as is.
+
+    numpy values are converted to the corresponding Python values. Other values
+    that JSON cannot represent, like sets, bytes or custom objects, and dictionary
+    keys that are not strings, are written as their `repr`, with a warning, so
+    that a result that cannot be serialized exactly does not stop a simulation.
+    """
+    if obj is None or isinstance(obj, (str, bool, int, float)):
+        return obj
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (list, tuple)):
+        return [_to_json(v) for v in obj]
+    if isinstance(obj, dict):
+        converted = {}
+        for key, value in obj.items():
+            if not isinstance(key, str):
+                _logger.warning(
+                    f"Results key {key!r} of type {type(key).__name__} is written "
+                    f"as a string"
+                )
+                key = repr(key)
+            converted[key] = _to_json(value)
+        return converted
+    _logger.warning(
+        f"Results value of type {type(obj).__name__} is not JSON serializable and "
+        f"is written as its repr"
+    )
+    return repr(obj)
+
+
+def _index_path(path: str) -> str:
+    return f"{path}.index.json"
+
+
+class ResultsWriter:
+    """Writes the results of the rounds of a simulation to a JSON Lines file, one
+    line per round, as soon as a round has finished.
+
+    Earlier rounds are never rewritten. When the writer is closed, an index with
+    the byte offset of each round is written next to the file, so that single
+    rounds can be read back with `read_round` without parsing the whole file.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        :param path: location of the results file. Overwrites an existing file.
+        """
+        self._path = path
+        self._file = open(path, "wb")
+        self._offsets: List[int] = []
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def num_rounds(self) -> int:
+        return len(self._offsets)
+
+    def write(self, result: Dict[str, Any]) -> None:
+        """Append the results of a round and flush them to the file."""
+        line = json.dumps(_to_json(result)) + "\n"
+        self._offsets.append(self._file.tell())
+        self._file.write(line.encode())
+        self._file.flush()
+
+    def close(self) -> None:
+        """Close the results file and write its index."""
+        if self._file.closed:
+            return
+        self._file.close()
+        with open(_index_path(self._path), "w") as f:
+            json.dump({"num_rounds": self.num_rounds, "offsets": self._offsets}, f)
+
+    @staticmethod
+    def read(path: str) -> List[Dict[str, Any]]:
+        """Read the results of all rounds from a results file."""
+        with open(path, "rb") as f:
+            return [json.loads(line) for line in f]
+
+    @staticmethod
+    def read_round(path: str, index: int) -> Optional[Dict[str, Any]]:
+        """Read the results of a single round, using the index of the file.
+
+        :return: the results, or None if the file has no round `index`
+        """
+        with open(_index_path(path)) as f:
+            offsets = json.load(f)["offsets"]
+        if not 0 <= index < len(offsets):
+            return None
+        with open(path, "rb") as f:
+            f.seek(offsets[index])
+            return json.loads(f.readline())
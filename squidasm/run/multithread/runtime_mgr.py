@@ -16,7 +16,7 @@ from netqasm.sdk.shared_memory import SharedMemoryManager
 from netsquid.nodes.node import Node as NetSquidNode
 
 from squidasm.nqasm.netstack import NetworkStack
-from squidasm.nqasm.qnodeos import SubroutineHandler
+from squidasm.nqasm.qnodeos import IdleHandlers, SubroutineHandler
 from squidasm.sim.glob import pop_current_backend, put_current_backend
 from squidasm.sim.network import reset_network
 from squidasm.sim.network.network import NetSquidNetwork
@@ -39,6 +39,9 @@ class SquidAsmRuntimeManager(RuntimeManager):
         self._party_map: Dict[str, NetSquidNode] = dict()
         self._backend_thread = None
         self._backend_log_dir: Optional[str] = None
+        # Worker threads for the programs, reused by every call of `run_app`.
+        self._program_pool: Optional[ThreadPool] = None
+        self._program_pool_size: int = 0
 
         self.reset_backend()
 
@@ -134,6 +137,8 @@ class SquidAsmRuntimeManager(RuntimeManager):
         t.start()
 
     def stop_backend(self):
+        # The simulator thread may be blocked waiting for a message.
+        QueueManager.interrupt_wait()
         for subroutine_handler in self._subroutine_handlers.values():
             subroutine_handler.stop()
         self._backend_thread.join()
@@ -143,6 +148,31 @@ class SquidAsmRuntimeManager(RuntimeManager):
         reset_network()
         reset_socket_hub()
         reset_struct_loggers()
+        self._close_program_pool()
+
+    def _get_program_pool(self, num_programs: int) -> ThreadPool:
+        """Get the pool of worker threads for the programs, which is created the
+        first time and grown if an application has more programs than before."""
+        if self._program_pool is None or self._program_pool_size < num_programs:
+            self._close_program_pool()
+            self._program_pool = ThreadPool(num_programs)
+            self._program_pool_size = num_programs
+        return self._program_pool
+
+    def _close_program_pool(self) -> None:
+        if self._program_pool is not None:
+            self._program_pool.close()
+            self._program_pool.join()
+            self._program_pool = None
+            self._program_pool_size = 0
+
+    def _reset_round(self, save_loggers: bool) -> None:
+        """Reset the state that belongs to a single run of an application."""
+        if save_loggers:
+            save_all_struct_loggers()
+        reset_struct_loggers()
+        reset_socket_hub()
+        ThreadSocket._COMM_LOGGERS = {}
 
     def reset_backend(self, save_loggers=False):
         if save_loggers:
@@ -178,7 +208,8 @@ class SquidAsmRuntimeManager(RuntimeManager):
         for party, node_name in app_instance.party_alloc.items():
             self._party_map[party] = self.network.get_node(node_name)
 
-        with ThreadPool(len(programs) + 1) as executor:
+        executor = self._get_program_pool(len(programs))
+        try:
             # Start the program threads
             program_futures = []
             for program in programs:
@@ -202,19 +233,23 @@ class SquidAsmRuntimeManager(RuntimeManager):
             results = {}
             for future, name in as_completed(program_futures, names=names):
                 results[name] = future.get()
+        except BaseException:
+            # Programs of this run may still be running, so the pool cannot be
+            # reused.
+            executor.terminate()
+            self._program_pool = None
+            self._program_pool_size = 0
+            raise
 
-            if save_loggers:
-                save_all_struct_loggers()
-            reset_struct_loggers()
-            reset_socket_hub()
-            ThreadSocket._COMM_LOGGERS = {}
+        self._reset_round(save_loggers)
 
-            return results
+        return results
 
     def _create_subroutine_handlers(self):
         self._subroutine_handlers: Dict[str, SubroutineHandler] = dict()
 
         ll_services = self.network.link_layer_services
+        idle_handlers = IdleHandlers()
 
         # Create subroutine handlers for each node in the network.
         for node in self.network.nodes.values():
@@ -232,6 +267,7 @@ class SquidAsmRuntimeManager(RuntimeManager):
                 flavour=flavour,
                 instr_proc_time=self.network.instr_proc_time,
                 host_latency=self.network.host_latency,
+                idle_handlers=idle_handlers,
             )
             subroutine_handler.network_stack = self.__class__._NETWORK_STACK_CLASS(
                 node=node, link_layer_services=ll_services[node.name]
@@ -14,6 +14,7 @@ from netqasm.sdk.shared_memory import SharedMemoryManager
 from netqasm.util.yaml import dump_yaml
 from netsquid import QFormalism
 
+from squidasm.run.multithread.results import ResultsWriter
 from squidasm.run.multithread.runtime_mgr import SquidAsmRuntimeManager
 from squidasm.sim.network.nv_config import NVConfig, parse_nv_config
 
@@ -44,6 +45,7 @@ def simulate_application(
     post_function: Optional[Callable] = None,
     enable_logging: bool = True,
     hardware: str = "generic",
+    write_yaml: bool = True,
 ) -> List[Dict[str, Any]]:
     mgr = SquidAsmRuntimeManager()
     mgr.netsquid_formalism = _NS_FORMALISMS[formalism]
@@ -71,30 +73,51 @@ def simulate_application(
             os.mkdir(log_dir)
 
     timed_log_dir: Optional[str] = None
+    # Results of each round are appended to `results.jsonl` in the log directory
+    # as soon as the round has finished. If `write_yaml`, the results of all
+    # rounds so far are also written to `results.yaml` in each log directory, once
+    # the last round in that directory has finished.
+    results_writer: Optional[ResultsWriter] = None
+
+    def close_log_dir() -> None:
+        if results_writer is None:
+            return
+        results_writer.close()
+        if write_yaml:
+            assert timed_log_dir is not None
+            path = os.path.join(timed_log_dir, "results.yaml")
+            dump_yaml(data=results, file_path=path)
 
     mgr.start_backend()
 
     results = []
 
-    for _ in range(num_rounds):
-        if enable_logging:
-            assert log_cfg is not None
-            if log_cfg.split_runs or timed_log_dir is None:
-                # create new timed directory for next run or for first run
-                timed_log_dir = env.get_timed_log_dir(log_dir)
-
-            mgr.backend_log_dir = timed_log_dir
-            app_instance.logging_cfg.log_subroutines_dir = timed_log_dir
-            app_instance.logging_cfg.comm_log_dir = timed_log_dir
-        result = mgr.run_app(app_instance, use_app_config=use_app_config)
-        results.append(result)
-
-        if enable_logging:
-            assert timed_log_dir is not None
-            path = os.path.join(timed_log_dir, "results.yaml")
-            dump_yaml(data=results, file_path=path)
-
-        SharedMemoryManager.reset_memories()
+    # Close the results files also if a round fails, so that the results of the
+    # earlier rounds can be read back.
+    try:
+        for _ in range(num_rounds):
+            if enable_logging:
+                assert log_cfg is not None
+                if log_cfg.split_runs or timed_log_dir is None:
+                    # create new timed directory for next run or for first run
+                    close_log_dir()
+                    timed_log_dir = env.get_timed_log_dir(log_dir)
+                    results_writer = ResultsWriter(
+                        os.path.join(timed_log_dir, "results.jsonl")
+                    )
+
+                mgr.backend_log_dir = timed_log_dir
+                app_instance.logging_cfg.log_subroutines_dir = timed_log_dir
+                app_instance.logging_cfg.comm_log_dir = timed_log_dir
+            result = mgr.run_app(app_instance, use_app_config=use_app_config)
+            results.append(result)
+
+            if results_writer is not None:
+                results_writer.write(result)
+
+            SharedMemoryManager.reset_memories()
+    finally:
+        close_log_dir()
 
     if post_function is not None:
         post_function(mgr)
@@ -27,6 +27,41 @@ class StackConfig(YamlLoadable):
     """Type of the quantum device."""
     qdevice_cfg: Any = None
     """Configuration of the quantum device, allowed configuration depends on type."""
+    max_pipelined_pairs: Optional[int] = 1
+    """Maximum number of pairs of a create-and-keep request that the network stack
+    generates concurrently. None means as many as there are free communication
+    qubits."""
+    md_result_chunk_size: int = 1
+    """Number of pairs of a measure-directly request after which the network stack
+    notifies the processor that results were written."""
+    pair_pool_size: int = 0
+    """Number of pre-generated pairs that the network stack keeps with each remote
+    node, 0 to disable the pair pool. Must be smaller than the number of
+    communication qubits."""
+    scoreboarding: bool = False
+    """Whether the processor lets instructions proceed past a wait_all as long as
+    they do not use pending entanglement results, instead of blocking on the
+    wait_all."""
+    parallel_gates: bool = False
+    """Whether the processor executes gates on disjoint qubits in parallel. Only
+    used for generic quantum devices."""
+    nv_qubit_placement: bool = False
+    """Whether the processor places a qubit on the electron instead of a carbon if
+    that avoids moving it for a measurement. Only used for NV quantum devices."""
+    direct_channels: bool = False
+    """Whether the Host, Handler, Processor and Netstack of the stack exchange
+    messages over direct in-process channels instead of NetSquid ports."""
+    instr_proc_time: float = 0
+    """Time (ns) it takes the processor to process a single instruction."""
+    host_latency: float = 0
+    """Time (ns) it takes to deliver a message between the Host and QNodeOS, in
+    either direction."""
+    netstack_latency: float = 0
+    """Time (ns) it takes the network stack to take in a request from the
+    processor."""
+    session_mode: bool = False
+    """Whether the network stack skips the handshake with a remote node for create
+    requests after the first one. Cannot be combined with a pair pool."""
 
     @classmethod
     def from_file(cls, path: str) -> StackConfig:
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import itertools
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Optional, Union
 
 import netsquid as ns
 from netsquid_driver.classical_socket_service import (
@@ -13,9 +13,15 @@ from netsquid_magic.link_layer import MagicLinkLayerProtocol
 from netsquid_netbuilder.network_config import NetworkConfig
 
 from squidasm.run.stack.build import create_stack_network_builder
-from squidasm.run.stack.config import StackNetworkConfig, _convert_stack_network_config
+from squidasm.run.stack.config import (
+    StackConfig,
+    StackNetworkConfig,
+    _convert_stack_network_config,
+)
 from squidasm.sim.stack.context import NetSquidContext
 from squidasm.sim.stack.globals import GlobalSimData
+from squidasm.sim.stack.metrics import MetricsCollector
+from squidasm.sim.stack.processor import GenericProcessor, NVProcessor
 from squidasm.sim.stack.program import Program
 from squidasm.sim.stack.qnos_network_service import QNOSNetworkService
 from squidasm.sim.stack.stack import NodeStack, StackNetwork, StackNode
@@ -80,6 +86,40 @@ def _setup_network(config: NetworkConfig) -> StackNetwork:
     return StackNetwork(stacks, link_prots, csockets)
 
 
+def _configure_stacks(network: StackNetwork, stack_configs: List[StackConfig]) -> None:
+    """Apply the stack-specific settings of a configuration to the stacks of a
+    network that has already been set up.
+
+    :param network: `StackNetwork` with a `NodeStack` for every stack configuration
+    :param stack_configs: configurations of the stacks in the network
+    """
+    uses_pair_pool = any(cfg.pair_pool_size > 0 for cfg in stack_configs)
+    uses_session_mode = any(cfg.session_mode for cfg in stack_configs)
+    if uses_pair_pool and uses_session_mode:
+        raise ValueError("Pair pools cannot be combined with session mode")
+
+    for stack_config in stack_configs:
+        stack = network.stacks[stack_config.name]
+        if stack_config.direct_channels:
+            stack.use_direct_channels()
+        netstack = stack.qnos.netstack
+        netstack.max_pipelined_pairs = stack_config.max_pipelined_pairs
+        netstack.md_result_chunk_size = stack_config.md_result_chunk_size
+        netstack.session_mode = stack_config.session_mode
+        stack.qnos.processor.scoreboarding = stack_config.scoreboarding
+        stack.qnos.processor.instr_proc_time = stack_config.instr_proc_time
+        stack.host.set_receive_latency("qnos", stack_config.host_latency)
+        stack.qnos.handler.set_receive_latency("host", stack_config.host_latency)
+        netstack.set_receive_latency("processor", stack_config.netstack_latency)
+        if isinstance(stack.qnos.processor, GenericProcessor):
+            stack.qnos.processor.parallel_gates = stack_config.parallel_gates
+        if isinstance(stack.qnos.processor, NVProcessor):
+            stack.qnos.processor.qubit_placement = stack_config.nv_qubit_placement
+        if stack_config.pair_pool_size > 0:
+            for peer_id in netstack.peer_ids:
+                netstack.set_pair_pool_size(peer_id, stack_config.pair_pool_size)
+
+
 def _run(network: StackNetwork) -> List[List[Dict[str, Any]]]:
     """Run the protocols of a network and programs running in that network.
 
@@ -101,18 +141,36 @@ def run(
     config: Union[NetworkConfig, StackNetworkConfig],
     programs: Dict[str, Program],
     num_times: int = 1,
+    metrics: Optional[MetricsCollector] = None,
+    metrics_json: Optional[str] = None,
+    metrics_csv: Optional[str] = None,
 ) -> List[List[Dict[str, Any]]]:
     """Run programs on a network specified by a network configuration.
 
     :param config: configuration of the network
     :param programs: dictionary of node names to programs
     :param num_times: numbers of times to run the programs, defaults to 1
+    :param metrics: collector for entanglement generation metrics of all network
+        stacks. Defaults to None, in which case no metrics are collected, unless
+        a path to export them to is given
+    :param metrics_json: path of a JSON file to write the metrics to after the
+        last iteration, see `MetricsCollector.export_json`. Defaults to None
+    :param metrics_csv: path of a CSV file to write the metrics to after the
+        last iteration, see `MetricsCollector.export_csv`. Defaults to None
     :return: program results, outer list is per stack, inner list is per program iteration
     """
+    stack_configs: List[StackConfig] = []
     if isinstance(config, StackNetworkConfig):
+        stack_configs = config.stacks
         config = _convert_stack_network_config(config)
 
+    if metrics is None and (metrics_json is not None or metrics_csv is not None):
+        metrics = MetricsCollector()
+
     network = _setup_network(config)
+    _configure_stacks(network, stack_configs)
+    for stack in network.stacks.values():
+        stack.qnos.netstack.metrics = metrics
 
     NetSquidContext.set_nodes({})
     for name, stack in network.stacks.items():
@@ -123,4 +181,9 @@ def run(
         network.stacks[name].host.enqueue_program(program, num_times)
 
     results = _run(network)
+
+    if metrics_json is not None:
+        metrics.export_json(metrics_json)
+    if metrics_csv is not None:
+        metrics.export_csv(metrics_csv)
     return results
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import threading
 from typing import TYPE_CHECKING, Dict, KeysView, List, Optional, Tuple
 
 from netqasm.runtime.interface.logging import QubitGroup
@@ -14,15 +15,26 @@ if TYPE_CHECKING:
     from squidasm.run.multithread.runtime_mgr import SquidAsmRuntimeManager
 
 _CURRENT_BACKEND: List[Optional[SquidAsmRuntimeManager]] = [None]
+# Notified when a backend is put, so that threads waiting for it can wake up.
+_BACKEND_CHANGED = threading.Condition()
 
 
-def get_running_backend(block: bool = True) -> Optional[SquidAsmRuntimeManager]:
-    while True:
-        backend = _CURRENT_BACKEND[0]
-        if backend is not None:
-            return backend
-        if not block:
-            return None
+def get_running_backend(
+    block: bool = True, timeout: Optional[float] = None
+) -> Optional[SquidAsmRuntimeManager]:
+    """Get the backend that is currently running.
+
+    :param block: whether to wait until a backend is running
+    :param timeout: if blocking, the maximum number of seconds to wait, or None to
+        wait indefinitely
+    :return: the running backend, or None if no backend is running (in time)
+    """
+    with _BACKEND_CHANGED:
+        if block:
+            _BACKEND_CHANGED.wait_for(
+                lambda: _CURRENT_BACKEND[0] is not None, timeout=timeout
+            )
+        return _CURRENT_BACKEND[0]
 
 
 def get_current_nodes(block: bool = True) -> Dict[str, NetSquidNode]:
@@ -86,14 +98,17 @@ def get_node_name(node_id: int) -> str:
 
 
 def put_current_backend(backend: SquidAsmRuntimeManager) -> None:
-    if _CURRENT_BACKEND[0] is not None:
-        raise RuntimeError("Already a backend running")
-    else:
-        _CURRENT_BACKEND[0] = backend
+    with _BACKEND_CHANGED:
+        if _CURRENT_BACKEND[0] is not None:
+            raise RuntimeError("Already a backend running")
+        else:
+            _CURRENT_BACKEND[0] = backend
+            _BACKEND_CHANGED.notify_all()
 
 
 def pop_current_backend() -> None:
-    _CURRENT_BACKEND[0] = None
+    with _BACKEND_CHANGED:
+        _CURRENT_BACKEND[0] = None
 
 
 class QubitInfo:
@@ -104,7 +119,12 @@ class QubitInfo:
         cls._qubits_in_use[(node_name, pos)] = used
 
     @classmethod
-    def get_qubit_groups(cls) -> Dict[int, QubitGroup]:
+    def get_qubit_groups(cls, as_arrays: bool = False) -> Dict[int, QubitGroup]:
+        """Get the groups of qubits in use that share a quantum state.
+
+        :param as_arrays: if True, the state of a single-qubit group is returned as
+            the density matrix array instead of a list
+        """
         backend = get_running_backend()
         if backend is None:
             raise RuntimeError("Backend is None")
@@ -136,6 +156,7 @@ class QubitInfo:
                 groups[group_id].is_entangled = is_state_entangled(qubit.qstate)
 
                 if qubit.qstate.num_qubits == 1:
-                    groups[group_id].state = qapi.reduced_dm(qubit).tolist()
+                    state = qapi.reduced_dm(qubit)
+                    groups[group_id].state = state if as_arrays else state.tolist()
 
         return groups
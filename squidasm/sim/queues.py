@@ -1,5 +1,7 @@
+import threading
+from collections import deque
 from queue import Queue
-from typing import Dict, Optional, Set
+from typing import Deque, Dict, Iterable, Optional
 
 
 class TaskQueue:
@@ -7,11 +9,20 @@ class TaskQueue:
 
     def __init__(self) -> None:
         self._queue: Queue = Queue()
-        self._fin_tasks: Set[bytes] = set()
+        # Protects `_fin_tasks` and `_waiters`.
+        self._lock = threading.Lock()
+        # Number of finished tasks that nobody joined yet, per item. The same
+        # message can be put multiple times, so an item can finish multiple times.
+        self._fin_tasks: Dict[bytes, int] = {}
+        # Events of the threads waiting for an item to finish, in the order in
+        # which they started waiting.
+        self._waiters: Dict[bytes, Deque[threading.Event]] = {}
 
     def reset(self) -> None:
         self._queue = Queue()
-        self._fin_tasks = set()
+        with self._lock:
+            self._fin_tasks = {}
+            self._waiters = {}
 
     def qsize(self) -> int:
         return self._queue.qsize()
@@ -30,17 +41,35 @@ class TaskQueue:
     ) -> None:
         # item is raw message
         self._queue.put(item=item, block=block, timeout=timeout)
+        QueueManager.notify_put()
 
     def task_done(self, item: bytes) -> None:
-        self._fin_tasks.add(item)
+        with self._lock:
+            waiters = self._waiters.get(item)
+            if waiters:
+                # Wake up the thread that waits longest for this item.
+                waiters.popleft().set()
+                if len(waiters) == 0:
+                    del self._waiters[item]
+            else:
+                self._fin_tasks[item] = self._fin_tasks.get(item, 0) + 1
         self._queue.task_done()
 
     def join_task(self, item: bytes) -> None:
-        while item not in self._fin_tasks:
-            pass
-        # When the task has finished, remove it to prevent future
-        # messages that are exactly the same to immediately be finished.
-        self._fin_tasks.remove(item)
+        """Block until a task for `item` has finished. Each finished task is joined
+        only once, so that a later message that is exactly the same does not
+        immediately count as finished."""
+        with self._lock:
+            num_finished = self._fin_tasks.get(item, 0)
+            if num_finished > 0:
+                if num_finished == 1:
+                    del self._fin_tasks[item]
+                else:
+                    self._fin_tasks[item] = num_finished - 1
+                return
+            event = threading.Event()
+            self._waiters.setdefault(item, deque()).append(event)
+        event.wait()
 
     def join(self) -> None:
         self._queue.join()
@@ -48,6 +77,35 @@ class TaskQueue:
 
 class QueueManager:
     _QUEUES: Dict[str, TaskQueue] = {}
+    # Notified when an item is put in any queue, or when waiting is interrupted.
+    _ITEM_PUT = threading.Condition()
+    _wait_interrupted = False
+
+    @classmethod
+    def notify_put(cls) -> None:
+        with cls._ITEM_PUT:
+            cls._ITEM_PUT.notify_all()
+
+    @classmethod
+    def wait_for_item(cls, queues: Iterable[TaskQueue]) -> bool:
+        """Block until one of the queues is not empty.
+
+        :return: False if waiting was interrupted by `interrupt_wait`
+        """
+        queues = list(queues)
+        with cls._ITEM_PUT:
+            cls._ITEM_PUT.wait_for(
+                lambda: cls._wait_interrupted or any(not q.empty() for q in queues)
+            )
+            return not cls._wait_interrupted
+
+    @classmethod
+    def interrupt_wait(cls) -> None:
+        """Stop all current and future calls of `wait_for_item` from blocking,
+        until the queues are reset or destroyed."""
+        with cls._ITEM_PUT:
+            cls._wait_interrupted = True
+            cls._ITEM_PUT.notify_all()
 
     @classmethod
     def create_queue(cls, node_name: str) -> TaskQueue:
@@ -68,8 +126,10 @@ class QueueManager:
     def reset_queues(cls) -> None:
         for queue in cls._QUEUES.values():
             queue.reset()
+        cls._wait_interrupted = False
 
     @classmethod
     def destroy_queues(cls) -> None:
         while len(cls._QUEUES) > 0:
             cls._QUEUES.popitem()
+        cls._wait_interrupted = False
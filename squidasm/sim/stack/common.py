@@ -1,6 +1,25 @@
+import atexit
+import copy
+import gzip
 import logging
+import logging.handlers
+import os
+import queue
+import shutil
+from collections import deque
 from dataclasses import dataclass
-from typing import Dict, Generator, List, Optional, Set, Tuple, Union
+from typing import (
+    Any,
+    Deque,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
 import netsquid as ns
 from netqasm.lang import operand
@@ -9,7 +28,8 @@ from netqasm.sdk.shared_memory import Arrays, RegisterGroup, setup_registers
 from netsquid.components.component import Component, Port
 from netsquid.protocols import Protocol
 
-from pydynaa import EventExpression
+from pydynaa import EventExpression, EventHandler, EventType
+from squidasm.sim.stack.trace import Tracer
 
 
 class SimTimeFilter(logging.Filter):
@@ -18,6 +38,75 @@ class SimTimeFilter(logging.Filter):
         return True
 
 
+class _SimTimeQueueHandler(logging.handlers.QueueHandler):
+    """Puts log records on a queue for a `QueueListener`.
+
+    Records are formatted by the handlers of the listener, in its background
+    thread. Everything that may change before then is fixed when the record is
+    emitted: the simulation time is captured by a `SimTimeFilter` added to this
+    handler, and the arguments are merged into the message by `prepare`."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The arguments may be mutable objects of the simulation, which can change
+        # before the listener formats the record.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class _LogFileHandler(logging.handlers.RotatingFileHandler):
+    """Writes log records to a file with a write buffer of `buffer_size` bytes.
+    With `buffered`, the buffer is only written when it is full and when the file
+    is closed, instead of after each record.
+
+    If `max_bytes` is non-zero, the file is rotated when it would grow beyond
+    `max_bytes`, keeping `backup_count` old files. With `compress`, rotated files
+    are compressed with gzip, or the log file itself if it is not rotated."""
+
+    def __init__(
+        self,
+        path: str,
+        buffer_size: int,
+        max_bytes: int,
+        backup_count: int,
+        compress: bool,
+        buffered: bool,
+    ) -> None:
+        self._buffer_size = buffer_size
+        self._buffered = buffered
+        self._compress_file = compress and max_bytes == 0
+        # Overwrite an existing file, also if it is appended to for rotation.
+        open(path, "w").close()
+        super().__init__(path, mode="a", maxBytes=max_bytes, backupCount=backup_count)
+        if compress and max_bytes > 0:
+            self.namer = lambda name: name + ".gz"
+            self.rotator = self._compress_rotated
+
+    def _open(self):
+        if self._compress_file:
+            return gzip.open(self.baseFilename, "wt", encoding=self.encoding)
+        return open(
+            self.baseFilename,
+            self.mode,
+            buffering=self._buffer_size,
+            encoding=self.encoding,
+        )
+
+    def flush(self) -> None:
+        if not self._buffered:
+            super().flush()
+
+    @staticmethod
+    def _compress_rotated(source: str, dest: str) -> None:
+        with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        os.remove(source)
+
+
 class LogManager:
     """
     Class for setting up and obtaining a logger that has been setup for SquidASM use.
@@ -26,6 +115,10 @@ class LogManager:
 
     STACK_LOGGER = "Stack"
     _LOGGER_HAS_BEEN_SETUP = False
+    # Log levels of components, by (node name, component type). None matches any
+    # node or any component type.
+    _component_levels: Dict[Tuple[Optional[str], Optional[str]], int] = {}
+    _file_listeners: List[logging.handlers.QueueListener] = []
 
     @classmethod
     def _setup_stack_logger(cls) -> None:
@@ -59,9 +152,67 @@ class LogManager:
     def set_log_level(cls, level: Union[int, str]) -> None:
         """
         Sets the log level of the SquidASM logger.
+        At DEBUG level, the trace events of the stack components are logged as well.
         """
         logger = cls.get_stack_logger()
         logger.setLevel(level)
+        Tracer.refresh()
+
+    @classmethod
+    def set_component_log_level(
+        cls,
+        level: Union[int, str],
+        node: Optional[str] = None,
+        component: Optional[str] = None,
+    ) -> None:
+        """Sets the log level of the stack components of a node, of a type, or of a
+        type on a node. Overrides the level of the SquidASM logger for these
+        components, e.g. to debug the network stack of a single node:
+
+            LogManager.set_log_level("WARNING")
+            LogManager.set_component_log_level("DEBUG", node="Alice", component="Netstack")
+
+        The level is resolved when a component is created. A level for a type and a
+        node takes precedence over a level for a node, which takes precedence over
+        a level for a type.
+
+        :param level: log level
+        :param node: name of the node, or None for all nodes
+        :param component: name of the component class or one of its base classes,
+            e.g. "Processor", or None for all component types
+        """
+        if isinstance(level, str):
+            level = logging.getLevelName(level.upper())
+        cls._component_levels[(node, component)] = level
+
+    @classmethod
+    def clear_component_log_levels(cls) -> None:
+        """Remove all levels set by `set_component_log_level`."""
+        cls._component_levels.clear()
+
+    @classmethod
+    def get_component_logger(
+        cls, sub_logger: str, node: str, component_types: List[str]
+    ) -> logging.Logger:
+        """Obtain the logger of a stack component, with the level that was set for
+        it by `set_component_log_level`, if any.
+
+        :param sub_logger: name of the child logger of the SquidASM logger
+        :param node: name of the node of the component
+        :param component_types: name of the class of the component, followed by
+            the names of its base classes
+        """
+        logger = cls.get_stack_logger(sub_logger)
+        for key in [(node, t) for t in component_types] + [(node, None)]:
+            if key in cls._component_levels:
+                logger.setLevel(cls._component_levels[key])
+                return logger
+        for key in [(None, t) for t in component_types]:
+            if key in cls._component_levels:
+                logger.setLevel(cls._component_levels[key])
+                return logger
+        logger.setLevel(logging.NOTSET)
+        return logger
 
     @classmethod
     def get_log_level(cls) -> int:
@@ -69,43 +220,187 @@ class LogManager:
         return cls.get_stack_logger().level
 
     @classmethod
-    def log_to_file(cls, path: str) -> None:
+    def log_to_file(
+        cls,
+        path: str,
+        asynchronous: bool = True,
+        buffer_size: int = 1 << 20,
+        max_bytes: int = 0,
+        backup_count: int = 0,
+        compress: bool = False,
+    ) -> None:
         """Sets up sending the logs to an output file. Does not affect other log output methods.
 
+        By default, records are put on a queue and formatted and written by a
+        background thread, so that writing the file does not slow down the
+        simulation. The simulation time of a record is captured when it is logged.
+        Use `stop_file_logging` to make sure all records were written before
+        reading the file; this happens automatically when Python exits.
+
         :param path: Location of output file. Overwrites existing file.
+        :param asynchronous: Whether to write the file in a background thread.
+        :param buffer_size: Size in bytes of the write buffer of the file.
+        :param max_bytes: If non-zero, the file is rotated when it would grow beyond
+            this size. Old files are renamed to `path.1`, `path.2`, etc.
+        :param backup_count: Number of old files to keep when rotating.
+        :param compress: Compress the old files with gzip when rotating, or the
+            output file itself if it is not rotated.
         """
-        fileHandler = logging.FileHandler(path, mode="w")
+        file_handler = _LogFileHandler(
+            path, buffer_size, max_bytes, backup_count, compress, asynchronous
+        )
         formatter = logging.Formatter(
             "%(levelname)s:%(simtime)s ns:%(name)s:%(message)s"
         )
-        fileHandler.setFormatter(formatter)
-        fileHandler.addFilter(SimTimeFilter())
-        cls.get_stack_logger().addHandler(fileHandler)
+        file_handler.setFormatter(formatter)
+
+        if not asynchronous:
+            file_handler.addFilter(SimTimeFilter())
+            cls.get_stack_logger().addHandler(file_handler)
+            return
+
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        queue_handler = _SimTimeQueueHandler(log_queue)
+        queue_handler.addFilter(SimTimeFilter())
+        listener = logging.handlers.QueueListener(log_queue, file_handler)
+        listener.start()
+        if len(cls._file_listeners) == 0:
+            atexit.register(cls.stop_file_logging)
+        cls._file_listeners.append(listener)
+        cls.get_stack_logger().addHandler(queue_handler)
 
+    @classmethod
+    def stop_file_logging(cls) -> None:
+        """Write all queued records of the asynchronous log files and close the
+        files. Logging to these files stops."""
+        logger = cls.get_stack_logger()
+        for handler in list(logger.handlers):
+            if isinstance(handler, _SimTimeQueueHandler):
+                logger.removeHandler(handler)
+        for listener in cls._file_listeners:
+            listener.stop()
+            for handler in listener.handlers:
+                handler.close()
+        cls._file_listeners = []
 
-class PortListener(Protocol):
-    def __init__(self, port: Port, signal_label: str) -> None:
-        self._buffer: List[bytes] = []
-        self._port: Port = port
+
+class MessageBuffer(deque):
+    """FIFO buffer of messages that arrived but were not yet received.
+
+    Messages are appended at the right and received from the left, both in
+    constant time. The buffer keeps track of the largest number of messages it
+    held at once."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._high_water_mark: int = 0
+
+    @property
+    def high_water_mark(self) -> int:
+        """Largest number of messages that were in the buffer at the same time."""
+        return self._high_water_mark
+
+    def append(self, msg: Any) -> None:
+        super().append(msg)
+        if len(self) > self._high_water_mark:
+            self._high_water_mark = len(self)
+
+    def extend(self, msgs: Iterable[Any]) -> None:
+        super().extend(msgs)
+        if len(self) > self._high_water_mark:
+            self._high_water_mark = len(self)
+
+    def drain(self) -> List[Any]:
+        """Remove all messages from the buffer and return them in order."""
+        msgs = list(self)
+        self.clear()
+        return msgs
+
+
+# Scheduled by a listener for itself when messages that arrived are delivered
+# after its latency.
+_MSGS_DELIVERED: EventType = EventType("MSGS_DELIVERED", "Messages delivered")
+
+
+class _Listener(Protocol):
+    """Base class of listeners, which buffer messages for a protocol until the
+    protocol receives them.
+
+    Messages can be delivered to the buffer with a latency, which models the time
+    it takes to take them in. The latency is applied once, when the messages
+    arrive, so messages that arrive close together are delayed at the same time
+    rather than one after the other."""
+
+    def __init__(self, signal_label: str) -> None:
+        self._buffer: MessageBuffer = MessageBuffer()
         self._signal_label = signal_label
+        self._latency: float = 0
+        # Batches of messages that arrived but were not yet delivered, in order.
+        self._in_transit: Deque[List[Any]] = deque()
+        self._deliver_handler = EventHandler(self._deliver_in_transit)
         self.add_signal(signal_label)
 
     @property
-    def buffer(self) -> List[bytes]:
+    def buffer(self) -> MessageBuffer:
         return self._buffer
 
+    @property
+    def latency(self) -> float:
+        """Time (ns) between the arrival of messages and their delivery to the
+        buffer."""
+        return self._latency
+
+    @latency.setter
+    def latency(self, value: float) -> None:
+        if value < 0:
+            raise ValueError(f"Latency must be non-negative, not {value}")
+        self._latency = value
+
+    def _arrive(self, msgs: List[Any]) -> None:
+        """Deliver messages that arrived, after the latency of the listener."""
+        if self._latency == 0:
+            self._deliver(msgs)
+            return
+        self._in_transit.append(msgs)
+        self._schedule_after(self._latency, _MSGS_DELIVERED)
+
+    def _deliver_in_transit(self, event) -> None:
+        # Messages arrive in order and all have the same latency, so the oldest
+        # batch is the one that is due.
+        if len(self._in_transit) > 0:
+            self._deliver(self._in_transit.popleft())
+
+    def _deliver(self, msgs: List[Any]) -> None:
+        raise NotImplementedError
+
+    def start(self) -> None:
+        super().start()
+        self._wait(self._deliver_handler, entity=self, event_type=_MSGS_DELIVERED)
+
+    def stop(self) -> None:
+        self._dismiss(self._deliver_handler, entity=self, event_type=_MSGS_DELIVERED)
+        self._in_transit.clear()
+        super().stop()
+
+
+class PortListener(_Listener):
+    def __init__(self, port: Port, signal_label: str) -> None:
+        super().__init__(signal_label)
+        self._port: Port = port
+
     def run(self) -> Generator[EventExpression, None, None]:
         while True:
             # Wait for an event saying that there is new input.
             yield self.await_port_input(self._port)
 
             counter = 0
+            msgs = []
             # Read all inputs and count them.
             while True:
                 input = self._port.rx_input()
                 if input is None:
                     break
-                self._buffer += input.items
+                msgs.extend(input.items)
                 counter += 1
             # If there are n inputs, there have been n events, but we yielded only
             # on one of them so far. "Flush" these n-1 additional events:
@@ -115,6 +410,42 @@ class PortListener(Protocol):
 
             # Only after having yielded on all current events, we can schedule a
             # notification event, so that its reactor can handle all inputs at once.
+            self._arrive(msgs)
+
+    def _deliver(self, msgs: List[Any]) -> None:
+        self._buffer.extend(msgs)
+        self.send_signal(self._signal_label)
+
+
+class DirectChannel(_Listener):
+    """In-process channel between two protocols of the same node.
+
+    Can be used instead of a pair of connected ports and a `PortListener`. The
+    sender puts messages directly into the buffer of the channel, and the channel
+    only sends a signal when the buffer goes from empty to non-empty. Messages are
+    received in the order in which they were sent, like with ports. With a latency,
+    messages sent at the same time are delivered together, like the inputs a
+    `PortListener` reads at once.
+    """
+
+    def __init__(self, signal_label: str) -> None:
+        super().__init__(signal_label)
+        # Time at which the last batch in transit was sent.
+        self._last_sent: Optional[float] = None
+
+    def tx_output(self, msg: Any) -> None:
+        now = ns.sim_time()
+        if len(self._in_transit) > 0 and self._last_sent == now:
+            # The batch sent at this time is still in transit.
+            self._in_transit[-1].append(msg)
+            return
+        self._last_sent = now
+        self._arrive([msg])
+
+    def _deliver(self, msgs: List[Any]) -> None:
+        was_empty = len(self._buffer) == 0
+        self._buffer.extend(msgs)
+        if was_empty:
             self.send_signal(self._signal_label)
 
 
@@ -136,21 +467,86 @@ class RegisterMeta:
 class ComponentProtocol(Protocol):
     def __init__(self, name: str, comp: Component) -> None:
         super().__init__(name)
-        self._listeners: Dict[str, PortListener] = {}
-        self._logger: logging.Logger = LogManager.get_stack_logger(
-            f"{self.__class__.__name__}({comp.name})"
+        self._listeners: Dict[str, Union[PortListener, DirectChannel]] = {}
+        self._direct_outputs: Dict[str, DirectChannel] = {}
+        # Modelled time (ns) to take in messages, by listener name.
+        self._receive_latencies: Dict[str, float] = {}
+        self._logger: logging.Logger = LogManager.get_component_logger(
+            f"{self.__class__.__name__}({comp.name})",
+            comp.node.name,
+            [cls.__name__ for cls in type(self).__mro__],
         )
+        self._tracer = Tracer(f"{self.__class__.__name__}({comp.name})", self._logger)
 
-    def add_listener(self, name, listener: PortListener) -> None:
+    def add_listener(self, name, listener: Union[PortListener, DirectChannel]) -> None:
+        listener.latency = self._receive_latencies.get(name, 0)
         self._listeners[name] = listener
 
+    def connect_direct(
+        self,
+        output_name: str,
+        receiver: "ComponentProtocol",
+        listener_name: str,
+        signal_label: str,
+    ) -> None:
+        """Send messages for an output directly to another protocol of the same
+        node, bypassing the ports. The receiver's listener is replaced by a
+        `DirectChannel`. Must be called before the protocols are started.
+
+        :param output_name: name of the output of this protocol
+        :param receiver: protocol that receives the messages
+        :param listener_name: name of the receiver's listener for the messages
+        :param signal_label: label of the signal the receiver waits for
+        """
+        channel = DirectChannel(signal_label)
+        receiver.add_listener(listener_name, channel)
+        self._direct_outputs[output_name] = channel
+
+    def _drain_msgs(self, listener_name: str) -> List[Any]:
+        """Receive all messages that are currently buffered by a listener, without
+        waiting."""
+        return self._listeners[listener_name].buffer.drain()
+
+    def buffer_high_water_marks(self) -> Dict[str, int]:
+        """Largest number of messages that were buffered at once, per listener."""
+        return {
+            name: listener.buffer.high_water_mark
+            for name, listener in self._listeners.items()
+        }
+
+    def set_receive_latency(self, listener_name: str, latency: float) -> None:
+        """Model the time it takes to take in messages from a listener. Messages
+        are delivered to the listener this long after they arrived. Messages that
+        arrive together are delayed together, so a backlog of messages does not
+        add up the latency of each of them.
+
+        :param listener_name: name of the listener
+        :param latency: latency in nanoseconds
+        """
+        if latency < 0:
+            raise ValueError(f"Latency must be non-negative, not {latency}")
+        self._receive_latencies[listener_name] = latency
+        if listener_name in self._listeners:
+            self._listeners[listener_name].latency = latency
+
+    def _send_msg(self, output_name: str, port: Port, msg: Any) -> None:
+        """Send a message over a direct channel if the output has one, or over a
+        port otherwise."""
+        channel = self._direct_outputs.get(output_name)
+        if channel is not None:
+            channel.tx_output(msg)
+        else:
+            port.tx_output(msg)
+
     def _receive_msg(
         self, listener_name: str, wake_up_signal: str
     ) -> Generator[EventExpression, None, str]:
         listener = self._listeners[listener_name]
-        if len(listener.buffer) == 0:
+        # A wake-up signal may be for a message that was already received, so check
+        # the buffer again after waking up.
+        while len(listener.buffer) == 0:
             yield self.await_signal(sender=listener, signal_label=wake_up_signal)
-        return listener.buffer.pop(0)
+        return listener.buffer.popleft()
 
     def start(self) -> None:
         super().start()
@@ -371,6 +767,11 @@ class PhysicalQuantumMemory:
     def comm_qubit_count(self) -> int:
         return len(self._comm_qubit_ids)
 
+    @property
+    def free_comm_qubit_count(self) -> int:
+        """Number of communication qubits that are not allocated."""
+        return sum(1 for i in self._comm_qubit_ids if i not in self._allocated_ids)
+
     def allocate(self) -> int:
         """Allocate a qubit (communcation or memory)."""
         for i in range(self._qubit_count):
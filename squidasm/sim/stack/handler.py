@@ -176,13 +176,13 @@ class Handler(ComponentProtocol):
         self._flavour = flavour
 
     def _send_host_msg(self, msg: Any) -> None:
-        self._comp.host_out_port.tx_output(msg)
+        self._send_msg("host", self._comp.host_out_port, msg)
 
     def _receive_host_msg(self) -> Generator[EventExpression, None, str]:
         return (yield from self._receive_msg("host", SIGNAL_HOST_HAND_MSG))
 
     def _send_processor_msg(self, msg: str) -> None:
-        self._comp.processor_out_port.tx_output(msg)
+        self._send_msg("processor", self._comp.processor_out_port, msg)
 
     def _receive_processor_msg(self) -> Generator[EventExpression, None, str]:
         return (yield from self._receive_msg("processor", SIGNAL_PROC_HAND_MSG))
@@ -225,6 +225,7 @@ class Handler(ComponentProtocol):
             if phys_id is not None:
                 self.physical_memory.free(phys_id)
         self.app_memories.pop(app_id)
+        self.qnos.processor.clear_application(app_id)
 
     def stop_application(self, app_id: int) -> None:
         self._logger.debug(f"stopping application with ID {app_id}")
@@ -246,7 +247,7 @@ class Handler(ComponentProtocol):
         self._send_processor_msg(subroutine)
         result = yield from self._receive_processor_msg()
         assert result == "subroutine done"
-        self._logger.debug(f"result: {result}")
+        self._logger.debug("result: %s", result)
         app_mem = self.app_memories[app_id]
         return app_mem
 
@@ -270,7 +271,8 @@ class Handler(ComponentProtocol):
         while True:
             # Wait for a new message from the Host.
             raw_host_msg = yield from self._receive_host_msg()
-            self._logger.debug(f"received new msg from host: {raw_host_msg}")
+            if self._tracer.enabled:
+                self._tracer.trace("host_msg", msg=raw_host_msg)
             msg = deserialize_host_msg(raw_host_msg)
 
             # Handle the message. This updates the handler's state and may e.g.
@@ -34,6 +34,7 @@ class HostComponent(Component):
     def __init__(self, node: Node) -> None:
         super().__init__(f"{node.name}_host")
         self.add_ports(["qnos_in", "qnos_out"])
+        self._node = node
 
     @property
     def qnos_in_port(self) -> Port:
@@ -43,6 +44,10 @@ class HostComponent(Component):
     def qnos_out_port(self) -> Port:
         return self.ports["qnos_out"]
 
+    @property
+    def node(self) -> Node:
+        return self._node
+
 
 class Host(ComponentProtocol):
     """NetSquid protocol representing a Host."""
@@ -93,7 +98,7 @@ class Host(ComponentProtocol):
         self._compiler = typ
 
     def send_qnos_msg(self, msg: bytes) -> None:
-        self._comp.qnos_out_port.tx_output(msg)
+        self._send_msg("qnos", self._comp.qnos_out_port, msg)
 
     def receive_qnos_msg(self) -> Generator[EventExpression, None, str]:
         return (yield from self._receive_msg("qnos", SIGNAL_HAND_HOST_MSG))
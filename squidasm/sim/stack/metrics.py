@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import csv
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def _histogram(values: List[float], num_bins: int) -> Dict[str, List[float]]:
+    """Bin values into `num_bins` bins of equal width.
+
+    :return: dictionary with the `num_bins + 1` bin edges and the count per bin
+    """
+    if len(values) == 0:
+        return {"edges": [], "counts": []}
+    low = min(values)
+    high = max(values)
+    if high == low:
+        return {"edges": [low, high], "counts": [len(values)]}
+
+    width = (high - low) / num_bins
+    edges = [low + i * width for i in range(num_bins)] + [high]
+    counts = [0] * num_bins
+    for value in values:
+        index = min(int((value - low) / width), num_bins - 1)
+        counts[index] += 1
+    return {"edges": edges, "counts": counts}
+
+
+def _mean(values: List[float]) -> Optional[float]:
+    if len(values) == 0:
+        return None
+    return sum(values) / len(values)
+
+
+@dataclass
+class LinkMetrics:
+    """Raw entanglement generation samples that a node recorded for its link with
+    a single remote node. All times are in nanoseconds of simulated time."""
+
+    gen_latencies: List[float] = field(default_factory=list)
+    """Time from the start of handling a request until a pair was delivered, per
+    pair."""
+    wait_times: List[float] = field(default_factory=list)
+    """Time spent waiting for a free communication qubit, per allocation."""
+    queue_depths: List[int] = field(default_factory=list)
+    """Number of pairs in flight at the EGP, sampled each time a request is put."""
+    pair_times: List[float] = field(default_factory=list)
+    """Simulation time at which each pair was delivered."""
+
+    @property
+    def num_pairs(self) -> int:
+        return len(self.pair_times)
+
+    @property
+    def pairs_per_second(self) -> Optional[float]:
+        """Number of pairs delivered per second of simulated time, measured
+        between the first and the last delivered pair."""
+        if self.num_pairs < 2:
+            return None
+        duration = self.pair_times[-1] - self.pair_times[0]
+        if duration == 0:
+            return None
+        return (self.num_pairs - 1) / (duration * 1e-9)
+
+    def merge(self, other: LinkMetrics) -> LinkMetrics:
+        return LinkMetrics(
+            gen_latencies=self.gen_latencies + other.gen_latencies,
+            wait_times=self.wait_times + other.wait_times,
+            queue_depths=self.queue_depths + other.queue_depths,
+            pair_times=sorted(self.pair_times + other.pair_times),
+        )
+
+    def summary(self, num_bins: int) -> Dict[str, Any]:
+        """Summarize the samples as counts, means and histograms."""
+        return {
+            "num_pairs": self.num_pairs,
+            "pairs_per_second": self.pairs_per_second,
+            "mean_gen_latency": _mean(self.gen_latencies),
+            "mean_wait_time": _mean(self.wait_times),
+            "mean_queue_depth": _mean(self.queue_depths),
+            "max_queue_depth": max(self.queue_depths, default=None),
+            "gen_latency_histogram": _histogram(self.gen_latencies, num_bins),
+            "wait_time_histogram": _histogram(self.wait_times, num_bins),
+            "queue_depth_histogram": _histogram(self.queue_depths, num_bins),
+        }
+
+
+class MetricsCollector:
+    """Collects entanglement generation metrics of the network stacks in a
+    simulation.
+
+    A collector can be passed to `squidasm.run.stack.run.run`, which attaches it
+    to the network stack of every node. Metrics are recorded per link, i.e. per
+    (node, remote node) pair, and can be summarized per link and per node and
+    exported as JSON or CSV after the run.
+    """
+
+    # Summary entries that are written as columns of the CSV export.
+    CSV_FIELDS = [
+        "num_pairs",
+        "pairs_per_second",
+        "mean_gen_latency",
+        "mean_wait_time",
+        "mean_queue_depth",
+        "max_queue_depth",
+    ]
+
+    def __init__(self, num_bins: int = 10) -> None:
+        """
+        :param num_bins: number of bins of the histograms in the summaries
+        """
+        self._num_bins = num_bins
+        self._links: Dict[Tuple[str, str], LinkMetrics] = {}
+
+    def link(self, node: str, peer: str) -> LinkMetrics:
+        """Get the metrics that `node` recorded for its link with `peer`."""
+        key = (node, peer)
+        if key not in self._links:
+            self._links[key] = LinkMetrics()
+        return self._links[key]
+
+    def record_pair(self, node: str, peer: str, time: float, latency: float) -> None:
+        """Record the delivery of a pair.
+
+        :param node: name of the node that delivered the pair
+        :param peer: name of the remote node
+        :param time: simulation time of the delivery
+        :param latency: time since the start of handling the request
+        """
+        link = self.link(node, peer)
+        link.pair_times.append(time)
+        link.gen_latencies.append(latency)
+
+    def record_wait(self, node: str, peer: str, wait_time: float) -> None:
+        """Record the time that a node waited for a free communication qubit."""
+        self.link(node, peer).wait_times.append(wait_time)
+
+    def record_queue_depth(self, node: str, peer: str, depth: int) -> None:
+        """Record the number of pairs in flight at the EGP of a node."""
+        self.link(node, peer).queue_depths.append(depth)
+
+    def link_summaries(self) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        """Summaries of all links, by (node name, remote node name)."""
+        return {key: link.summary(self._num_bins) for key, link in self._links.items()}
+
+    def node_summaries(self) -> Dict[str, Dict[str, Any]]:
+        """Summaries of all nodes, combining the links of each node."""
+        nodes: Dict[str, LinkMetrics] = {}
+        for (node, _), link in self._links.items():
+            nodes[node] = nodes[node].merge(link) if node in nodes else link
+        return {
+            node: metrics.summary(self._num_bins) for node, metrics in nodes.items()
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "links": [
+                {"node": node, "peer": peer, **summary}
+                for (node, peer), summary in self.link_summaries().items()
+            ],
+            "nodes": [
+                {"node": node, **summary}
+                for node, summary in self.node_summaries().items()
+            ],
+        }
+
+    def export_json(self, path: str) -> None:
+        """Write the link and node summaries, including histograms, to a JSON
+        file."""
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=4)
+
+    def export_csv(self, path: str) -> None:
+        """Write the link and node summaries, without histograms, to a CSV file.
+        Node rows have an empty `peer` column."""
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["node", "peer"] + self.CSV_FIELDS)
+            writer.writeheader()
+            for (node, peer), summary in self.link_summaries().items():
+                row = {k: summary[k] for k in self.CSV_FIELDS}
+                writer.writerow({"node": node, "peer": peer, **row})
+            for node, summary in self.node_summaries().items():
+                row = {k: summary[k] for k in self.CSV_FIELDS}
+                writer.writerow({"node": node, "peer": "", **row})
@@ -1,8 +1,22 @@
 from __future__ import annotations
 
+import copy
 import math
-from dataclasses import dataclass
-from typing import TYPE_CHECKING, Dict, Generator, List, Optional
+from collections import deque
+from dataclasses import dataclass, field
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Generator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
 import netsquid as ns
 from netqasm.sdk.build_epr import (
@@ -18,6 +32,7 @@ from netqasm.sdk.build_epr import (
 from netsquid.components import QuantumProcessor
 from netsquid.components.component import Component, Port
 from netsquid.nodes import Node
+from netsquid.protocols import Protocol
 from netsquid_magic.egp import EgpProtocol
 from qlink_interface import (
     ReqCreateAndKeep,
@@ -29,11 +44,12 @@ from qlink_interface import (
 )
 from qlink_interface.interface import ReqRemoteStatePrep
 
-from pydynaa import EventExpression
+from pydynaa import EventExpression, EventHandler, EventType
 from squidasm.sim.stack.common import (
     AllocError,
     AppMemory,
     ComponentProtocol,
+    MessageBuffer,
     NetstackBreakpointCreateRequest,
     NetstackBreakpointReceiveRequest,
     NetstackCreateRequest,
@@ -41,8 +57,12 @@ from squidasm.sim.stack.common import (
     PhysicalQuantumMemory,
     PortListener,
 )
+from squidasm.sim.stack.context import NetSquidContext
+from squidasm.sim.stack.metrics import MetricsCollector
 from squidasm.sim.stack.signals import (
+    SIGNAL_EGP_NSTK_RES,
     SIGNAL_MEMORY_FREED,
+    SIGNAL_NSTK_REQ_QUEUED,
     SIGNAL_PEER_NSTK_MSG,
     SIGNAL_PROC_NSTK_MSG,
 )
@@ -53,6 +73,15 @@ if TYPE_CHECKING:
 PI = math.pi
 PI_OVER_2 = math.pi / 2
 
+# TODO
+MINIMUM_FIDELITY = 0.99
+
+# Scheduled by the network stack for itself to notify the processor of results
+# that were written to an array.
+_NOTIFY_PROCESSOR: EventType = EventType(
+    "NOTIFY_PROCESSOR", "Notify processor of written results"
+)
+
 
 class NetstackComponent(Component):
     """NetSquid component representing the network stack in QNodeOS.
@@ -102,10 +131,152 @@ class EprSocket:
 
     Multiple EPR Sockets may be created for a single pair of nodes. These
     sockets have a different ID, and may e.g be used for EPR generation requests
-    with different parameters."""
+    with different parameters.
+
+    The socket also keeps statistics of the requests that were handled on it.
+    Statistics are not taken into account when comparing sockets."""
 
     socket_id: int
     remote_id: int
+    num_requests: int = field(default=0, compare=False)
+    """Number of entanglement requests that were handled on this socket."""
+    num_pairs: int = field(default=0, compare=False)
+    """Number of pairs that were delivered to the application."""
+    total_gen_time: float = field(default=0.0, compare=False)
+    """Total simulation time (ns) from the start of handling a request until its
+    last pair was delivered, summed over all requests."""
+    total_wait_time: float = field(default=0.0, compare=False)
+    """Total simulation time (ns) that requests spent waiting for a free
+    communication qubit."""
+
+
+@dataclass
+class PeerCreateRequest:
+    """Message with which a network stack announces a create request to the
+    network stack of the remote node."""
+
+    request: ReqCreateBase
+    """Link layer request object."""
+    num_pooled: int = 0
+    """Number of pairs of the request that both nodes take from their pair pool."""
+    refill: bool = False
+    """Whether the pairs refill the pair pool instead of going to an application."""
+    seq: Optional[int] = None
+    """Sequence number of the request within the session with the remote node, or
+    None if the creator waits for an acknowledgement."""
+
+
+class EgpListener(Protocol):
+    """Buffers the results of a single type that an EGP protocol delivers.
+
+    The EGP only signals a result at the moment a pair is delivered. By buffering
+    the results, the network stack does not need to be waiting on the EGP at that
+    exact moment, which allows it to have multiple pairs in flight at once."""
+
+    def __init__(self, egp: EgpProtocol, result_label: str, signal_label: str) -> None:
+        self._buffer: MessageBuffer = MessageBuffer()
+        self._egp = egp
+        self._result_label = result_label
+        self._signal_label = signal_label
+        self.add_signal(signal_label)
+
+    @property
+    def buffer(self) -> MessageBuffer:
+        return self._buffer
+
+    def run(self) -> Generator[EventExpression, None, None]:
+        while True:
+            yield self.await_signal(sender=self._egp, signal_label=self._result_label)
+            result = self._egp.get_signal_result(self._result_label, receiver=self)
+            self._buffer.append(result)
+            self.send_signal(self._signal_label)
+
+
+class PeerRequestHandler(Protocol):
+    """Handles the entanglement requests of all applications with a single remote
+    node.
+
+    Requests are queued and handled one at a time, in the order in which the
+    processor issued them. The only exception is a receive request that is
+    handled while a create request waits for the remote node, if that node also
+    waits for its own create request to be acknowledged (see
+    `Netstack._receive_peer_ack`). Since all EPR sockets with the same remote node share
+    one EGP, and the remote node matches requests by their order, requests of
+    different EPR sockets with the same remote node are queued in this same FIFO.
+    Each remote node has its own handler, such that requests with different
+    remote nodes are handled concurrently.
+
+    While no requests are queued, the handler maintains the pool of pre-generated
+    pairs with the remote node, if there is one."""
+
+    def __init__(self, netstack: Netstack, peer_id: int) -> None:
+        """Peer request handler constructor. Typically created indirectly through
+        registering a peer with a `Netstack`.
+
+        :param netstack: `Netstack` protocol that owns this protocol
+        :param peer_id: ID of the remote node
+        """
+        super().__init__(name=f"{netstack.name}_peer_{peer_id}")
+        self._netstack = netstack
+        self._peer_id = peer_id
+        self._queue: Deque[
+            Union[NetstackCreateRequest, NetstackReceiveRequest]
+        ] = deque()
+        self.add_signal(SIGNAL_NSTK_REQ_QUEUED)
+
+    @property
+    def peer_id(self) -> int:
+        return self._peer_id
+
+    @property
+    def queue_length(self) -> int:
+        """Number of requests that are waiting to be handled."""
+        return len(self._queue)
+
+    def put(self, req: Union[NetstackCreateRequest, NetstackReceiveRequest]) -> None:
+        """Queue a request for this remote node."""
+        self._queue.append(req)
+        self.send_signal(SIGNAL_NSTK_REQ_QUEUED)
+
+    def take_receive_request(self) -> Optional[NetstackReceiveRequest]:
+        """Remove the first queued receive request from the queue and return it,
+        or return None if no receive request is queued."""
+        for req in self._queue:
+            if isinstance(req, NetstackReceiveRequest):
+                self._queue.remove(req)
+                return req
+        return None
+
+    def run(self) -> Generator[EventExpression, None, None]:
+        netstack = self._netstack
+        peer_id = self._peer_id
+
+        # Whether refilling the pair pool can make progress. It cannot if there
+        # were no free communication qubits at the last attempt.
+        can_refill = True
+
+        while True:
+            if len(self._queue) > 0:
+                req = self._queue.popleft()
+                yield from netstack.handle_request(req)
+            elif can_refill and netstack.needs_pool_refill(peer_id):
+                num_added = yield from netstack.refill_pair_pool(peer_id)
+                can_refill = num_added > 0
+            elif netstack.accepts_pool_refills(peer_id) and netstack.has_peer_msg(
+                peer_id
+            ):
+                yield from netstack.handle_peer_msg(peer_id)
+            else:
+                # Idle until there is something to do.
+                expr = self.await_signal(
+                    sender=self, signal_label=SIGNAL_NSTK_REQ_QUEUED
+                )
+                if netstack.needs_pool_refill(peer_id):
+                    expr = expr | netstack.await_memory_freed()
+                if netstack.accepts_pool_refills(peer_id):
+                    expr = expr | netstack.await_peer_msg(peer_id)
+                yield expr
+                can_refill = True
 
 
 class Netstack(ComponentProtocol):
@@ -128,13 +299,105 @@ class Netstack(ComponentProtocol):
         )
 
         self._egp: Dict[int, EgpProtocol] = {}
-        self._epr_sockets: Dict[int, List[EprSocket]] = {}  # app ID -> [socket]
+        self._peer_handlers: Dict[int, PeerRequestHandler] = {}
+
+        # Pre-generated pairs per remote node as (physical ID, EGP result), in the
+        # order in which they were generated. The remote node keeps the same pairs
+        # in the same order.
+        self._pair_pools: Dict[int, Deque[Tuple[int, ResCreateAndKeep]]] = {}
+        self._pair_pool_sizes: Dict[int, int] = {}
+
+        # Messages from remote nodes that arrived before a request needed them.
+        self._stashed_peer_msgs: Dict[int, Deque[Any]] = {}
+        # (app ID, socket ID, remote node ID) -> socket
+        self._epr_sockets: Dict[Tuple[int, int, int], EprSocket] = {}
+
+        # Maximum number of single-pair create-and-keep requests that are put to
+        # the EGP before waiting for the first result. None means that only the
+        # number of free communication qubits is a bound.
+        self._max_pipelined_pairs: Optional[int] = 1
+
+        # Number of measure-directly pairs whose results are written before the
+        # processor is notified.
+        self._md_result_chunk_size: int = 1
+
+        # In session mode, only the first create request with a remote node is
+        # acknowledged. Later requests carry a sequence number and the creator
+        # starts generating without waiting for the remote node.
+        self._session_mode: bool = False
+        self._sessions: Set[int] = set()  # IDs of remote nodes with a session
+        self._next_seq_out: Dict[int, int] = {}
+        self._next_seq_in: Dict[int, int] = {}
+
+        # Collector of entanglement generation metrics, if any.
+        self._metrics: Optional[MetricsCollector] = None
+
+        # Whether a notification of written results is scheduled for the
+        # processor. Results that are written at the same time are notified once.
+        self._processor_notification_pending: bool = False
+        self._notify_processor_handler = EventHandler(
+            self._flush_processor_notification
+        )
 
     def register_peer(self, peer_id: int):
         self.add_listener(
             f"peer_{peer_id}",
             PortListener(self._comp.peer_in_port(peer_id), SIGNAL_PEER_NSTK_MSG),
         )
+        self._peer_handlers[peer_id] = PeerRequestHandler(self, peer_id)
+        self._pair_pools[peer_id] = deque()
+        self._pair_pool_sizes[peer_id] = 0
+        self._stashed_peer_msgs[peer_id] = deque()
+        self._next_seq_out[peer_id] = 0
+        self._next_seq_in[peer_id] = 0
+
+    @property
+    def peer_ids(self) -> List[int]:
+        """IDs of the remote nodes that are registered with this network stack."""
+        return list(self._peer_handlers.keys())
+
+    def set_pair_pool_size(self, peer_id: int, size: int) -> None:
+        """Keep a pool of pre-generated pairs with a remote node.
+
+        When no request with the remote node is being handled, pairs are generated
+        until the pool holds `size` pairs. Create and Keep requests are served from
+        the pool first, which removes the generation time from their latency. The
+        pooled qubits stay in the quantum memory and are therefore subject to its
+        decoherence while they wait.
+
+        Refills of the pool with a remote node are initiated by the node with the
+        lowest ID, so the size set on that node determines the pool of the link.
+        The other node accepts refills as far as it has free communication
+        qubits, and keeps an identical pool.
+
+        :param peer_id: ID of the remote node
+        :param size: number of pairs to keep in the pool, 0 to disable the pool
+        """
+        if size < 0 or (size > 0 and size >= self.physical_memory.comm_qubit_count):
+            raise ValueError(
+                f"Pair pool size must be non-negative and smaller than the number "
+                f"of communication qubits ({self.physical_memory.comm_qubit_count}), "
+                f"not {size}"
+            )
+        self._pair_pool_sizes[peer_id] = size
+
+    def num_pooled_pairs(self, peer_id: int) -> int:
+        """Number of pre-generated pairs with a remote node that are in the pool."""
+        return len(self._pair_pools[peer_id])
+
+    def _initiates_pool_refills(self, peer_id: int) -> bool:
+        return self._comp.node.ID < peer_id
+
+    def needs_pool_refill(self, peer_id: int) -> bool:
+        """Whether this network stack should initiate a refill of the pair pool with
+        a remote node."""
+        return self._initiates_pool_refills(peer_id) and (
+            len(self._pair_pools[peer_id]) < self._pair_pool_sizes[peer_id]
+        )
+
+    def accepts_pool_refills(self, peer_id: int) -> bool:
+        """Whether the remote node may initiate refills of the pair pool."""
+        return not self._initiates_pool_refills(peer_id)
 
     def assign_egp(self, remote_node_id: int, egp: EgpProtocol) -> None:
         """Set the EGP protocol that this network stack uses to produce
@@ -144,6 +407,62 @@ class Netstack(ComponentProtocol):
         :param egp: The EGP protocol instance for generating EPR pairs with the remote node.
         """
         self._egp[remote_node_id] = egp
+        self.add_listener(
+            f"egp_ck_{remote_node_id}",
+            EgpListener(egp, ResCreateAndKeep.__name__, SIGNAL_EGP_NSTK_RES),
+        )
+        self.add_listener(
+            f"egp_md_{remote_node_id}",
+            EgpListener(egp, ResMeasureDirectly.__name__, SIGNAL_EGP_NSTK_RES),
+        )
+
+    @property
+    def max_pipelined_pairs(self) -> Optional[int]:
+        """Maximum number of pairs of a single create-and-keep request that are
+        generated concurrently. None means as many as there are free
+        communication qubits."""
+        return self._max_pipelined_pairs
+
+    @max_pipelined_pairs.setter
+    def max_pipelined_pairs(self, value: Optional[int]) -> None:
+        if value is not None and value < 1:
+            raise ValueError(f"max_pipelined_pairs must be at least 1, not {value}")
+        self._max_pipelined_pairs = value
+
+    @property
+    def md_result_chunk_size(self) -> int:
+        """Number of pairs of a measure-directly request after which the
+        processor is notified that results were written."""
+        return self._md_result_chunk_size
+
+    @md_result_chunk_size.setter
+    def md_result_chunk_size(self, value: int) -> None:
+        if value < 1:
+            raise ValueError(f"md_result_chunk_size must be at least 1, not {value}")
+        self._md_result_chunk_size = value
+
+    @property
+    def session_mode(self) -> bool:
+        """Whether create requests skip the handshake with the remote node once a
+        first request with that node has been acknowledged."""
+        return self._session_mode
+
+    @session_mode.setter
+    def session_mode(self, value: bool) -> None:
+        self._session_mode = value
+
+    @property
+    def metrics(self) -> Optional[MetricsCollector]:
+        """Collector to which entanglement generation metrics are reported, or
+        None if metrics are not collected."""
+        return self._metrics
+
+    @metrics.setter
+    def metrics(self, value: Optional[MetricsCollector]) -> None:
+        self._metrics = value
+
+    def _peer_name(self, peer_id: int) -> str:
+        return NetSquidContext.get_nodes().get(peer_id, str(peer_id))
 
     def open_epr_socket(self, app_id: int, socket_id: int, remote_node_id: int) -> None:
         """Create a new EPR socket with the specified remote node.
@@ -152,13 +471,35 @@ class Netstack(ComponentProtocol):
         :param socket_id: ID of the socket
         :param remote_node_id: ID of the remote node
         """
-        if app_id not in self._epr_sockets:
-            self._epr_sockets[app_id] = []
-        self._epr_sockets[app_id].append(EprSocket(socket_id, remote_node_id))
+        key = (app_id, socket_id, remote_node_id)
+        self._epr_sockets[key] = EprSocket(socket_id, remote_node_id)
+
+    @property
+    def epr_sockets(self) -> Dict[Tuple[int, int, int], EprSocket]:
+        """EPR sockets that were opened, by (app ID, socket ID, remote node ID).
+        The sockets hold statistics of the requests handled on them."""
+        return self._epr_sockets
 
     def _send_processor_msg(self, msg: str) -> None:
         """Send a message to the processor."""
-        self._comp.processor_out_port.tx_output(msg)
+        self._send_msg("processor", self._comp.processor_out_port, msg)
+
+    def _notify_processor(self) -> None:
+        """Notify the processor that results were written to an array.
+
+        The notification is sent by an event that is scheduled for the current
+        time, so all results that are written before that event happens lead to a
+        single notification, and thus to a single wake-up of the processor."""
+        if self._processor_notification_pending:
+            return
+        self._processor_notification_pending = True
+        self._schedule_now(_NOTIFY_PROCESSOR)
+
+    def _flush_processor_notification(self, event) -> None:
+        self._processor_notification_pending = False
+        if self._tracer.enabled:
+            self._tracer.trace("processor_notified")
+        self._send_processor_msg("wrote to array")
 
     def _receive_processor_msg(self) -> Generator[EventExpression, None, str]:
         """Receive a message from the processor. Block until there is at least one
@@ -178,16 +519,108 @@ class Netstack(ComponentProtocol):
         NOTE: for now we assume there is only one other node, which is 'the' peer."""
         return (yield from self._receive_msg(f"peer_{peer_id}", SIGNAL_PEER_NSTK_MSG))
 
+    def has_peer_msg(self, peer_id: int) -> bool:
+        """Whether a message from the network stack of a remote node is waiting to
+        be received."""
+        return len(self._listeners[f"peer_{peer_id}"].buffer) > 0
+
+    def await_peer_msg(self, peer_id: int) -> EventExpression:
+        """Event expression that triggers when a message from the network stack of
+        a remote node arrives."""
+        return self.await_signal(
+            sender=self._listeners[f"peer_{peer_id}"],
+            signal_label=SIGNAL_PEER_NSTK_MSG,
+        )
+
+    def await_memory_freed(self) -> EventExpression:
+        """Event expression that triggers when the processor frees a qubit."""
+        return self.await_signal(
+            sender=self._qnos.processor, signal_label=SIGNAL_MEMORY_FREED
+        )
+
+    def _receive_peer_create(
+        self, peer_id: int
+    ) -> Generator[EventExpression, None, PeerCreateRequest]:
+        """Receive the next create request that an application on a remote node
+        issued. Pool refills requested by the remote node in the meantime are
+        handled first."""
+        stash = self._stashed_peer_msgs[peer_id]
+        if len(stash) > 0:
+            return stash.popleft()
+        while True:
+            msg = yield from self._receive_peer_msg(peer_id)
+            if isinstance(msg, PeerCreateRequest) and msg.refill:
+                yield from self._accept_pool_refill(peer_id, msg)
+            else:
+                return msg
+
+    def _receive_peer_ack(self, peer_id: int) -> Generator[EventExpression, None, Any]:
+        """Receive the acknowledgement of a request that was sent to a remote node.
+        Pool refills requested by the remote node in the meantime are handled, and
+        create requests of the remote node are kept until a request needs them.
+
+        If both nodes send a create request and wait for its acknowledgement, the
+        node with the highest ID gives way: it handles the create request of the
+        remote node first, with its first queued receive request for that node,
+        which acknowledges the remote request."""
+        stash = self._stashed_peer_msgs[peer_id]
+        while True:
+            if self._comp.node.ID > peer_id:
+                while len(stash) > 0 and isinstance(stash[0], PeerCreateRequest):
+                    req = self._peer_handlers[peer_id].take_receive_request()
+                    if req is None:
+                        break
+                    yield from self.handle_request(req)
+            msg = yield from self._receive_peer_msg(peer_id)
+            if not isinstance(msg, PeerCreateRequest):
+                return msg
+            if msg.refill:
+                yield from self._accept_pool_refill(peer_id, msg)
+            else:
+                stash.append(msg)
+
+    def _receive_egp_ck_result(
+        self, peer_id: int
+    ) -> Generator[EventExpression, None, ResCreateAndKeep]:
+        """Receive the next create-and-keep result of the EGP with a remote node.
+        Block until there is at least one result."""
+        return (yield from self._receive_msg(f"egp_ck_{peer_id}", SIGNAL_EGP_NSTK_RES))
+
+    def _receive_egp_md_result(
+        self, peer_id: int
+    ) -> Generator[EventExpression, None, ResMeasureDirectly]:
+        """Receive the next measure-directly result of the EGP with a remote node.
+        Block until there is at least one result."""
+        return (yield from self._receive_msg(f"egp_md_{peer_id}", SIGNAL_EGP_NSTK_RES))
+
     def start(self) -> None:
         """Start this protocol. The NetSquid simulator will call and yield on the
-        `run` method. Also start the underlying EGP protocol."""
+        `run` method. Also start the handlers of the requests per peer."""
         super().start()
+        self._wait(
+            self._notify_processor_handler, entity=self, event_type=_NOTIFY_PROCESSOR
+        )
+        for handler in self._peer_handlers.values():
+            handler.start()
 
     def stop(self) -> None:
         """Stop this protocol. The NetSquid simulator will stop calling `run`.
-        Also stop the underlying EGP protocol."""
+        Also stop the handlers of the requests per peer."""
+        for handler in self._peer_handlers.values():
+            handler.stop()
+        self._dismiss(
+            self._notify_processor_handler, entity=self, event_type=_NOTIFY_PROCESSOR
+        )
+        self._processor_notification_pending = False
         super().stop()
 
+    def queue_length(self, peer_id: int) -> int:
+        """Number of requests with a remote node that are waiting to be handled.
+
+        :param peer_id: ID of the remote node
+        """
+        return self._peer_handlers[peer_id].queue_length
+
     def _read_request_args_array(self, app_id: int, array_addr: int) -> List[int]:
         app_mem = self.app_memories[app_id]
         app_mem.get_array(array_addr)
@@ -206,9 +639,6 @@ class Netstack(ComponentProtocol):
         num_pairs = args[SER_CREATE_IDX_NUMBER]
         assert num_pairs is not None
 
-        # TODO
-        MINIMUM_FIDELITY = 0.99
-
         if typ == 0:
             request = ReqCreateAndKeep(
                 remote_node_id=remote_id,
@@ -253,15 +683,270 @@ class Netstack(ComponentProtocol):
         :param rem_id: remote node ID
         :return: the corresponding EPR socket or None if it does not exist
         """
-        if app_id not in self._epr_sockets:
-            return None
-        for sck in self._epr_sockets[app_id]:
-            if sck.socket_id == sck_id and sck.remote_id == rem_id:
-                return sck
-        return None
+        return self._epr_sockets.get((app_id, sck_id, rem_id))
+
+    def _epr_socket_for(
+        self, req: Union[NetstackCreateRequest, NetstackReceiveRequest]
+    ) -> EprSocket:
+        """Get the EPR socket that a request was issued on. The socket should
+        exist."""
+        socket = self.find_epr_socket(req.app_id, req.epr_socket_id, req.remote_node_id)
+        assert socket is not None
+        return socket
+
+    def _allocate_comm_qubit(
+        self, peer_id: int, socket: Optional[EprSocket] = None
+    ) -> Generator[EventExpression, None, int]:
+        """Allocate a communication qubit. If none is available, wait until the
+        processor frees a qubit and try again.
+
+        :param peer_id: ID of the remote node that the qubit is allocated for
+        :param socket: EPR socket to which the waiting time is attributed, if any
+        :return: physical ID of the allocated communication qubit
+        """
+        start_time = ns.sim_time()
+        while True:
+            try:
+                phys_id = self.physical_memory.allocate_comm()
+                wait_time = ns.sim_time() - start_time
+                if socket is not None:
+                    socket.total_wait_time += wait_time
+                if self._metrics is not None:
+                    self._metrics.record_wait(
+                        self._comp.node.name, self._peer_name(peer_id), wait_time
+                    )
+                return phys_id
+            except AllocError:
+                if self._tracer.enabled:
+                    self._tracer.trace("comm_qubit_wait", peer_id=peer_id)
+
+                # Wait for a signal indicating the communication qubit might be free
+                # again.
+                yield self.await_signal(
+                    sender=self._qnos.processor, signal_label=SIGNAL_MEMORY_FREED
+                )
+
+    def _generate_ck_pairs(
+        self,
+        peer_id: int,
+        num_pairs: int,
+        egp_request: Union[ReqCreateAndKeep, ReqReceive],
+        on_pair: Callable[[int, int, ResCreateAndKeep], None],
+        socket: Optional[EprSocket] = None,
+        on_batch: Optional[Callable[[], None]] = None,
+        pipelined: bool = True,
+    ) -> Generator[EventExpression, None, None]:
+        """Generate Create and Keep pairs with a remote node, one pair per EGP
+        request.
+
+        Up to `max_pipelined_pairs` single-pair requests are kept in flight at the
+        EGP, bounded by the number of free communication qubits. A communication
+        qubit is allocated for each pair before its request is put to the EGP.
+        Only if no pair is in flight, this method waits for a communication qubit
+        to become free.
+
+        :param peer_id: ID of the remote node
+        :param num_pairs: number of pairs to generate
+        :param egp_request: single-pair request to put to the EGP for each pair
+        :param on_pair: called for each delivered pair, in order, with the index of
+            the pair, the physical ID of its qubit and the EGP result
+        :param socket: EPR socket of the request, which keeps the time spent
+            waiting for a communication qubit
+        :param on_batch: called after a batch of pairs was delivered. Pairs whose
+            results are already available when the netstack wakes up are delivered
+            in the same batch.
+        :param pipelined: whether more than one pair may be in flight. If False,
+            `max_pipelined_pairs` is ignored and pairs are generated one by one.
+        """
+        current_egp = self._egp[peer_id]
+        max_in_flight = self._max_pipelined_pairs if pipelined else 1
+
+        # Physical IDs of the communication qubits of the pairs that are in flight,
+        # in the order in which they were requested.
+        in_flight: Deque[int] = deque()
+        num_requested = 0
+
+        pair_index = 0
+        while pair_index < num_pairs:
+            # Put as many single-pair requests to the EGP as allowed.
+            while num_requested < num_pairs and (
+                max_in_flight is None or len(in_flight) < max_in_flight
+            ):
+                if len(in_flight) == 0:
+                    phys_id = yield from self._allocate_comm_qubit(peer_id, socket)
+                else:
+                    # Do not block on allocation while earlier pairs are pending.
+                    try:
+                        phys_id = self.physical_memory.allocate_comm()
+                    except AllocError:
+                        break
+
+                if self._tracer.enabled:
+                    self._tracer.trace(
+                        "egp_put",
+                        peer_id=peer_id,
+                        pair_index=num_requested,
+                        phys_id=phys_id,
+                        in_flight=len(in_flight) + 1,
+                    )
+                current_egp.put(copy.copy(egp_request))
+                in_flight.append(phys_id)
+                num_requested += 1
+                if self._metrics is not None:
+                    self._metrics.record_queue_depth(
+                        self._comp.node.name, self._peer_name(peer_id), len(in_flight)
+                    )
+
+            # Wait for the EGP to deliver the next pair.
+            result = yield from self._receive_egp_ck_result(peer_id)
+
+            # Deliver this pair and any later pairs that were already delivered by
+            # the EGP as one batch.
+            egp_results = self._listeners[f"egp_ck_{peer_id}"].buffer
+            while True:
+                phys_id = in_flight.popleft()
+                if self._tracer.enabled:
+                    self._tracer.trace(
+                        "egp_result",
+                        peer_id=peer_id,
+                        pair_index=pair_index,
+                        bell_state=result.bell_state,
+                    )
+                on_pair(pair_index, phys_id, result)
+                pair_index += 1
+                if len(in_flight) == 0 or len(egp_results) == 0:
+                    break
+                result = egp_results.popleft()
+
+            if on_batch is not None:
+                on_batch()
+
+    def _deliver_ck_pair(
+        self,
+        req: Union[NetstackCreateRequest, NetstackReceiveRequest],
+        pair_index: int,
+        phys_id: int,
+        result: ResCreateAndKeep,
+        start_time: float,
+    ) -> None:
+        """Map the application's virtual qubit of a pair to the physical qubit
+        holding it and write the pair's results to the application's result
+        array. The caller notifies the processor.
+
+        :param req: application request info (app ID and NetQASM array IDs)
+        :param pair_index: index of the pair within the request
+        :param phys_id: physical ID of the qubit holding the pair
+        :param result: EGP result of the pair
+        :param start_time: simulation time at which the request started
+        """
+        app_mem = self.app_memories[req.app_id]
+
+        virt_id = app_mem.get_array_value(req.qubit_array_addr, pair_index)
+        app_mem.map_virt_id(virt_id, phys_id)
+
+        gen_duration_ns_float = ns.sim_time() - start_time
+        gen_duration_us_int = int(gen_duration_ns_float / 1000)
+        if self._metrics is not None:
+            self._metrics.record_pair(
+                self._comp.node.name,
+                self._peer_name(req.remote_node_id),
+                ns.sim_time(),
+                gen_duration_ns_float,
+            )
+
+        # Length of response array slice for a single pair.
+        slice_len = SER_RESPONSE_KEEP_LEN
+
+        # Populate results array.
+        for i in range(slice_len):
+            # Write -1 to unused array elements.
+            value = -1
+
+            # Write corresponding result value to the other array elements.
+            if i == SER_RESPONSE_KEEP_IDX_GOODNESS:
+                value = gen_duration_us_int
+            if i == SER_RESPONSE_KEEP_IDX_BELL_STATE:
+                value = result.bell_state.value
+
+            # Calculate array element location.
+            arr_index = slice_len * pair_index + i
+
+            app_mem.set_array_value(req.result_array_addr, arr_index, value)
+        if self._tracer.enabled:
+            self._tracer.trace(
+                "ck_pair_delivered",
+                app_id=req.app_id,
+                pair_index=pair_index,
+                virt_id=virt_id,
+                phys_id=phys_id,
+                gen_duration=gen_duration_ns_float,
+                array_addr=req.result_array_addr,
+            )
+        self._epr_socket_for(req).num_pairs += 1
+
+    def _has_distinct_qubits(
+        self,
+        req: Union[NetstackCreateRequest, NetstackReceiveRequest],
+        num_pairs: int,
+    ) -> bool:
+        """Whether the pairs of a Create and Keep request go to different virtual
+        qubits. In sequential mode, all pairs of a request are delivered to the
+        same virtual qubit, which the application has to free before the next pair
+        can be delivered."""
+        virt_ids = self.app_memories[req.app_id].get_array(req.qubit_array_addr)
+        return len(set(virt_ids[:num_pairs])) == num_pairs
+
+    def _handle_ck_pairs(
+        self,
+        req: Union[NetstackCreateRequest, NetstackReceiveRequest],
+        num_pairs: int,
+        egp_request: Union[ReqCreateAndKeep, ReqReceive],
+        num_pooled: int = 0,
+    ) -> Generator[EventExpression, None, None]:
+        """Deliver the pairs of a Create and Keep request to the application in
+        order. The first `num_pooled` pairs are taken from the pair pool, the
+        others are generated.
+
+        :param req: application request info (app ID and NetQASM array IDs)
+        :param num_pairs: number of pairs of the request
+        :param egp_request: single-pair request to put to the EGP for each pair
+            that is generated
+        :param num_pooled: number of pairs to take from the pair pool
+        """
+        start_time = ns.sim_time()
+
+        pool = self._pair_pools[req.remote_node_id]
+        assert len(pool) >= num_pooled
+        for pair_index in range(num_pooled):
+            phys_id, result = pool.popleft()
+            if self._tracer.enabled:
+                self._tracer.trace(
+                    "pool_pair_taken", peer_id=req.remote_node_id, phys_id=phys_id
+                )
+            self._deliver_ck_pair(req, pair_index, phys_id, result, start_time)
+        if num_pooled > 0:
+            self._notify_processor()
+
+        # Sequential requests are not pipelined.
+        pipelined = self._has_distinct_qubits(req, num_pairs)
+
+        yield from self._generate_ck_pairs(
+            req.remote_node_id,
+            num_pairs - num_pooled,
+            egp_request,
+            on_pair=lambda index, phys_id, result: self._deliver_ck_pair(
+                req, num_pooled + index, phys_id, result, start_time
+            ),
+            socket=self._epr_socket_for(req),
+            on_batch=self._notify_processor,
+            pipelined=pipelined,
+        )
 
     def handle_create_ck_request(
-        self, req: NetstackCreateRequest, request: ReqCreateAndKeep
+        self,
+        req: NetstackCreateRequest,
+        request: ReqCreateAndKeep,
+        num_pooled: int = 0,
     ) -> Generator[EventExpression, None, None]:
         """Handle a Create and Keep request as the initiator/creator, until all
         pairs have been created.
@@ -272,9 +957,13 @@ class Netstack(ComponentProtocol):
         local gates are applied to do a correction, such that the final
         delivered pair is always Phi+.
 
+        The request is split into 1-pair requests, of which up to
+        `max_pipelined_pairs` are put to the EGP at the same time. Results are
+        delivered to the application in the order of the pairs.
+
         The method can however yield (i.e. give control back to the simulator
         scheduler) in the following cases: - no communication qubit is
-        available; this method will resume when a
+        available and no pair is in flight; this method will resume when a
           SIGNAL_MEMORY_FREED is given (currently only the processor can do
           this)
         - when waiting for the EGP protocol to produce the next pair; this
@@ -286,65 +975,60 @@ class Netstack(ComponentProtocol):
 
         :param req: application request info (app ID and NetQASM array IDs)
         :param request: link layer request object
+        :param num_pooled: number of pairs that are taken from the pair pool
+            instead of being generated
         """
         num_pairs = request.number
 
-        app_mem = self.app_memories[req.app_id]
-        qubit_ids = app_mem.get_array(req.qubit_array_addr)
-
-        self._logger.info(f"putting CK request to EGP for {num_pairs} pairs")
-        self._logger.info(f"qubit IDs specified by application: {qubit_ids}")
-        self._logger.info(f"splitting request into {num_pairs} 1-pair requests")
+        if self._tracer.enabled:
+            app_mem = self.app_memories[req.app_id]
+            self._tracer.trace(
+                "ck_request",
+                peer_id=req.remote_node_id,
+                num_pairs=num_pairs,
+                num_pooled=num_pooled,
+                qubit_ids=app_mem.get_array(req.qubit_array_addr),
+            )
         request.number = 1
 
-        start_time = ns.sim_time()
+        yield from self._handle_ck_pairs(req, num_pairs, request, num_pooled)
 
-        for pair_index in range(num_pairs):
-            self._logger.info(f"trying to allocate comm qubit for pair {pair_index}")
-            while True:
-                try:
-                    phys_id = self.physical_memory.allocate_comm()
-                    break
-                except AllocError:
-                    self._logger.info("no comm qubit available, waiting...")
+    def _handle_md_pairs(
+        self,
+        req: Union[NetstackCreateRequest, NetstackReceiveRequest],
+        num_pairs: int,
+    ) -> Generator[EventExpression, None, None]:
+        """Wait for the pairs of a Measure Directly request that was put to the EGP
+        and write their results to the application's result array.
 
-                    # Wait for a signal indicating the communication qubit might be free
-                    # again.
-                    yield self.await_signal(
-                        sender=self._qnos.processor, signal_label=SIGNAL_MEMORY_FREED
-                    )
-                    self._logger.info(
-                        "a 'free' happened, trying again to allocate comm qubit..."
-                    )
+        Results are written as soon as their pair is delivered. The processor is
+        notified after every `md_result_chunk_size` pairs and after the last pair,
+        so that the application can start using results of earlier pairs while
+        later pairs are still being generated.
 
-            # Put the request to the EGP.
-            self._logger.info(f"putting CK request for pair {pair_index}")
-            current_egp = self._egp[req.remote_node_id]
-            current_egp.put(request)
+        If no communication qubit is available for the next pair, this method
+        waits until the processor frees one.
 
-            # Wait for a signal from the EGP.
-            self._logger.info(f"waiting for result for pair {pair_index}")
-            yield self.await_signal(
-                sender=current_egp, signal_label=ResCreateAndKeep.__name__
-            )
-            # Get the EGP's result.
-            result: ResCreateAndKeep = current_egp.get_signal_result(
-                ResCreateAndKeep.__name__, receiver=self
+        :param req: application request info (app ID and NetQASM array IDs)
+        :param num_pairs: number of pairs of the request
+        """
+        app_mem = self.app_memories[req.app_id]
+        socket = self._epr_socket_for(req)
+        start_time = ns.sim_time()
+        if self._metrics is not None:
+            self._metrics.record_queue_depth(
+                self._comp.node.name, self._peer_name(req.remote_node_id), num_pairs
             )
-            self._logger.info(f"got result for pair {pair_index}: {result}")
 
-            virt_id = app_mem.get_array_value(req.qubit_array_addr, pair_index)
-            app_mem.map_virt_id(virt_id, phys_id)
-            self._logger.info(
-                f"mapping virtual qubit {virt_id} to physical qubit {phys_id}"
-            )
+        # Length of response array slice for a single pair.
+        slice_len = SER_RESPONSE_MEASURE_LEN
 
-            gen_duration_ns_float = ns.sim_time() - start_time
-            gen_duration_us_int = int(gen_duration_ns_float / 1000)
-            self._logger.info(f"gen duration (us): {gen_duration_us_int}")
+        for pair_index in range(num_pairs):
+            phys_id = yield from self._allocate_comm_qubit(req.remote_node_id, socket)
 
-            # Length of response array slice for a single pair.
-            slice_len = SER_RESPONSE_KEEP_LEN
+            # For each pair, the EGP sends a separate result.
+            result = yield from self._receive_egp_md_result(req.remote_node_id)
+            self.physical_memory.free(phys_id)
 
             # Populate results array.
             for i in range(slice_len):
@@ -352,20 +1036,41 @@ class Netstack(ComponentProtocol):
                 value = -1
 
                 # Write corresponding result value to the other array elements.
-                if i == SER_RESPONSE_KEEP_IDX_GOODNESS:
-                    value = gen_duration_us_int
-                if i == SER_RESPONSE_KEEP_IDX_BELL_STATE:
-                    value = result.bell_state
+                if i == SER_RESPONSE_MEASURE_IDX_MEASUREMENT_OUTCOME:
+                    value = result.measurement_outcome
+                elif i == SER_RESPONSE_MEASURE_IDX_MEASUREMENT_BASIS:
+                    value = result.measurement_basis.value
+                elif i == SER_RESPONSE_KEEP_IDX_BELL_STATE:
+                    value = result.bell_state.value
 
                 # Calculate array element location.
                 arr_index = slice_len * pair_index + i
 
                 app_mem.set_array_value(req.result_array_addr, arr_index, value)
-            self._logger.debug(
-                f"wrote to @{req.result_array_addr}[{slice_len * pair_index}:"
-                f"{slice_len * pair_index + slice_len}] for app ID {req.app_id}"
-            )
-            self._send_processor_msg("wrote to array")
+            socket.num_pairs += 1
+            if self._tracer.enabled:
+                self._tracer.trace(
+                    "md_pair_delivered",
+                    app_id=req.app_id,
+                    pair_index=pair_index,
+                    outcome=result.measurement_outcome,
+                    bell_state=result.bell_state,
+                    array_addr=req.result_array_addr,
+                )
+            if self._metrics is not None:
+                self._metrics.record_pair(
+                    self._comp.node.name,
+                    self._peer_name(req.remote_node_id),
+                    ns.sim_time(),
+                    ns.sim_time() - start_time,
+                )
+
+            num_written = pair_index + 1
+            if (
+                num_written % self._md_result_chunk_size == 0
+                or num_written == num_pairs
+            ):
+                self._notify_processor()
 
     def handle_create_md_request(
         self, req: NetstackCreateRequest, request: ReqMeasureDirectly
@@ -398,53 +1103,7 @@ class Netstack(ComponentProtocol):
         current_egp = self._egp[req.remote_node_id]
         current_egp.put(request)
 
-        results: List[ResMeasureDirectly] = []
-
-        # Wait for all pairs to be created. For each pair, the EGP sends a separate
-        # signal that is awaited here. Only after the last pair, we write the results
-        # to the array. This is done since the whole request (i.e. all pairs) is
-        # expected to finish in a short time anyway. However, writing results for a
-        # pair as soon as they are done may be implemented in the future.
-        for _ in range(request.number):
-            phys_id = self.physical_memory.allocate_comm()
-
-            yield self.await_signal(
-                sender=current_egp, signal_label=ResMeasureDirectly.__name__
-            )
-            result: ResMeasureDirectly = current_egp.get_signal_result(
-                ResMeasureDirectly.__name__, receiver=self
-            )
-            self._logger.debug(f"bell index: {result.bell_state}")
-            results.append(result)
-            self.physical_memory.free(phys_id)
-
-        app_mem = self.app_memories[req.app_id]
-
-        # Length of response array slice for a single pair.
-        slice_len = SER_RESPONSE_MEASURE_LEN
-
-        # Populate results array.
-        for pair_index in range(request.number):
-            result = results[pair_index]
-
-            for i in range(slice_len):
-                # Write -1 to unused array elements.
-                value = -1
-
-                # Write corresponding result value to the other array elements.
-                if i == SER_RESPONSE_MEASURE_IDX_MEASUREMENT_OUTCOME:
-                    value = result.measurement_outcome
-                elif i == SER_RESPONSE_MEASURE_IDX_MEASUREMENT_BASIS:
-                    value = result.measurement_basis.value
-                elif i == SER_RESPONSE_KEEP_IDX_BELL_STATE:
-                    value = result.bell_state.value
-
-                # Calculate array element location.
-                arr_index = slice_len * pair_index + i
-
-                app_mem.set_array_value(req.result_array_addr, arr_index, value)
-
-        self._send_processor_msg("wrote to array")
+        yield from self._handle_md_pairs(req, request.number)
 
     def handle_create_request(
         self, req: NetstackCreateRequest
@@ -467,19 +1126,44 @@ class Netstack(ComponentProtocol):
         request = self._construct_request(req.remote_node_id, args)
 
         peer_id = req.remote_node_id
-        # Send it to the receiver node and wait for an acknowledgement.
-        self._send_peer_msg(peer_id, request)
-        peer_msg = yield from self._receive_peer_msg(peer_id)
-        self._logger.debug(f"received peer msg: {peer_msg}")
+
+        # Decide how many pairs are taken from the pair pool. The remote node
+        # takes the same number of pairs from its own pool. Pooled pairs are
+        # delivered at once, so a sequential request can only take its first pair
+        # from the pool.
+        num_pooled = 0
+        if isinstance(request, ReqCreateAndKeep):
+            num_pooled = min(request.number, len(self._pair_pools[peer_id]))
+            if not self._has_distinct_qubits(req, request.number):
+                num_pooled = min(num_pooled, 1)
+
+        if peer_id in self._sessions:
+            # Send it to the receiver node, which matches it with its own request
+            # by sequence number. Do not wait for an acknowledgement: the EGP
+            # delivers the pairs once the receiver node has put its request.
+            seq = self._next_seq_out[peer_id]
+            self._next_seq_out[peer_id] += 1
+            self._send_peer_msg(
+                peer_id, PeerCreateRequest(request, num_pooled, seq=seq)
+            )
+        else:
+            # Send it to the receiver node and wait for an acknowledgement.
+            self._send_peer_msg(peer_id, PeerCreateRequest(request, num_pooled))
+            yield from self._receive_peer_ack(peer_id)
+            if self._session_mode:
+                self._sessions.add(peer_id)
 
         # Handle the request.
         if isinstance(request, ReqCreateAndKeep):
-            yield from self.handle_create_ck_request(req, request)
+            yield from self.handle_create_ck_request(req, request, num_pooled)
         elif isinstance(request, ReqMeasureDirectly):
             yield from self.handle_create_md_request(req, request)
 
     def handle_receive_ck_request(
-        self, req: NetstackReceiveRequest, request: ReqCreateAndKeep
+        self,
+        req: NetstackReceiveRequest,
+        request: ReqCreateAndKeep,
+        num_pooled: int = 0,
     ) -> Generator[EventExpression, None, None]:
         """Handle a Create and Keep request as the receiver, until all pairs have
         been created.
@@ -491,9 +1175,12 @@ class Netstack(ComponentProtocol):
         it is assumed that the *other* node applies local gates such that the
         final delivered pair is always Phi+.
 
+        Like on the creator side, up to `max_pipelined_pairs` pairs are in flight
+        at the same time.
+
         The method can yield (i.e. give control back to the simulator scheduler)
-        in the following cases: - no communication qubit is available; this
-        method will resume when a
+        in the following cases: - no communication qubit is available and no
+        pair is in flight; this method will resume when a
           SIGNAL_MEMORY_FREED is given (currently only the processor can do
           this)
         - when waiting for the EGP protocol to produce the next pair; this
@@ -504,84 +1191,24 @@ class Netstack(ComponentProtocol):
 
         :param req: application request info (app ID and NetQASM array IDs)
         :param request: link layer request object
+        :param num_pooled: number of pairs that are taken from the pair pool
+            instead of being generated, as decided by the creator
         """
         assert isinstance(request, ReqCreateAndKeep)
 
         num_pairs = request.number
 
-        self._logger.info(f"putting CK request to EGP for {num_pairs} pairs")
-        self._logger.info(f"splitting request into {num_pairs} 1-pair requests")
-
-        start_time = ns.sim_time()
-
-        for pair_index in range(num_pairs):
-            self._logger.info(f"trying to allocate comm qubit for pair {pair_index}")
-            while True:
-                try:
-                    phys_id = self.physical_memory.allocate_comm()
-                    break
-                except AllocError:
-                    self._logger.info("no comm qubit available, waiting...")
-
-                    # Wait for a signal indicating the communication qubit might be free
-                    # again.
-                    yield self.await_signal(
-                        sender=self._qnos.processor, signal_label=SIGNAL_MEMORY_FREED
-                    )
-                    self._logger.info(
-                        "a 'free' happened, trying again to allocate comm qubit..."
-                    )
-
-            # Put the request to the EGP.
-            current_egp = self._egp[req.remote_node_id]
-
-            self._logger.info(f"putting CK request for pair {pair_index}")
-            current_egp.put(ReqReceive(remote_node_id=req.remote_node_id))
-            self._logger.info(f"waiting for result for pair {pair_index}")
-
-            # Wait for a signal from the EGP.
-            yield self.await_signal(
-                sender=current_egp, signal_label=ResCreateAndKeep.__name__
-            )
-            # Get the EGP's result.
-            result: ResCreateAndKeep = current_egp.get_signal_result(
-                ResCreateAndKeep.__name__, receiver=self
-            )
-            self._logger.info(f"got result for pair {pair_index}: {result}")
-
-            app_mem = self.app_memories[req.app_id]
-            virt_id = app_mem.get_array_value(req.qubit_array_addr, pair_index)
-            app_mem.map_virt_id(virt_id, phys_id)
-            self._logger.info(
-                f"mapping virtual qubit {virt_id} to physical qubit {phys_id}"
+        if self._tracer.enabled:
+            self._tracer.trace(
+                "ck_request",
+                peer_id=req.remote_node_id,
+                num_pairs=num_pairs,
+                num_pooled=num_pooled,
             )
 
-            gen_duration_ns_float = ns.sim_time() - start_time
-            gen_duration_us_int = int(gen_duration_ns_float / 1000)
-            self._logger.info(f"gen duration (us): {gen_duration_us_int}")
-
-            # Length of response array slice for a single pair.
-            slice_len = SER_RESPONSE_KEEP_LEN
-
-            for i in range(slice_len):
-                # Write -1 to unused array elements.
-                value = -1
-
-                # Write corresponding result value to the other array elements.
-                if i == SER_RESPONSE_KEEP_IDX_GOODNESS:
-                    value = gen_duration_us_int
-                if i == SER_RESPONSE_KEEP_IDX_BELL_STATE:
-                    value = result.bell_state.value
-
-                # Calculate array element location.
-                arr_index = slice_len * pair_index + i
-
-                app_mem.set_array_value(req.result_array_addr, arr_index, value)
-            self._logger.debug(
-                f"wrote to @{req.result_array_addr}[{slice_len * pair_index}:"
-                f"{slice_len * pair_index + slice_len}] for app ID {req.app_id}"
-            )
-            self._send_processor_msg("wrote to array")
+        yield from self._handle_ck_pairs(
+            req, num_pairs, ReqReceive(remote_node_id=req.remote_node_id), num_pooled
+        )
 
     def handle_receive_md_request(
         self, req: NetstackReceiveRequest, request: ReqMeasureDirectly
@@ -616,48 +1243,7 @@ class Netstack(ComponentProtocol):
 
         current_egp.put(ReqReceive(remote_node_id=req.remote_node_id))
 
-        results: List[ResMeasureDirectly] = []
-
-        for _ in range(request.number):
-            phys_id = self.physical_memory.allocate_comm()
-
-            yield self.await_signal(
-                sender=current_egp, signal_label=ResMeasureDirectly.__name__
-            )
-            result: ResMeasureDirectly = current_egp.get_signal_result(
-                ResMeasureDirectly.__name__, receiver=self
-            )
-            results.append(result)
-
-            self.physical_memory.free(phys_id)
-
-        app_mem = self.app_memories[req.app_id]
-
-        # Length of response array slice for a single pair.
-        slice_len = SER_RESPONSE_MEASURE_LEN
-
-        # Populate results array.
-        for pair_index in range(request.number):
-            result = results[pair_index]
-
-            for i in range(slice_len):
-                # Write -1 to unused array elements.
-                value = -1
-
-                # Write corresponding result value to the other array elements.
-                if i == SER_RESPONSE_MEASURE_IDX_MEASUREMENT_OUTCOME:
-                    value = result.measurement_outcome
-                elif i == SER_RESPONSE_MEASURE_IDX_MEASUREMENT_BASIS:
-                    value = result.measurement_basis.value
-                elif i == SER_RESPONSE_KEEP_IDX_BELL_STATE:
-                    value = result.bell_state.value
-
-                # Calculate array element location.
-                arr_index = slice_len * pair_index + i
-
-                app_mem.set_array_value(req.result_array_addr, arr_index, value)
-
-            self._send_processor_msg("wrote to array")
+        yield from self._handle_md_pairs(req, request.number)
 
     def handle_receive_request(
         self, req: NetstackReceiveRequest
@@ -676,24 +1262,139 @@ class Netstack(ComponentProtocol):
         # Wait for the network stack in the remote node to get the corresponding
         # 'create' request from its local application and send it to us.
         # NOTE: we do not check if the request from the other node matches our own
-        # request. Also, we simply block until synchronizing with the other node,
-        # and then fully handle the request. There is no support for queueing
-        # and/or interleaving multiple different requests.
-        create_request = yield from self._receive_peer_msg(req.remote_node_id)
-        self._logger.debug(f"received {create_request} from peer")
-
-        # Acknowledge to the remote node that we received the request and we will
-        # start handling it.
-        self._logger.debug("sending 'ready' to peer")
-        self._send_peer_msg(req.remote_node_id, "ready")
+        # request. We block until synchronizing with the other node, and then fully
+        # handle the request. Other requests with the same node are queued by the
+        # `PeerRequestHandler` in the meantime.
+        peer_msg = yield from self._receive_peer_create(req.remote_node_id)
+        create_request = peer_msg.request
+
+        if peer_msg.seq is None:
+            # Acknowledge to the remote node that we received the request and we
+            # will start handling it.
+            self._send_peer_msg(req.remote_node_id, "ready")
+        else:
+            # The remote node did not wait for us. Check that we handle its
+            # requests in the order in which it issued them.
+            expected_seq = self._next_seq_in[req.remote_node_id]
+            if peer_msg.seq != expected_seq:
+                raise RuntimeError(
+                    f"Received request {peer_msg.seq} of session with node "
+                    f"{req.remote_node_id}, expected request {expected_seq}"
+                )
+            self._next_seq_in[req.remote_node_id] += 1
 
         # Handle the request, based on the type that we now know because of the
         # other node.
         if isinstance(create_request, ReqCreateAndKeep):
-            yield from self.handle_receive_ck_request(req, create_request)
+            yield from self.handle_receive_ck_request(
+                req, create_request, peer_msg.num_pooled
+            )
         elif isinstance(create_request, ReqMeasureDirectly):
             yield from self.handle_receive_md_request(req, create_request)
 
+    def _add_to_pair_pool(
+        self, peer_id: int, phys_id: int, result: ResCreateAndKeep
+    ) -> None:
+        self._pair_pools[peer_id].append((phys_id, result))
+        if self._tracer.enabled:
+            self._tracer.trace("pool_pair_added", peer_id=peer_id, phys_id=phys_id)
+
+    def refill_pair_pool(self, peer_id: int) -> Generator[EventExpression, None, int]:
+        """Generate pairs with a remote node until the pair pool is full, as far as
+        there are free communication qubits on both nodes.
+
+        :param peer_id: ID of the remote node
+        :return: number of pairs that were added to the pool
+        """
+        assert self._initiates_pool_refills(peer_id)
+        pool_deficit = self._pair_pool_sizes[peer_id] - len(self._pair_pools[peer_id])
+        num_pairs = min(pool_deficit, self.physical_memory.free_comm_qubit_count)
+        if num_pairs <= 0:
+            return 0
+
+        request = ReqCreateAndKeep(
+            remote_node_id=peer_id, number=num_pairs, minimum_fidelity=MINIMUM_FIDELITY
+        )
+        self._logger.info(
+            f"requesting {num_pairs} pairs for the pool for peer {peer_id}"
+        )
+        self._send_peer_msg(peer_id, PeerCreateRequest(request, refill=True))
+
+        # The remote node replies with the number of pairs it has room for.
+        num_accepted = yield from self._receive_peer_ack(peer_id)
+        assert isinstance(num_accepted, int)
+
+        yield from self._generate_ck_pairs(
+            peer_id,
+            num_accepted,
+            ReqCreateAndKeep(
+                remote_node_id=peer_id, number=1, minimum_fidelity=MINIMUM_FIDELITY
+            ),
+            on_pair=lambda _, phys_id, result: self._add_to_pair_pool(
+                peer_id, phys_id, result
+            ),
+        )
+        return num_accepted
+
+    def _accept_pool_refill(
+        self, peer_id: int, msg: PeerCreateRequest
+    ) -> Generator[EventExpression, None, None]:
+        """Generate pairs for the pair pool, as requested by the remote node.
+
+        :param peer_id: ID of the remote node
+        :param msg: refill request of the remote node
+        """
+        num_pairs = min(msg.request.number, self.physical_memory.free_comm_qubit_count)
+        self._logger.info(
+            f"accepting {num_pairs} pairs for the pool for peer {peer_id}"
+        )
+        self._send_peer_msg(peer_id, num_pairs)
+
+        yield from self._generate_ck_pairs(
+            peer_id,
+            num_pairs,
+            ReqReceive(remote_node_id=peer_id),
+            on_pair=lambda _, phys_id, result: self._add_to_pair_pool(
+                peer_id, phys_id, result
+            ),
+        )
+
+    def handle_peer_msg(self, peer_id: int) -> Generator[EventExpression, None, None]:
+        """Handle a message from the network stack of a remote node that arrives
+        while no request with that node is being handled. Pool refills are handled
+        immediately, other messages are kept until a request needs them.
+
+        :param peer_id: ID of the remote node
+        """
+        msg = yield from self._receive_peer_msg(peer_id)
+        if isinstance(msg, PeerCreateRequest) and msg.refill:
+            yield from self._accept_pool_refill(peer_id, msg)
+        else:
+            self._stashed_peer_msgs[peer_id].append(msg)
+
+    def handle_request(
+        self, req: Union[NetstackCreateRequest, NetstackReceiveRequest]
+    ) -> Generator[EventExpression, None, None]:
+        """Fully handle an entanglement request that the processor issued.
+
+        :param req: request info
+        """
+        start_time = ns.sim_time()
+        if isinstance(req, NetstackCreateRequest):
+            yield from self.handle_create_request(req)
+        elif isinstance(req, NetstackReceiveRequest):
+            yield from self.handle_receive_request(req)
+
+        socket = self._epr_socket_for(req)
+        socket.num_requests += 1
+        socket.total_gen_time += ns.sim_time() - start_time
+        if self._tracer.enabled:
+            self._tracer.trace(
+                "request_done",
+                peer_id=req.remote_node_id,
+                duration=ns.sim_time() - start_time,
+            )
+
     def handle_breakpoint_create_request(
         self,
     ) -> Generator[EventExpression, None, None]:
@@ -752,15 +1453,15 @@ class Netstack(ComponentProtocol):
         while True:
             # Wait for a new message.
             msg = yield from self._receive_processor_msg()
-            self._logger.debug(f"received new msg from processor: {msg}")
-
-            # Handle it.
-            if isinstance(msg, NetstackCreateRequest):
-                yield from self.handle_create_request(msg)
-                self._logger.debug("create request done")
-            elif isinstance(msg, NetstackReceiveRequest):
-                yield from self.handle_receive_request(msg)
-                self._logger.debug("receive request done")
+            if self._tracer.enabled:
+                self._tracer.trace("processor_msg", msg=msg)
+
+            # Handle it. Entanglement requests are queued at the handler of the
+            # remote node, so that this loop can immediately accept new messages.
+            if isinstance(msg, NetstackCreateRequest) or isinstance(
+                msg, NetstackReceiveRequest
+            ):
+                self._peer_handlers[msg.remote_node_id].put(msg)
             elif isinstance(msg, NetstackBreakpointCreateRequest):
                 yield from self.handle_breakpoint_create_request()
                 self._logger.debug("breakpoint create request done")
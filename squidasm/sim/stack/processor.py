@@ -1,9 +1,18 @@
 from __future__ import annotations
 
 import math
-from typing import TYPE_CHECKING, Dict, Generator, Optional, Union
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Generator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
-import netsquid as ns
 from netqasm.lang.instr import NetQASMInstruction, core, nv, vanilla
 from netqasm.lang.operand import Register
 from netqasm.lang.subroutine import Subroutine
@@ -55,6 +64,9 @@ if TYPE_CHECKING:
 PI = math.pi
 PI_OVER_2 = math.pi / 2
 
+# Gate as (NetSquid instruction, physical qubit IDs, instruction parameters).
+T_Gate = Tuple[NsInstr, List[int], Dict[str, Any]]
+
 
 class ProcessorComponent(Component):
     """NetSquid component representing a QNodeOS processor.
@@ -104,6 +116,24 @@ class ProcessorComponent(Component):
 class Processor(ComponentProtocol):
     """NetSquid protocol representing a QNodeOS processor."""
 
+    # Instructions that only act on classical memory. They neither act on qubits
+    # nor interact with other components.
+    _CLASSICAL_INSTRUCTIONS = (
+        core.SetInstruction,
+        core.LeaInstruction,
+        core.LoadInstruction,
+        core.StoreInstruction,
+        core.UndefInstruction,
+        core.ArrayInstruction,
+        core.ClassicalOpInstruction,
+        core.ClassicalOpModInstruction,
+        core.JmpInstruction,
+        core.BranchUnaryInstruction,
+        core.BranchBinaryInstruction,
+        core.RetRegInstruction,
+        core.RetArrInstruction,
+    )
+
     def __init__(self, comp: ProcessorComponent, qnos: Qnos) -> None:
         """Processor protocol constructor. Typically created indirectly through
         constructing a `Qnos` instance.
@@ -126,6 +156,62 @@ class Processor(ComponentProtocol):
 
         self.add_signal(SIGNAL_MEMORY_FREED)
 
+        # Modelled time (ns) to process a single instruction, and the processing
+        # time of instructions that was not yet spent in simulation.
+        self._instr_proc_time: float = 0
+        self._pending_proc_time: float = 0
+
+        # Whether wait_all instructions are deferred, such that instructions that
+        # do not depend on pending entanglement results can proceed.
+        self._scoreboarding: bool = False
+
+        # Array slices of deferred wait_all instructions, as
+        # (app ID, address, start, end), that are not yet fully written.
+        self._pending_slices: List[Tuple[int, int, int, int]] = []
+
+        # Address of the qubit array of each EPR request, by
+        # (app ID, result array address). Only kept when scoreboarding, until the
+        # request is complete or its result array is reallocated.
+        self._epr_qubit_arrays: Dict[Tuple[int, int], Optional[int]] = {}
+
+        # Single-gate programs, by gate, qubits and the integer operands (n, d) of
+        # the rotation angle, if any. Programs are reused, since NetSquid allows
+        # executing a program multiple times.
+        self._gate_programs: Dict[
+            Tuple[NsInstr, Tuple[int, ...], Optional[Tuple[int, int]]], QuantumProgram
+        ] = {}
+
+    @property
+    def instr_proc_time(self) -> float:
+        """Modelled time (ns) it takes to process a single instruction. Processing
+        times of consecutive classical instructions are spent at once, before the
+        next instruction that interacts with the quantum device, the network
+        stack or the handler."""
+        return self._instr_proc_time
+
+    @instr_proc_time.setter
+    def instr_proc_time(self, value: float) -> None:
+        if value < 0:
+            raise ValueError(f"instr_proc_time must be non-negative, not {value}")
+        self._instr_proc_time = value
+
+    def _spend_proc_time(self) -> Generator[EventExpression, None, None]:
+        """Let the processing time of the instructions so far pass in simulation."""
+        if self._pending_proc_time > 0:
+            yield self.await_timer(self._pending_proc_time)
+            self._pending_proc_time = 0
+
+    @property
+    def scoreboarding(self) -> bool:
+        """Whether this processor defers wait_all instructions. If so, execution
+        only stalls on instructions that use array entries or qubits of pending
+        entanglement requests, and on the end of the subroutine."""
+        return self._scoreboarding
+
+    @scoreboarding.setter
+    def scoreboarding(self, value: bool) -> None:
+        self._scoreboarding = value
+
     @property
     def app_memories(self) -> Dict[int, AppMemory]:
         """Get a dictionary of app IDs to application memories."""
@@ -142,26 +228,27 @@ class Processor(ComponentProtocol):
         return self._comp.qdevice
 
     def _send_handler_msg(self, msg: str) -> None:
-        self._comp.handler_out_port.tx_output(msg)
+        self._send_msg("handler", self._comp.handler_out_port, msg)
 
     def _receive_handler_msg(self) -> Generator[EventExpression, None, str]:
         return (yield from self._receive_msg("handler", SIGNAL_HAND_PROC_MSG))
 
     def _send_netstack_msg(self, msg: str) -> None:
-        self._comp.netstack_out_port.tx_output(msg)
+        self._send_msg("netstack", self._comp.netstack_out_port, msg)
 
     def _receive_netstack_msg(self) -> Generator[EventExpression, None, str]:
         return (yield from self._receive_msg("netstack", SIGNAL_NSTK_PROC_MSG))
 
     def _flush_netstack_msgs(self) -> None:
-        self._listeners["netstack"].buffer.clear()
+        self._drain_msgs("netstack")
 
     def run(self) -> Generator[EventExpression, None, None]:
         """Run this protocol. Automatically called by NetSquid during simulation."""
         while True:
             subroutine = yield from self._receive_handler_msg()
             # assert isinstance(subroutine, Subroutine)
-            self._logger.debug(f"received new subroutine from handler: {subroutine}")
+            if self._tracer.enabled:
+                self._tracer.trace("subroutine", subroutine=subroutine)
 
             yield from self.execute_subroutine(subroutine)
 
@@ -177,9 +264,18 @@ class Processor(ComponentProtocol):
         app_mem.set_prog_counter(0)
         while app_mem.prog_counter < len(subroutine.instructions):
             instr = subroutine.instructions[app_mem.prog_counter]
-            self._logger.debug(
-                f"{ns.sim_time()} interpreting instruction {instr} at line {app_mem.prog_counter}"
-            )
+            if self._tracer.enabled:
+                self._tracer.trace(
+                    "instr", app_id=app_id, line=app_mem.prog_counter, instr=instr
+                )
+
+            if self._scoreboarding:
+                yield from self._stall_on_pending(app_id, instr)
+
+            if self._instr_proc_time > 0:
+                self._pending_proc_time += self._instr_proc_time
+                if not isinstance(instr, self._CLASSICAL_INSTRUCTIONS):
+                    yield from self._spend_proc_time()
 
             if (
                 isinstance(instr, core.JmpInstruction)
@@ -187,12 +283,154 @@ class Processor(ComponentProtocol):
                 or isinstance(instr, core.BranchBinaryInstruction)
             ):
                 self._interpret_branch_instr(app_id, instr)
+            elif self._scoreboarding and isinstance(instr, core.WaitAllInstruction):
+                self._defer_wait_all(app_id, instr)
+                app_mem.increment_prog_counter()
             else:
                 generator = self._interpret_instruction(app_id, instr)
                 if generator:
                     yield from generator
                 app_mem.increment_prog_counter()
 
+        if self._scoreboarding:
+            # Results are returned to the host at the end of the subroutine, so all
+            # of them must be there.
+            yield from self._wait_for_pending_slices(app_id)
+
+        yield from self._spend_proc_time()
+
+    def _defer_wait_all(self, app_id: int, instr: core.WaitAllInstruction) -> None:
+        app_mem = self.app_memories[app_id]
+        assert isinstance(instr.slice.start, Register)
+        assert isinstance(instr.slice.stop, Register)
+        start: int = app_mem.get_reg_value(instr.slice.start)
+        end: int = app_mem.get_reg_value(instr.slice.stop)
+        addr: int = instr.slice.address.address
+        if self._tracer.enabled:
+            self._tracer.trace(
+                "wait_deferred", app_id=app_id, addr=addr, start=start, end=end
+            )
+        self._pending_slices.append((app_id, addr, start, end))
+
+    def _update_pending_slices(self) -> None:
+        """Remove the pending array slices that have been fully written. If the
+        whole result array of an EPR request has been written, the request is
+        complete and its qubit array is no longer tracked."""
+        pending = []
+        for (app_id, addr, start, end) in self._pending_slices:
+            app_mem = self.app_memories[app_id]
+            if any(v is None for v in app_mem.get_array_values(addr, start, end)):
+                pending.append((app_id, addr, start, end))
+            elif (app_id, addr) in self._epr_qubit_arrays and all(
+                v is not None for v in app_mem.get_array(addr)
+            ):
+                del self._epr_qubit_arrays[(app_id, addr)]
+        self._pending_slices = pending
+
+    def clear_application(self, app_id: int) -> None:
+        """Forget the pending entanglement requests of an application whose
+        memory is cleared."""
+        self._pending_slices = [s for s in self._pending_slices if s[0] != app_id]
+        for key in [k for k in self._epr_qubit_arrays if k[0] == app_id]:
+            del self._epr_qubit_arrays[key]
+
+    def _qubit_registers(self, instr: NetQASMInstruction) -> List[Register]:
+        if isinstance(
+            instr, (core.TwoQubitInstruction, core.ControlledRotationInstruction)
+        ):
+            return [instr.reg0, instr.reg1]
+        elif isinstance(instr, core.MeasInstruction):
+            return [instr.qreg]
+        elif isinstance(
+            instr,
+            (
+                core.SingleQubitInstruction,
+                core.RotationInstruction,
+                core.InitInstruction,
+                core.QAllocInstruction,
+                core.QFreeInstruction,
+            ),
+        ):
+            return [instr.reg]
+        return []
+
+    def _array_addresses(self, app_id: int, instr: NetQASMInstruction) -> List[int]:
+        """Addresses of the arrays that an instruction uses as a whole."""
+        app_mem = self.app_memories[app_id]
+        if isinstance(instr, (core.ArrayInstruction, core.RetArrInstruction)):
+            return [instr.address.address]
+        elif isinstance(instr, core.CreateEPRInstruction):
+            regs = [instr.qubit_addr_array, instr.arg_array, instr.ent_results_array]
+        elif isinstance(instr, core.RecvEPRInstruction):
+            regs = [instr.qubit_addr_array, instr.ent_results_array]
+        else:
+            return []
+        return [app_mem.get_reg_value(reg) for reg in regs]
+
+    def _depends_on_pending(self, app_id: int, instr: NetQASMInstruction) -> bool:
+        """Whether an instruction uses an array entry or qubit that a pending
+        entanglement request has not yet written or delivered."""
+        self._update_pending_slices()
+        pending = [
+            (addr, start, end)
+            for (pending_app_id, addr, start, end) in self._pending_slices
+            if pending_app_id == app_id
+        ]
+        if len(pending) == 0:
+            return False
+        app_mem = self.app_memories[app_id]
+
+        if isinstance(
+            instr,
+            (core.LoadInstruction, core.StoreInstruction, core.UndefInstruction),
+        ):
+            addr, index = app_mem.expand_array_part(instr.entry)
+            if app_mem.get_array_value(addr, index) is None and any(
+                addr == p_addr and start <= index < end
+                for (p_addr, start, end) in pending
+            ):
+                return True
+
+        addresses = self._array_addresses(app_id, instr)
+        if any(p_addr in addresses for (p_addr, _, _) in pending):
+            return True
+
+        qubit_regs = self._qubit_registers(instr)
+        if len(qubit_regs) > 0:
+            virt_ids = [app_mem.get_reg_value(reg) for reg in qubit_regs]
+            for (p_addr, _, _) in pending:
+                qubit_array_addr = self._epr_qubit_arrays.get((app_id, p_addr))
+                if qubit_array_addr is None:
+                    continue
+                pending_qubits = app_mem.get_array(qubit_array_addr)
+                for virt_id in virt_ids:
+                    if (
+                        virt_id in pending_qubits
+                        and app_mem.phys_id_for(virt_id) is None
+                    ):
+                        return True
+
+        return False
+
+    def _stall_on_pending(
+        self, app_id: int, instr: NetQASMInstruction
+    ) -> Generator[EventExpression, None, None]:
+        while self._depends_on_pending(app_id, instr):
+            if self._tracer.enabled:
+                self._tracer.trace("stall", app_id=app_id, instr=instr)
+            yield from self._receive_netstack_msg()
+            self._drain_msgs("netstack")
+
+    def _wait_for_pending_slices(
+        self, app_id: int
+    ) -> Generator[EventExpression, None, None]:
+        while True:
+            self._update_pending_slices()
+            if all(p_app_id != app_id for (p_app_id, _, _, _) in self._pending_slices):
+                break
+            yield from self._receive_netstack_msg()
+        self._flush_netstack_msgs()
+
     def _interpret_instruction(
         self, app_id: int, instr: NetQASMInstruction
     ) -> Optional[Generator[EventExpression, None, None]]:
@@ -283,7 +521,8 @@ class Processor(ComponentProtocol):
             raise ValueError
 
     def _interpret_set(self, app_id: int, instr: core.SetInstruction) -> None:
-        self._logger.debug(f"Set register {instr.reg} to {instr.imm}")
+        if self._tracer.enabled:
+            self._tracer.trace("set", reg=instr.reg, value=instr.imm.value)
         self.app_memories[app_id].set_reg_value(instr.reg, instr.imm.value)
 
     def _interpret_qalloc(self, app_id: int, instr: core.QAllocInstruction) -> None:
@@ -292,19 +531,21 @@ class Processor(ComponentProtocol):
         virt_id = app_mem.get_reg_value(instr.reg)
         if virt_id is None:
             raise RuntimeError(f"qubit address in register {instr.reg} is not defined")
-        self._logger.debug(f"Allocating qubit with virtual ID {virt_id}")
 
         phys_id = self.physical_memory.allocate()
         app_mem.map_virt_id(virt_id, phys_id)
+        if self._tracer.enabled:
+            self._tracer.trace("qalloc", virt_id=virt_id, phys_id=phys_id)
 
     def _interpret_qfree(self, app_id: int, instr: core.QFreeInstruction) -> None:
         app_mem = self.app_memories[app_id]
 
         virt_id = app_mem.get_reg_value(instr.reg)
         assert virt_id is not None
-        self._logger.debug(f"Freeing virtual qubit {virt_id}")
         phys_id = app_mem.phys_id_for(virt_id)
         assert phys_id is not None
+        if self._tracer.enabled:
+            self._tracer.trace("qfree", virt_id=virt_id, phys_id=phys_id)
         app_mem.unmap_virt_id(virt_id)
         self.physical_memory.free(phys_id)
         self.send_signal(SIGNAL_MEMORY_FREED)
@@ -316,11 +557,8 @@ class Processor(ComponentProtocol):
         value = app_mem.get_reg_value(instr.reg)
         if value is None:
             raise RuntimeError(f"value in register {instr.reg} is not defined")
-        self._logger.debug(
-            f"Storing value {value} from register {instr.reg} "
-            f"to array entry {instr.entry}"
-        )
-
+        if self._tracer.enabled:
+            self._tracer.trace("store", reg=instr.reg, entry=instr.entry, value=value)
         app_mem.set_array_entry(instr.entry, value)
 
     def _interpret_load(self, app_id: int, instr: core.LoadInstruction) -> None:
@@ -329,23 +567,20 @@ class Processor(ComponentProtocol):
         value = app_mem.get_array_entry(instr.entry)
         if value is None:
             raise RuntimeError(f"array value at {instr.entry} is not defined")
-        self._logger.debug(
-            f"Storing value {value} from array entry {instr.entry} "
-            f"to register {instr.reg}"
-        )
-
+        if self._tracer.enabled:
+            self._tracer.trace("load", entry=instr.entry, reg=instr.reg, value=value)
         app_mem.set_reg_value(instr.reg, value)
 
     def _interpret_lea(self, app_id: int, instr: core.LeaInstruction) -> None:
         app_mem = self.app_memories[app_id]
-        self._logger.debug(
-            f"Storing address of {instr.address} to register {instr.reg}"
-        )
+        if self._tracer.enabled:
+            self._tracer.trace("lea", reg=instr.reg, address=instr.address)
         app_mem.set_reg_value(instr.reg, instr.address.address)
 
     def _interpret_undef(self, app_id: int, instr: core.UndefInstruction) -> None:
         app_mem = self.app_memories[app_id]
-        self._logger.debug(f"Unset array entry {instr.entry}")
+        if self._tracer.enabled:
+            self._tracer.trace("undef", entry=instr.entry)
         app_mem.set_array_entry(instr.entry, None)
 
     def _interpret_array(self, app_id: int, instr: core.ArrayInstruction) -> None:
@@ -353,11 +588,12 @@ class Processor(ComponentProtocol):
 
         length = app_mem.get_reg_value(instr.size)
         assert length is not None
-        self._logger.debug(
-            f"Initializing an array of length {length} at address {instr.address}"
-        )
-
+        if self._tracer.enabled:
+            self._tracer.trace("array", address=instr.address, length=length)
         app_mem.init_new_array(instr.address.address, length)
+        # A new array at the address of an earlier EPR result array does not
+        # belong to that request.
+        self._epr_qubit_arrays.pop((app_id, instr.address.address), None)
 
     def _interpret_branch_instr(
         self,
@@ -387,18 +623,19 @@ class Processor(ComponentProtocol):
             condition = instr.check_condition(a, b)
 
         if condition:
-            jump_address = instr.line
-            self._logger.debug(
-                f"Branching to line {jump_address}, since {instr}(a={a}, b={b}) "
-                f"is True, with values from registers {registers}"
-            )
-            app_mem.set_prog_counter(jump_address.value)
+            app_mem.set_prog_counter(instr.line.value)
         else:
-            self._logger.debug(
-                f"Don't branch, since {instr}(a={a}, b={b}) "
-                f"is False, with values from registers {registers}"
-            )
             app_mem.increment_prog_counter()
+        if self._tracer.enabled:
+            self._tracer.trace(
+                "branch",
+                instr=instr,
+                taken=condition,
+                line=instr.line.value,
+                a=a,
+                b=b,
+                registers=registers,
+            )
 
     def _interpret_binary_classical_instr(
         self,
@@ -419,11 +656,16 @@ class Processor(ComponentProtocol):
         assert a is not None
         assert b is not None
         value = self._compute_binary_classical_instr(instr, a, b, mod=mod)
-        mod_str = "" if mod is None else f"(mod {mod})"
-        self._logger.debug(
-            f"Performing {instr} of a={a} and b={b} {mod_str} "
-            f"and storing the value {value} at register {instr.regout}"
-        )
+        if self._tracer.enabled:
+            self._tracer.trace(
+                "classical_op",
+                instr=instr,
+                a=a,
+                b=b,
+                mod=mod,
+                value=value,
+                regout=instr.regout,
+            )
         app_mem.set_reg_value(instr.regout, value)
 
     def _compute_binary_classical_instr(
@@ -460,13 +702,13 @@ class Processor(ComponentProtocol):
             n=instr.angle_num.value,
             d=instr.angle_denom.value,
         )
-        self._logger.debug(
-            f"Performing {instr} with angle {angle} on virtual qubit "
-            f"{virt_id} (physical ID: {phys_id})"
+        if self._tracer.enabled:
+            self._tracer.trace(
+                "gate", instr=instr, angle=angle, virt_ids=[virt_id], phys_ids=[phys_id]
+            )
+        yield from self._execute_gate(
+            ns_instr, [phys_id], (instr.angle_num.value, instr.angle_denom.value)
         )
-        prog = QuantumProgram()
-        prog.apply(ns_instr, qubit_indices=[phys_id], angle=angle)
-        yield self.qdevice.execute_program(prog)
 
     def _interpret_single_rotation_instr(
         self, app_id: int, instr: nv.RotXInstruction
@@ -488,19 +730,57 @@ class Processor(ComponentProtocol):
             n=instr.angle_num.value,
             d=instr.angle_denom.value,
         )
-        self._logger.debug(
-            f"Performing {instr} with angle {angle} on virtual qubits "
-            f"{virt_id0} and {virt_id1} (physical IDs: {phys_id0} and {phys_id1})"
+        if self._tracer.enabled:
+            self._tracer.trace(
+                "gate",
+                instr=instr,
+                angle=angle,
+                virt_ids=[virt_id0, virt_id1],
+                phys_ids=[phys_id0, phys_id1],
+            )
+        yield from self._execute_gate(
+            ns_instr,
+            [phys_id0, phys_id1],
+            (instr.angle_num.value, instr.angle_denom.value),
         )
-        prog = QuantumProgram()
-        prog.apply(ns_instr, qubit_indices=[phys_id0, phys_id1], angle=angle)
-        yield self.qdevice.execute_program(prog)
 
     def _interpret_controlled_rotation_instr(
         self, app_id: int, instr: core.ControlledRotationInstruction
     ) -> Generator[EventExpression, None, None]:
         raise NotImplementedError
 
+    def _execute_gate(
+        self,
+        ns_instr: NsInstr,
+        qubit_indices: List[int],
+        angle_operands: Optional[Tuple[int, int]] = None,
+    ) -> Generator[EventExpression, None, None]:
+        """Execute a single gate on the quantum device.
+
+        :param ns_instr: NetSquid instruction of the gate
+        :param qubit_indices: physical IDs of the qubits the gate acts on
+        :param angle_operands: operands (n, d) of the rotation angle n * pi / 2^d
+            of the gate, or None if the gate has no angle
+        """
+        key = (ns_instr, tuple(qubit_indices), angle_operands)
+        prog = self._gate_programs.get(key)
+        if prog is None:
+            prog = QuantumProgram()
+            prog.apply(
+                ns_instr,
+                qubit_indices=qubit_indices,
+                **self._gate_params(angle_operands),
+            )
+            self._gate_programs[key] = prog
+        yield self.qdevice.execute_program(prog)
+
+    def _gate_params(self, angle_operands: Optional[Tuple[int, int]]) -> Dict[str, Any]:
+        """Parameters of a gate instruction with the given angle operands."""
+        if angle_operands is None:
+            return {}
+        n, d = angle_operands
+        return {"angle": self._get_rotation_angle_from_operands(n=n, d=d)}
+
     def _get_rotation_angle_from_operands(self, n: int, d: int) -> float:
         return float(n * PI / (2**d))
 
@@ -523,14 +803,16 @@ class Processor(ComponentProtocol):
         # qubit_array_addr can be None
         assert arg_array_addr is not None
         assert result_array_addr is not None
-        self._logger.debug(
-            f"Creating EPR pair with remote node id {remote_node_id} "
-            f"and EPR socket ID {epr_socket_id}, "
-            f"using qubit addresses stored in array with address {qubit_array_addr}, "
-            f"using arguments stored in array with address {arg_array_addr}, "
-            f"placing the entanglement information in array at "
-            f"address {result_array_addr}"
-        )
+        if self._tracer.enabled:
+            self._tracer.trace(
+                "create_epr",
+                app_id=app_id,
+                remote_node_id=remote_node_id,
+                epr_socket_id=epr_socket_id,
+                qubit_array_addr=qubit_array_addr,
+                arg_array_addr=arg_array_addr,
+                result_array_addr=result_array_addr,
+            )
 
         msg = NetstackCreateRequest(
             app_id,
@@ -540,6 +822,8 @@ class Processor(ComponentProtocol):
             arg_array_addr,
             result_array_addr,
         )
+        if self._scoreboarding:
+            self._epr_qubit_arrays[(app_id, result_array_addr)] = qubit_array_addr
         self._send_netstack_msg(msg)
         # result = yield from self._receive_netstack_msg()
         # self._logger.debug(f"result from netstack: {result}")
@@ -554,13 +838,15 @@ class Processor(ComponentProtocol):
         assert epr_socket_id is not None
         # qubit_array_addr can be None
         assert result_array_addr is not None
-        self._logger.debug(
-            f"Receiving EPR pair with remote node id {remote_node_id} "
-            f"and EPR socket ID {epr_socket_id}, "
-            f"using qubit addresses stored in array with address {qubit_array_addr}, "
-            f"placing the entanglement information in array at "
-            f"address {result_array_addr}"
-        )
+        if self._tracer.enabled:
+            self._tracer.trace(
+                "recv_epr",
+                app_id=app_id,
+                remote_node_id=remote_node_id,
+                epr_socket_id=epr_socket_id,
+                qubit_array_addr=qubit_array_addr,
+                result_array_addr=result_array_addr,
+            )
 
         msg = NetstackReceiveRequest(
             app_id,
@@ -569,6 +855,8 @@ class Processor(ComponentProtocol):
             qubit_array_addr,
             result_array_addr,
         )
+        if self._scoreboarding:
+            self._epr_qubit_arrays[(app_id, result_array_addr)] = qubit_array_addr
         self._send_netstack_msg(msg)
         # result = yield from self._receive_netstack_msg()
         # self._logger.debug(f"result from netstack: {result}")
@@ -577,34 +865,27 @@ class Processor(ComponentProtocol):
         self, app_id: int, instr: core.WaitAllInstruction
     ) -> Generator[EventExpression, None, None]:
         app_mem = self.app_memories[app_id]
-        self._logger.debug(
-            f"Waiting for all entries in array slice {instr.slice} to become defined"
-        )
         assert isinstance(instr.slice.start, Register)
         assert isinstance(instr.slice.stop, Register)
         start: int = app_mem.get_reg_value(instr.slice.start)
         end: int = app_mem.get_reg_value(instr.slice.stop)
         addr: int = instr.slice.address.address
 
-        self._logger.debug(
-            f"checking if @{addr}[{start}:{end}] has values for app ID {app_id}"
-        )
-
         while True:
             values = self.app_memories[app_id].get_array_values(addr, start, end)
             if any(v is None for v in values):
-                self._logger.debug(
-                    f"waiting for netstack to write to @{addr}[{start}:{end}] "
-                    f"for app ID {app_id}"
-                )
+                if self._tracer.enabled:
+                    self._tracer.trace(
+                        "wait_all", app_id=app_id, addr=addr, start=start, end=end
+                    )
                 yield from self._receive_netstack_msg()
-                self._logger.debug("netstack wrote something")
+                # Notifications that arrived in the meantime are covered by
+                # checking the slice again.
+                self._drain_msgs("netstack")
             else:
                 break
         self._flush_netstack_msgs()
-        self._logger.debug("all entries were written")
-
-        self._logger.info(f"\nFinished waiting for array slice {instr.slice}")
+        self._logger.info("Finished waiting for array slice %s", instr.slice)
 
     def _interpret_ret_reg(self, app_id: int, instr: core.RetRegInstruction) -> None:
         pass
@@ -623,19 +904,128 @@ class Processor(ComponentProtocol):
         raise NotImplementedError
 
 
+class LayeredProgram(QuantumProgram):
+    """Quantum program that executes gates layer by layer.
+
+    The gates within a layer act on disjoint qubits. They are run together, such
+    that the quantum device executes them in parallel as far as its physical
+    instructions allow it.
+    """
+
+    def __init__(self, layers: List[List[T_Gate]]) -> None:
+        super().__init__()
+        self._layers = layers
+
+    def program(self) -> Generator[EventExpression, None, None]:
+        for layer in self._layers:
+            for ns_instr, qubit_indices, kwargs in layer:
+                self.apply(ns_instr, qubit_indices=qubit_indices, **kwargs)
+            yield self.run(parallel=True)
+
+
 class GenericProcessor(Processor):
     """A `Processor` for nodes with a generic quantum hardware."""
 
+    # Gate instructions that are collected into layers when gates are executed in
+    # parallel.
+    _GATE_INSTRUCTIONS = (
+        core.SingleQubitInstruction,
+        core.TwoQubitInstruction,
+        core.RotationInstruction,
+        core.ControlledRotationInstruction,
+    )
+
+    def __init__(self, comp: ProcessorComponent, qnos: Qnos) -> None:
+        super().__init__(comp, qnos)
+
+        # Whether gates on disjoint qubits are executed in parallel.
+        self._parallel_gates: bool = False
+
+        # Gates that are not yet executed, as layers of gates on disjoint qubits.
+        self._gate_layers: List[List[T_Gate]] = []
+
+        # Index of the last layer that contains a gate on a physical qubit.
+        self._last_layer_of_qubit: Dict[int, int] = {}
+
+    @property
+    def parallel_gates(self) -> bool:
+        """Whether consecutive gates are packed into layers of gates on disjoint
+        qubits, where each layer is executed in parallel. If not, every gate is
+        executed on its own."""
+        return self._parallel_gates
+
+    @parallel_gates.setter
+    def parallel_gates(self, value: bool) -> None:
+        self._parallel_gates = value
+
+    def execute_subroutine(
+        self, subroutine: Subroutine
+    ) -> Generator[EventExpression, None, None]:
+        yield from super().execute_subroutine(subroutine)
+        yield from self._flush_gate_layers()
+
+    def _interpret_instruction(
+        self, app_id: int, instr: NetQASMInstruction
+    ) -> Optional[Generator[EventExpression, None, None]]:
+        if not self._parallel_gates or isinstance(
+            instr, self._CLASSICAL_INSTRUCTIONS + self._GATE_INSTRUCTIONS
+        ):
+            return super()._interpret_instruction(app_id, instr)
+        return self._flush_and_interpret_instruction(app_id, instr)
+
+    def _flush_and_interpret_instruction(
+        self, app_id: int, instr: NetQASMInstruction
+    ) -> Generator[EventExpression, None, None]:
+        yield from self._flush_gate_layers()
+        generator = super()._interpret_instruction(app_id, instr)
+        if generator:
+            yield from generator
+
+    def _execute_gate(
+        self,
+        ns_instr: NsInstr,
+        qubit_indices: List[int],
+        angle_operands: Optional[Tuple[int, int]] = None,
+    ) -> Generator[EventExpression, None, None]:
+        if not self._parallel_gates:
+            yield from super()._execute_gate(ns_instr, qubit_indices, angle_operands)
+            return
+
+        # Put the gate in the first layer after the last gate on any of its qubits.
+        layer_index = 1 + max(
+            (self._last_layer_of_qubit.get(q, -1) for q in qubit_indices)
+        )
+        if layer_index == len(self._gate_layers):
+            self._gate_layers.append([])
+        self._gate_layers[layer_index].append(
+            (ns_instr, qubit_indices, self._gate_params(angle_operands))
+        )
+        for q in qubit_indices:
+            self._last_layer_of_qubit[q] = layer_index
+
+    def _flush_gate_layers(self) -> Generator[EventExpression, None, None]:
+        """Execute all gates that are not yet executed."""
+        if len(self._gate_layers) == 0:
+            return
+        layers = self._gate_layers
+        self._gate_layers = []
+        self._last_layer_of_qubit = {}
+        if self._tracer.enabled:
+            self._tracer.trace(
+                "gate_layers",
+                num_gates=sum(len(layer) for layer in layers),
+                num_layers=len(layers),
+            )
+        yield self.qdevice.execute_program(LayeredProgram(layers))
+
     def _interpret_init(
         self, app_id: int, instr: core.InitInstruction
     ) -> Generator[EventExpression, None, None]:
         app_mem = self.app_memories[app_id]
         virt_id = app_mem.get_reg_value(instr.reg)
         phys_id = app_mem.phys_id_for(virt_id)
-        self._logger.debug(
-            f"Performing {instr} on virtual qubit "
-            f"{virt_id} (physical ID: {phys_id})"
-        )
+        if self._tracer.enabled:
+            self._tracer.trace("init", virt_id=virt_id, phys_id=phys_id)
         prog = QuantumProgram()
         prog.apply(INSTR_INIT, qubit_indices=[phys_id])
         yield self.qdevice.execute_program(prog)
@@ -647,16 +1037,19 @@ class GenericProcessor(Processor):
         virt_id = app_mem.get_reg_value(instr.qreg)
         phys_id = app_mem.phys_id_for(virt_id)
 
-        self._logger.debug(
-            f"Measuring qubit {virt_id} (physical ID: {phys_id}), "
-            f"placing the outcome in register {instr.creg}"
-        )
-
         prog = QuantumProgram()
         prog.apply(INSTR_MEASURE, qubit_indices=[phys_id])
         yield self.qdevice.execute_program(prog)
         outcome: int = prog.output["last"][0]
         app_mem.set_reg_value(instr.creg, outcome)
+        if self._tracer.enabled:
+            self._tracer.trace(
+                "meas",
+                virt_id=virt_id,
+                phys_id=phys_id,
+                creg=instr.creg,
+                outcome=outcome,
+            )
 
     def _interpret_single_qubit_instr(
         self, app_id: int, instr: core.SingleQubitInstruction
@@ -665,25 +1058,15 @@ class GenericProcessor(Processor):
         virt_id = app_mem.get_reg_value(instr.qreg)
         phys_id = app_mem.phys_id_for(virt_id)
         if isinstance(instr, vanilla.GateXInstruction):
-            prog = QuantumProgram()
-            prog.apply(INSTR_X, qubit_indices=[phys_id])
-            yield self.qdevice.execute_program(prog)
+            yield from self._execute_gate(INSTR_X, [phys_id])
         elif isinstance(instr, vanilla.GateYInstruction):
-            prog = QuantumProgram()
-            prog.apply(INSTR_Y, qubit_indices=[phys_id])
-            yield self.qdevice.execute_program(prog)
+            yield from self._execute_gate(INSTR_Y, [phys_id])
         elif isinstance(instr, vanilla.GateZInstruction):
-            prog = QuantumProgram()
-            prog.apply(INSTR_Z, qubit_indices=[phys_id])
-            yield self.qdevice.execute_program(prog)
+            yield from self._execute_gate(INSTR_Z, [phys_id])
         elif isinstance(instr, vanilla.GateHInstruction):
-            prog = QuantumProgram()
-            prog.apply(INSTR_H, qubit_indices=[phys_id])
-            yield self.qdevice.execute_program(prog)
+            yield from self._execute_gate(INSTR_H, [phys_id])
         elif isinstance(instr, vanilla.GateKInstruction):
-            prog = QuantumProgram()
-            prog.apply(INSTR_K, qubit_indices=[phys_id])
-            yield self.qdevice.execute_program(prog)
+            yield from self._execute_gate(INSTR_K, [phys_id])
         else:
             raise RuntimeError(f"Unsupported instruction {instr}")
 
@@ -713,13 +1096,9 @@ class GenericProcessor(Processor):
         virt_id1 = app_mem.get_reg_value(instr.reg1)
         phys_id1 = app_mem.phys_id_for(virt_id1)
         if isinstance(instr, vanilla.CnotInstruction):
-            prog = QuantumProgram()
-            prog.apply(INSTR_CNOT, qubit_indices=[phys_id0, phys_id1])
-            yield self.qdevice.execute_program(prog)
+            yield from self._execute_gate(INSTR_CNOT, [phys_id0, phys_id1])
         elif isinstance(instr, vanilla.CphaseInstruction):
-            prog = QuantumProgram()
-            prog.apply(INSTR_CZ, qubit_indices=[phys_id0, phys_id1])
-            yield self.qdevice.execute_program(prog)
+            yield from self._execute_gate(INSTR_CZ, [phys_id0, phys_id1])
         else:
             raise RuntimeError(f"Unsupported instruction {instr}")
 
@@ -727,20 +1106,195 @@ class GenericProcessor(Processor):
 class NVProcessor(Processor):
     """A `Processor` for nodes with a NV hardware."""
 
+    def __init__(self, comp: ProcessorComponent, qnos: Qnos) -> None:
+        super().__init__(comp, qnos)
+
+        # Whether qubits are placed on the electron when that avoids moves.
+        self._qubit_placement: bool = False
+
+        self._subroutine: Optional[Subroutine] = None
+        self._num_moves: int = 0
+        self._num_moves_avoided: int = 0
+
+        # Result array addresses of the entanglement requests sent to the netstack,
+        # by app ID, until their result arrays are found to be fully written. The
+        # netstack may still need the electron for these requests.
+        self._epr_result_arrays: Dict[int, Set[int]] = {}
+
+        # Programs that move a state between the electron and a carbon, by carbon
+        # ID. They are built on first use and reused afterwards.
+        self._carbon_to_electron_progs: Dict[int, QuantumProgram] = {}
+        self._electron_to_carbon_progs: Dict[int, QuantumProgram] = {}
+        self._measure_electron_prog: Optional[QuantumProgram] = None
+
+    @property
+    def qubit_placement(self) -> bool:
+        """Whether a virtual qubit with ID > 0 is placed on the electron instead of
+        a carbon, if it is measured and used on its own until it is freed. This
+        avoids moving it to the electron for the measurement. Qubits are not
+        placed on the electron while the application has entanglement requests in
+        progress, since the netstack needs the electron for them."""
+        return self._qubit_placement
+
+    @qubit_placement.setter
+    def qubit_placement(self, value: bool) -> None:
+        self._qubit_placement = value
+
+    @property
+    def num_moves(self) -> int:
+        """Number of times a qubit state was moved between the electron and a
+        carbon."""
+        return self._num_moves
+
+    @property
+    def num_moves_avoided(self) -> int:
+        """Number of moves that were avoided by qubit placement."""
+        return self._num_moves_avoided
+
+    def execute_subroutine(
+        self, subroutine: Subroutine
+    ) -> Generator[EventExpression, None, None]:
+        self._subroutine = subroutine
+        yield from super().execute_subroutine(subroutine)
+        self._subroutine = None
+
+    def _interpret_create_epr(
+        self, app_id: int, instr: core.CreateEPRInstruction
+    ) -> None:
+        super()._interpret_create_epr(app_id, instr)
+        result_array_addr = self.app_memories[app_id].get_reg_value(
+            instr.ent_results_array
+        )
+        self._epr_result_arrays.setdefault(app_id, set()).add(result_array_addr)
+
+    def _interpret_recv_epr(self, app_id: int, instr: core.RecvEPRInstruction) -> None:
+        super()._interpret_recv_epr(app_id, instr)
+        result_array_addr = self.app_memories[app_id].get_reg_value(
+            instr.ent_results_array
+        )
+        self._epr_result_arrays.setdefault(app_id, set()).add(result_array_addr)
+
+    def _interpret_array(self, app_id: int, instr: core.ArrayInstruction) -> None:
+        super()._interpret_array(app_id, instr)
+        # A new array at the address of an earlier EPR result array does not
+        # belong to that request.
+        self._epr_result_arrays.get(app_id, set()).discard(instr.address.address)
+
+    def clear_application(self, app_id: int) -> None:
+        super().clear_application(app_id)
+        self._epr_result_arrays.pop(app_id, None)
+
+    def _has_pending_epr_requests(self, app_id: int) -> bool:
+        """Whether the application has entanglement requests whose result arrays
+        are not fully written yet."""
+        result_arrays = self._epr_result_arrays.get(app_id, set())
+        app_mem = self.app_memories[app_id]
+        for addr in list(result_arrays):
+            if all(v is not None for v in app_mem.get_array(addr)):
+                result_arrays.discard(addr)
+        return len(result_arrays) > 0
+
+    def _fits_on_electron(self, app_id: int, virt_id: int) -> bool:
+        """Look ahead in the current subroutine, from the allocation of a virtual
+        qubit until it is freed, to check whether it can be placed on the electron.
+
+        This is the case if the qubit is measured, is freed within the subroutine,
+        and nothing else in between needs the electron: no two-qubit gates, no
+        measurements of other qubits, no entanglement generation and no control
+        flow. Register values are tracked through `set` instructions; registers
+        that are written otherwise make the check fail if they address a qubit.
+        """
+        assert self._subroutine is not None
+        app_mem = self.app_memories[app_id]
+        reg_values: Dict[str, Optional[int]] = {}
+
+        def value(reg: Register) -> Optional[int]:
+            if str(reg) in reg_values:
+                return reg_values[str(reg)]
+            return app_mem.get_reg_value(reg)
+
+        is_measured = False
+        pc = app_mem.prog_counter
+        for instr in self._subroutine.instructions[pc + 1 :]:
+            if isinstance(instr, core.SetInstruction):
+                reg_values[str(instr.reg)] = instr.imm.value
+            elif isinstance(
+                instr, (core.ClassicalOpInstruction, core.ClassicalOpModInstruction)
+            ):
+                reg_values[str(instr.regout)] = None
+            elif isinstance(instr, (core.LoadInstruction, core.LeaInstruction)):
+                reg_values[str(instr.reg)] = None
+            elif isinstance(
+                instr,
+                (
+                    core.StoreInstruction,
+                    core.UndefInstruction,
+                    core.ArrayInstruction,
+                    core.RetRegInstruction,
+                    core.RetArrInstruction,
+                ),
+            ):
+                pass
+            elif isinstance(instr, core.MeasInstruction):
+                if value(instr.qreg) != virt_id:
+                    return False
+                reg_values[str(instr.creg)] = None
+                is_measured = True
+            elif isinstance(instr, core.QFreeInstruction):
+                freed_id = value(instr.reg)
+                if freed_id is None:
+                    return False
+                if freed_id == virt_id:
+                    return is_measured
+            elif isinstance(instr, core.QAllocInstruction):
+                # Other qubits must go to a carbon.
+                alloc_id = value(instr.reg)
+                if alloc_id is None or alloc_id == 0 or alloc_id == virt_id:
+                    return False
+            elif isinstance(
+                instr,
+                (
+                    core.SingleQubitInstruction,
+                    core.RotationInstruction,
+                    core.InitInstruction,
+                ),
+            ):
+                if value(instr.reg) is None:
+                    return False
+            else:
+                return False
+        return False
+
     def _interpret_qalloc(self, app_id: int, instr: core.QAllocInstruction) -> None:
         app_mem = self.app_memories[app_id]
 
         virt_id = app_mem.get_reg_value(instr.reg)
         if virt_id is None:
             raise RuntimeError(f"qubit address in register {instr.reg} is not defined")
-        self._logger.debug(f"Allocating qubit with virtual ID {virt_id}")
 
         # Virtual ID > 0 corresponds to memory qubits
         if virt_id > 0:
-            phys_id = self.physical_memory.allocate_mem()
+            if (
+                self._qubit_placement
+                and not self.physical_memory.is_allocated(0)
+                and not self._has_pending_epr_requests(app_id)
+                and self._fits_on_electron(app_id, virt_id)
+            ):
+                # Placing the qubit on the electron avoids moving it there for
+                # its measurement.
+                phys_id = self.physical_memory.allocate_comm()
+                self._num_moves_avoided += 1
+                self._logger.info(
+                    "placing virtual qubit %s on the electron, which avoids a move",
+                    virt_id,
+                )
+            else:
+                phys_id = self.physical_memory.allocate_mem()
         else:
             phys_id = self.physical_memory.allocate_comm()
         app_mem.map_virt_id(virt_id, phys_id)
+        if self._tracer.enabled:
+            self._tracer.trace("qalloc", virt_id=virt_id, phys_id=phys_id)
 
     def _interpret_init(
         self, app_id: int, instr: core.InitInstruction
@@ -748,17 +1302,18 @@ class NVProcessor(Processor):
         app_mem = self.app_memories[app_id]
         virt_id = app_mem.get_reg_value(instr.reg)
         phys_id = app_mem.phys_id_for(virt_id)
-        self._logger.debug(
-            f"Performing {instr} on virtual qubit "
-            f"{virt_id} (physical ID: {phys_id})"
-        )
+        if self._tracer.enabled:
+            self._tracer.trace("init", virt_id=virt_id, phys_id=phys_id)
         prog = QuantumProgram()
         prog.apply(INSTR_INIT, qubit_indices=[phys_id])
         yield self.qdevice.execute_program(prog)
 
     def _measure_electron(self) -> Generator[EventExpression, None, int]:
-        prog = QuantumProgram()
-        prog.apply(INSTR_MEASURE, qubit_indices=[0])
+        if self._measure_electron_prog is None:
+            prog = QuantumProgram()
+            prog.apply(INSTR_MEASURE, qubit_indices=[0])
+            self._measure_electron_prog = prog
+        prog = self._measure_electron_prog
         yield self.qdevice.execute_program(prog)
         outcome: int = prog.output["last"][0]
         return outcome
@@ -766,25 +1321,31 @@ class NVProcessor(Processor):
     def _move_carbon_to_electron_for_measure(
         self, carbon_id: int
     ) -> Generator[EventExpression, None, None]:
-        prog = QuantumProgram()
-        prog.apply(INSTR_INIT, qubit_indices=[0])
-        prog.apply(INSTR_ROT_Y, qubit_indices=[0], angle=PI_OVER_2)
-        prog.apply(INSTR_CYDIR, qubit_indices=[0, carbon_id], angle=-PI_OVER_2)
-        prog.apply(INSTR_ROT_X, qubit_indices=[0], angle=-PI_OVER_2)
-        prog.apply(INSTR_CXDIR, qubit_indices=[0, carbon_id], angle=PI_OVER_2)
-        prog.apply(INSTR_ROT_Y, qubit_indices=[0], angle=-PI_OVER_2)
-        yield self.qdevice.execute_program(prog)
+        self._num_moves += 1
+        if carbon_id not in self._carbon_to_electron_progs:
+            prog = QuantumProgram()
+            prog.apply(INSTR_INIT, qubit_indices=[0])
+            prog.apply(INSTR_ROT_Y, qubit_indices=[0], angle=PI_OVER_2)
+            prog.apply(INSTR_CYDIR, qubit_indices=[0, carbon_id], angle=-PI_OVER_2)
+            prog.apply(INSTR_ROT_X, qubit_indices=[0], angle=-PI_OVER_2)
+            prog.apply(INSTR_CXDIR, qubit_indices=[0, carbon_id], angle=PI_OVER_2)
+            prog.apply(INSTR_ROT_Y, qubit_indices=[0], angle=-PI_OVER_2)
+            self._carbon_to_electron_progs[carbon_id] = prog
+        yield self.qdevice.execute_program(self._carbon_to_electron_progs[carbon_id])
 
     def _move_electron_to_carbon(
         self, carbon_id: int
     ) -> Generator[EventExpression, None, None]:
-        prog = QuantumProgram()
-        prog.apply(INSTR_INIT, qubit_indices=[carbon_id])
-        prog.apply(INSTR_ROT_Y, qubit_indices=[0], angle=PI_OVER_2)
-        prog.apply(INSTR_CYDIR, qubit_indices=[0, carbon_id], angle=-PI_OVER_2)
-        prog.apply(INSTR_ROT_X, qubit_indices=[0], angle=-PI_OVER_2)
-        prog.apply(INSTR_CXDIR, qubit_indices=[0, carbon_id], angle=PI_OVER_2)
-        yield self.qdevice.execute_program(prog)
+        self._num_moves += 1
+        if carbon_id not in self._electron_to_carbon_progs:
+            prog = QuantumProgram()
+            prog.apply(INSTR_INIT, qubit_indices=[carbon_id])
+            prog.apply(INSTR_ROT_Y, qubit_indices=[0], angle=PI_OVER_2)
+            prog.apply(INSTR_CYDIR, qubit_indices=[0, carbon_id], angle=-PI_OVER_2)
+            prog.apply(INSTR_ROT_X, qubit_indices=[0], angle=-PI_OVER_2)
+            prog.apply(INSTR_CXDIR, qubit_indices=[0, carbon_id], angle=PI_OVER_2)
+            self._electron_to_carbon_progs[carbon_id] = prog
+        yield self.qdevice.execute_program(self._electron_to_carbon_progs[carbon_id])
 
     def _interpret_meas(
         self, app_id: int, instr: core.MeasInstruction
@@ -847,10 +1408,14 @@ class NVProcessor(Processor):
                 outcome = yield from self._measure_electron()
                 app_mem.set_reg_value(instr.creg, outcome)
 
-        self._logger.debug(
-            f"Measuring qubit {virt_id} (physical ID: {phys_id}), "
-            f"placing the outcome in register {instr.creg}"
-        )
+        if self._tracer.enabled:
+            self._tracer.trace(
+                "meas",
+                virt_id=virt_id,
+                phys_id=phys_id,
+                creg=instr.creg,
+                outcome=outcome,
+            )
 
     def _interpret_single_rotation_instr(
         self, app_id: int, instr: nv.RotXInstruction
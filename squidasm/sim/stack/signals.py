@@ -6,6 +6,8 @@ SIGNAL_PROC_HAND_MSG = "EvProcHandMsg"
 SIGNAL_PROC_NSTK_MSG = "EvProcNstkMsg"
 SIGNAL_NSTK_PROC_MSG = "EvNstkProcMsg"
 SIGNAL_PEER_NSTK_MSG = "EvPeerNstkMsg"
+SIGNAL_EGP_NSTK_RES = "EvEgpNstkRes"
 
 SIGNAL_MEMORY_FREED = "EvMemoryFreed"
+SIGNAL_NSTK_REQ_QUEUED = "EvNstkReqQueued"
 SIGNAL_PEER_RECV_MSG = "EVPeerRecvMsg"
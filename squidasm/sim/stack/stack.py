@@ -13,6 +13,14 @@ from netsquid_netbuilder.network import QDeviceNode
 
 from squidasm.sim.stack.host import Host, HostComponent
 from squidasm.sim.stack.qnos import Qnos, QnosComponent
+from squidasm.sim.stack.signals import (
+    SIGNAL_HAND_HOST_MSG,
+    SIGNAL_HAND_PROC_MSG,
+    SIGNAL_HOST_HAND_MSG,
+    SIGNAL_NSTK_PROC_MSG,
+    SIGNAL_PROC_HAND_MSG,
+    SIGNAL_PROC_NSTK_MSG,
+)
 
 
 class StackNode(QDeviceNode):
@@ -136,6 +144,31 @@ class NodeStack(Protocol):
         """
         self.qnos.assign_egp(remote_node_id, egp)
 
+    def use_direct_channels(self) -> None:
+        """Let the Host, Handler, Processor and Netstack of this node send
+        messages to each other over direct channels instead of ports.
+
+        Direct channels deliver messages in the same order and without delay,
+        like the ports, but with fewer simulation events. Must be called before
+        the node is started, and after any of these protocols is replaced.
+        """
+        assert self._host is not None
+        assert self._qnos is not None
+        handler = self._qnos.handler
+        processor = self._qnos.processor
+        netstack = self._qnos.netstack
+
+        self._host.connect_direct("qnos", handler, "host", SIGNAL_HOST_HAND_MSG)
+        handler.connect_direct("host", self._host, "qnos", SIGNAL_HAND_HOST_MSG)
+        handler.connect_direct("processor", processor, "handler", SIGNAL_HAND_PROC_MSG)
+        processor.connect_direct("handler", handler, "processor", SIGNAL_PROC_HAND_MSG)
+        processor.connect_direct(
+            "netstack", netstack, "processor", SIGNAL_PROC_NSTK_MSG
+        )
+        netstack.connect_direct(
+            "processor", processor, "netstack", SIGNAL_NSTK_PROC_MSG
+        )
+
     @property
     def node(self) -> StackNode:
         return self._node
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import logging
+import pickle
+import weakref
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import netsquid as ns
+
+# A trace record: (simulation time, component, event type, fields).
+TraceRecord = Tuple[float, str, str, Dict[str, Any]]
+
+
+class TraceSink:
+    """Receives the trace records of all tracers while it is added to
+    `Tracer`."""
+
+    def record(
+        self, time: float, component: str, event: str, fields: Dict[str, Any]
+    ) -> None:
+        raise NotImplementedError
+
+
+class RingBufferSink(TraceSink):
+    """Keeps the last `capacity` trace records in memory, so that they can be
+    inspected or dumped to a file after a run."""
+
+    def __init__(self, capacity: int = 100_000) -> None:
+        if capacity < 1:
+            raise ValueError(f"capacity must be at least 1, got {capacity}")
+        self._records: Deque[TraceRecord] = deque(maxlen=capacity)
+
+    def record(
+        self, time: float, component: str, event: str, fields: Dict[str, Any]
+    ) -> None:
+        self._records.append((time, component, event, fields))
+
+    @property
+    def records(self) -> List[TraceRecord]:
+        """The records in the buffer, from oldest to newest."""
+        return list(self._records)
+
+    def clear(self) -> None:
+        self._records.clear()
+
+    def dump(self, path: str) -> None:
+        """Write the records in the buffer to a binary file. Field values that
+        cannot be pickled are written as their `repr`."""
+        records = []
+        for time, component, event, fields in self._records:
+            try:
+                pickle.dumps(fields)
+            except Exception:
+                fields = {k: repr(v) for k, v in fields.items()}
+            records.append((time, component, event, fields))
+        with open(path, "wb") as f:
+            pickle.dump(records, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path: str) -> List[TraceRecord]:
+        """Read the records from a file written by `dump`."""
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+
+class Tracer:
+    """Structured tracing of events in the hot paths of the stack components.
+
+    An event is a type and a number of fields, which are passed on to the sinks
+    and, if the logger of the tracer is enabled for DEBUG, logged as a DEBUG
+    message. Callers check `enabled` before building the fields of an event, so
+    that a disabled tracer costs a single attribute lookup:
+
+        if self._tracer.enabled:
+            self._tracer.trace("pair_delivered", pair_index=i, phys_id=phys_id)
+
+    Sinks are shared by all tracers. `enabled` is updated when a sink is added or
+    removed and when `refresh` is called after changing log levels.
+    """
+
+    _sinks: List[TraceSink] = []
+    _tracers: "weakref.WeakSet[Tracer]" = weakref.WeakSet()
+
+    def __init__(self, component: str, logger: Optional[logging.Logger] = None) -> None:
+        """
+        :param component: name of the component, included in every record
+        :param logger: logger to which events are logged at DEBUG level
+        """
+        self._component = component
+        self._logger = logger
+        self._log_events = False
+        self.enabled = False
+        self._update()
+        Tracer._tracers.add(self)
+
+    def _update(self) -> None:
+        self._log_events = self._logger is not None and self._logger.isEnabledFor(
+            logging.DEBUG
+        )
+        self.enabled = self._log_events or len(Tracer._sinks) > 0
+
+    @classmethod
+    def refresh(cls) -> None:
+        """Update `enabled` of all tracers, e.g. after log levels were changed."""
+        for tracer in cls._tracers:
+            tracer._update()
+
+    @classmethod
+    def add_sink(cls, sink: TraceSink) -> None:
+        if sink not in cls._sinks:
+            cls._sinks.append(sink)
+        cls.refresh()
+
+    @classmethod
+    def remove_sink(cls, sink: TraceSink) -> None:
+        if sink in cls._sinks:
+            cls._sinks.remove(sink)
+        cls.refresh()
+
+    @classmethod
+    def clear_sinks(cls) -> None:
+        cls._sinks.clear()
+        cls.refresh()
+
+    def trace(self, event: str, **fields: Any) -> None:
+        """Pass an event to all sinks, with the current simulation time."""
+        time = ns.sim_time()
+        for sink in self._sinks:
+            sink.record(time, self._component, event, fields)
+        if self._log_events:
+            msg = " ".join([event] + [f"{k}={v}" for k, v in fields.items()])
+            self._logger.debug(msg)
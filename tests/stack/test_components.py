@@ -4,6 +4,7 @@ import netsquid as ns
 from netqasm.backend.messages import InitNewAppMessage, OpenEPRSocketMessage
 from netsquid_netbuilder.modules.qdevices.nv import NVQDeviceBuilder, NVQDeviceConfig
 
+from squidasm.sim.stack.common import DirectChannel, MessageBuffer
 from squidasm.sim.stack.handler import Handler
 from squidasm.sim.stack.netstack import EprSocket, Netstack
 from squidasm.sim.stack.stack import NodeStack
@@ -32,8 +33,82 @@ class TestHandler(unittest.TestCase):
 
     def test_open_epr_socket(self):
         self.handler.msg_from_host(OpenEPRSocketMessage(0, 2, 1))
-        assert 0 in self.netstack._epr_sockets
-        assert self.netstack._epr_sockets[0][0] == EprSocket(2, 1)
+        assert (0, 2, 1) in self.netstack.epr_sockets
+        assert self.netstack.epr_sockets[(0, 2, 1)] == EprSocket(2, 1)
+        assert self.netstack.find_epr_socket(0, 2, 1) == EprSocket(2, 1)
+        assert self.netstack.find_epr_socket(0, 3, 1) is None
+
+    def test_max_pipelined_pairs(self):
+        assert self.netstack.max_pipelined_pairs == 1
+        self.netstack.max_pipelined_pairs = None
+        assert self.netstack.max_pipelined_pairs is None
+        with self.assertRaises(ValueError):
+            self.netstack.max_pipelined_pairs = 0
+
+    def test_md_result_chunk_size(self):
+        assert self.netstack.md_result_chunk_size == 1
+        self.netstack.md_result_chunk_size = 100
+        assert self.netstack.md_result_chunk_size == 100
+        with self.assertRaises(ValueError):
+            self.netstack.md_result_chunk_size = 0
+
+    def test_session_mode(self):
+        assert not self.netstack.session_mode
+        self.netstack.session_mode = True
+        assert self.netstack.session_mode
+
+    def test_set_pair_pool_size(self):
+        self.netstack.set_pair_pool_size(1, 0)
+        with self.assertRaises(ValueError):
+            self.netstack.set_pair_pool_size(1, -1)
+        # The NV device has a single communication qubit, which must remain
+        # available for requests that are not served from the pool.
+        with self.assertRaises(ValueError):
+            self.netstack.set_pair_pool_size(1, 1)
+
+
+class TestMessageBuffer(unittest.TestCase):
+    def test_buffer(self):
+        buffer = MessageBuffer()
+        buffer.append("a")
+        buffer.extend(["b", "c"])
+        assert buffer.popleft() == "a"
+        assert buffer.high_water_mark == 3
+        assert buffer.drain() == ["b", "c"]
+        assert len(buffer) == 0
+        assert buffer.high_water_mark == 3
+
+
+class TestDirectChannel(unittest.TestCase):
+    def setUp(self) -> None:
+        ns.sim_reset()
+
+    def test_latency(self):
+        channel = DirectChannel("msg")
+        channel.latency = 100
+        channel.start()
+        channel.tx_output("a")
+        channel.tx_output("b")
+
+        ns.sim_run(duration=50)
+        assert len(channel.buffer) == 0
+        # Messages sent at the same time are in transit as one batch.
+        assert list(channel._in_transit) == [["a", "b"]]
+        channel.tx_output("c")
+        assert list(channel._in_transit) == [["a", "b"], ["c"]]
+
+        # Both messages are delivered after a single latency.
+        ns.sim_run(duration=50)
+        assert ns.sim_time() == 100
+        assert channel.buffer.drain() == ["a", "b"]
+
+        ns.sim_run()
+        assert ns.sim_time() == 150
+        assert channel.buffer.drain() == ["c"]
+
+    def test_negative_latency(self):
+        with self.assertRaises(ValueError):
+            DirectChannel("msg").latency = -1
 
 
 if __name__ == "__main__":
@@ -0,0 +1,117 @@
+import gzip
+import logging
+import os
+import tempfile
+import unittest
+
+import netsquid as ns
+
+from pydynaa import Entity, EventHandler, EventType
+from squidasm.sim.stack.common import LogManager
+from squidasm.sim.stack.trace import Tracer
+
+
+class TestLogToFile(unittest.TestCase):
+    def setUp(self) -> None:
+        ns.sim_reset()
+        self.logger = LogManager.get_stack_logger("Test")
+        self.level = LogManager.get_log_level()
+        LogManager.set_log_level("INFO")
+
+    def tearDown(self) -> None:
+        LogManager.stop_file_logging()
+        LogManager.set_log_level(self.level)
+
+    def test_asynchronous(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "info.log")
+            LogManager.log_to_file(path)
+            self.logger.info("hello")
+            LogManager.stop_file_logging()
+
+            with open(path) as f:
+                assert f.read() == "INFO:0.0 ns:Stack.Test:hello\n"
+
+    def test_asynchronous_record_fixed_when_logged(self):
+        items = ["a"]
+
+        def log(event):
+            self.logger.info("hello %s", items)
+            items.append("b")
+
+        # Log at a later simulation time, from a simulation event.
+        entity = Entity()
+        event_type = EventType("LOG", "log a message")
+        entity._wait_once(EventHandler(log), entity=entity, event_type=event_type)
+        entity._schedule_at(5, event_type)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "info.log")
+            LogManager.log_to_file(path)
+            ns.sim_run()
+            # Resetting the simulation does not change the time of the record.
+            ns.sim_reset()
+            LogManager.stop_file_logging()
+
+            with open(path) as f:
+                assert f.read() == "INFO:5.0 ns:Stack.Test:hello ['a']\n"
+
+    def test_compress(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "info.log.gz")
+            LogManager.log_to_file(path, compress=True)
+            self.logger.info("hello")
+            LogManager.stop_file_logging()
+
+            with gzip.open(path, "rt") as f:
+                assert f.read() == "INFO:0.0 ns:Stack.Test:hello\n"
+
+    def test_rotation(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "info.log")
+            LogManager.log_to_file(path, max_bytes=40, backup_count=2)
+            for _ in range(3):
+                self.logger.info("hello")
+            LogManager.stop_file_logging()
+
+            assert os.path.exists(path + ".1")
+            assert os.path.exists(path + ".2")
+
+
+class TestComponentLogLevel(unittest.TestCase):
+    def setUp(self) -> None:
+        self.level = LogManager.get_log_level()
+        LogManager.set_log_level("WARNING")
+
+    def tearDown(self) -> None:
+        LogManager.clear_component_log_levels()
+        LogManager.set_log_level(self.level)
+
+    def test_precedence(self):
+        LogManager.set_component_log_level("INFO", component="Processor")
+        LogManager.set_component_log_level("ERROR", node="alice")
+        LogManager.set_component_log_level("DEBUG", node="alice", component="Netstack")
+
+        def level(node, types):
+            return LogManager.get_component_logger(
+                f"{types[0]}({node})", node, types
+            ).getEffectiveLevel()
+
+        assert level("alice", ["Netstack"]) == logging.DEBUG
+        assert level("alice", ["NVProcessor", "Processor"]) == logging.ERROR
+        assert level("bob", ["NVProcessor", "Processor"]) == logging.INFO
+        assert level("bob", ["Netstack"]) == logging.WARNING
+
+    def test_tracer(self):
+        LogManager.set_component_log_level("DEBUG", node="alice", component="Netstack")
+        alice = LogManager.get_component_logger(
+            "Netstack(alice)", "alice", ["Netstack"]
+        )
+        bob = LogManager.get_component_logger("Netstack(bob)", "bob", ["Netstack"])
+
+        assert Tracer("Netstack(alice)", alice).enabled
+        assert not Tracer("Netstack(bob)", bob).enabled
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+
+from squidasm.sim.stack.metrics import MetricsCollector
+
+
+class TestMetricsCollector(unittest.TestCase):
+    def setUp(self) -> None:
+        self.metrics = MetricsCollector(num_bins=2)
+        self.metrics.record_queue_depth("alice", "bob", 1)
+        self.metrics.record_wait("alice", "bob", 0)
+        self.metrics.record_pair("alice", "bob", time=1e6, latency=1e6)
+        self.metrics.record_queue_depth("alice", "bob", 2)
+        self.metrics.record_wait("alice", "bob", 4)
+        self.metrics.record_pair("alice", "bob", time=3e6, latency=2e6)
+        self.metrics.record_pair("alice", "charlie", time=2e6, latency=1e6)
+
+    def test_link_summaries(self):
+        summary = self.metrics.link_summaries()[("alice", "bob")]
+        assert summary["num_pairs"] == 2
+        assert summary["pairs_per_second"] == 500
+        assert summary["mean_gen_latency"] == 1.5e6
+        assert summary["mean_wait_time"] == 2
+        assert summary["max_queue_depth"] == 2
+        assert summary["wait_time_histogram"] == {"edges": [0, 2, 4], "counts": [1, 1]}
+
+        summary = self.metrics.link_summaries()[("alice", "charlie")]
+        assert summary["num_pairs"] == 1
+        assert summary["pairs_per_second"] is None
+
+    def test_node_summaries(self):
+        summary = self.metrics.node_summaries()["alice"]
+        assert summary["num_pairs"] == 3
+        assert summary["pairs_per_second"] == 1000
+
+    def test_export(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            json_path = os.path.join(tmp_dir, "metrics.json")
+            self.metrics.export_json(json_path)
+            with open(json_path) as f:
+                data = json.load(f)
+            assert len(data["links"]) == 2
+            assert data["nodes"][0]["node"] == "alice"
+
+            csv_path = os.path.join(tmp_dir, "metrics.csv")
+            self.metrics.export_csv(csv_path)
+            with open(csv_path) as f:
+                rows = list(csv.DictReader(f))
+            assert len(rows) == 3
+            assert rows[0]["peer"] == "bob"
+            assert rows[2]["peer"] == ""
+
+
+if __name__ == "__main__":
+    unittest.main()
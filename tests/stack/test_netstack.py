@@ -0,0 +1,446 @@
+import unittest
+from typing import Any, Dict, Generator, List, Optional
+
+import netsquid as ns
+
+from pydynaa import EventExpression
+from squidasm.run.stack.config import (
+    DepolariseLinkConfig,
+    GenericQDeviceConfig,
+    LinkConfig,
+    StackConfig,
+    StackNetworkConfig,
+    _convert_stack_network_config,
+)
+from squidasm.run.stack.run import _configure_stacks, _run, _setup_network
+from squidasm.sim.stack.program import Program, ProgramContext, ProgramMeta
+from squidasm.sim.stack.stack import StackNetwork
+from squidasm.sim.stack.trace import RingBufferSink, Tracer, TraceRecord
+
+
+class EprProgram(Program):
+    """Creates or receives pairs with a peer in a number of rounds, and measures
+    each pair as soon as it is delivered, after all pairs were delivered, or lets
+    the pairs be measured directly."""
+
+    def __init__(
+        self,
+        peer: str,
+        create: bool,
+        num_pairs: int,
+        num_rounds: int = 1,
+        sequential: bool = False,
+        measure_directly: bool = False,
+        measure_on_delivery: bool = True,
+    ) -> None:
+        self._peer = peer
+        self._create = create
+        self._num_pairs = num_pairs
+        self._num_rounds = num_rounds
+        self._sequential = sequential
+        self._measure_directly = measure_directly
+        self._measure_on_delivery = measure_on_delivery
+
+    @property
+    def meta(self) -> ProgramMeta:
+        return ProgramMeta(
+            name="epr_program",
+            csockets=[self._peer],
+            epr_sockets=[self._peer],
+            max_qubits=1 if self._sequential else self._num_pairs,
+        )
+
+    def run(
+        self, context: ProgramContext
+    ) -> Generator[EventExpression, None, Dict[str, Any]]:
+        conn = context.connection
+        epr_socket = context.epr_sockets[self._peer]
+
+        outcomes = []
+        for _ in range(self._num_rounds):
+            if self._measure_directly:
+                if self._create:
+                    results = epr_socket.create_measure(self._num_pairs)
+                else:
+                    results = epr_socket.recv_measure(self._num_pairs)
+                yield from conn.flush()
+                outcomes.append([int(r.measurement_outcome) for r in results])
+                continue
+
+            if not self._measure_on_delivery:
+                if self._create:
+                    qubits = epr_socket.create_keep(self._num_pairs)
+                else:
+                    qubits = epr_socket.recv_keep(self._num_pairs)
+                results = [q.measure() for q in qubits]
+                yield from conn.flush()
+                outcomes.append([int(r) for r in results])
+                continue
+
+            array = conn.new_array(self._num_pairs)
+
+            def post_routine(conn, q, pair):
+                q.measure(array.get_future_index(pair))
+
+            if self._create:
+                epr_socket.create_keep(
+                    self._num_pairs,
+                    post_routine=post_routine,
+                    sequential=self._sequential,
+                )
+            else:
+                epr_socket.recv_keep(
+                    self._num_pairs,
+                    post_routine=post_routine,
+                    sequential=self._sequential,
+                )
+            yield from conn.flush()
+            outcomes.append(
+                [int(array.get_future_index(i)) for i in range(self._num_pairs)]
+            )
+
+        return {"outcomes": outcomes}
+
+
+class CreateThenReceiveProgram(Program):
+    """Creates a pair with a peer and then receives a pair from it, in a single
+    subroutine, and measures both pairs."""
+
+    def __init__(self, peer: str) -> None:
+        self._peer = peer
+
+    @property
+    def meta(self) -> ProgramMeta:
+        return ProgramMeta(
+            name="create_then_receive",
+            csockets=[self._peer],
+            epr_sockets=[self._peer],
+            max_qubits=2,
+        )
+
+    def run(
+        self, context: ProgramContext
+    ) -> Generator[EventExpression, None, Dict[str, Any]]:
+        conn = context.connection
+        epr_socket = context.epr_sockets[self._peer]
+
+        [created] = epr_socket.create_keep(1)
+        [received] = epr_socket.recv_keep(1)
+        m_created = created.measure()
+        m_received = received.measure()
+        yield from conn.flush()
+        return {"outcomes": [[int(m_created), int(m_received)]]}
+
+
+class TestNetstackTwoNodes(unittest.TestCase):
+    def setUp(self) -> None:
+        ns.sim_reset()
+        self._sink = RingBufferSink()
+        Tracer.add_sink(self._sink)
+
+    def tearDown(self) -> None:
+        Tracer.clear_sinks()
+
+    def _run(
+        self,
+        prog_alice: Program,
+        prog_bob: Program,
+        num_qubits: int = 2,
+        bob_options: Optional[Dict[str, Any]] = None,
+        **stack_options: Any,
+    ) -> StackNetwork:
+        """Run programs on Alice and Bob, which have generic quantum devices with
+        `num_qubits` qubits and stack configurations with `stack_options`. Bob's
+        configuration can override options with `bob_options`."""
+        qdevice_cfg = GenericQDeviceConfig.perfect_config()
+        qdevice_cfg.num_qubits = num_qubits
+        stacks = [
+            StackConfig(
+                name="Alice",
+                qdevice_typ="generic",
+                qdevice_cfg=qdevice_cfg,
+                **stack_options,
+            ),
+            StackConfig(
+                name="Bob",
+                qdevice_typ="generic",
+                qdevice_cfg=qdevice_cfg,
+                **{**stack_options, **(bob_options or {})},
+            ),
+        ]
+        link = LinkConfig(
+            stack1="Alice",
+            stack2="Bob",
+            typ="depolarise",
+            cfg=DepolariseLinkConfig(fidelity=1, prob_success=0.5, t_cycle=10),
+        )
+        config = StackNetworkConfig(stacks=stacks, links=[link])
+
+        network = _setup_network(_convert_stack_network_config(config))
+        _configure_stacks(network, stacks)
+        network.stacks["Alice"].host.enqueue_program(prog_alice)
+        network.stacks["Bob"].host.enqueue_program(prog_bob)
+        self._results = _run(network)
+        return network
+
+    def _outcomes(self, node_index: int) -> List[List[int]]:
+        return self._results[node_index][0]["outcomes"]
+
+    def _records(self, component: str, event: str) -> List[TraceRecord]:
+        return [
+            record
+            for record in self._sink.records
+            if record[1].startswith(component) and record[2] == event
+        ]
+
+    def _assert_no_qubits_allocated(self, network: StackNetwork) -> None:
+        for stack in network.stacks.values():
+            memory = stack.qnos.physical_memory
+            assert memory.free_comm_qubit_count == memory.comm_qubit_count
+
+    def test_pipelined_ck(self):
+        num_pairs = 6
+        network = self._run(
+            EprProgram("Bob", create=True, num_pairs=num_pairs),
+            EprProgram("Alice", create=False, num_pairs=num_pairs),
+            num_qubits=3,
+            max_pipelined_pairs=2,
+        )
+
+        # Pairs were generated two at a time.
+        in_flight = [r[3]["in_flight"] for r in self._records("Netstack", "egp_put")]
+        assert max(in_flight) == 2
+
+        # Pairs were delivered in order, each to its own slot of the result array.
+        for node in ["Alice", "Bob"]:
+            delivered = self._records(f"Netstack({node}", "ck_pair_delivered")
+            assert [r[3]["pair_index"] for r in delivered] == list(range(num_pairs))
+            assert [r[0] for r in delivered] == sorted(r[0] for r in delivered)
+
+        # Each slot holds a qubit of the same pair on both nodes.
+        assert self._outcomes(0) == self._outcomes(1)
+        self._assert_no_qubits_allocated(network)
+
+    def test_pipelined_ck_without_free_qubits(self):
+        # More pairs are requested than there are communication qubits, so putting
+        # requests to the EGP stops until the application frees a qubit.
+        num_pairs = 5
+        network = self._run(
+            EprProgram("Bob", create=True, num_pairs=num_pairs),
+            EprProgram("Alice", create=False, num_pairs=num_pairs),
+            num_qubits=2,
+            max_pipelined_pairs=None,
+        )
+
+        puts = self._records("Netstack(Alice", "egp_put")
+        assert len(puts) == num_pairs
+        assert max(r[3]["in_flight"] for r in puts) == 2
+
+        assert self._outcomes(0) == self._outcomes(1)
+        self._assert_no_qubits_allocated(network)
+
+    def test_sequential_ck_not_pipelined(self):
+        # All pairs go to the same virtual qubit, so a pair can only be delivered
+        # after the application measured the previous one.
+        num_pairs = 4
+        network = self._run(
+            EprProgram("Bob", create=True, num_pairs=num_pairs, sequential=True),
+            EprProgram("Alice", create=False, num_pairs=num_pairs, sequential=True),
+            num_qubits=3,
+            max_pipelined_pairs=None,
+        )
+
+        in_flight = [r[3]["in_flight"] for r in self._records("Netstack", "egp_put")]
+        assert in_flight == [1] * (2 * num_pairs)
+
+        assert self._outcomes(0) == self._outcomes(1)
+        self._assert_no_qubits_allocated(network)
+
+    def test_md_chunked(self):
+        num_pairs = 5
+        network = self._run(
+            EprProgram("Bob", create=True, num_pairs=num_pairs, measure_directly=True),
+            EprProgram(
+                "Alice", create=False, num_pairs=num_pairs, measure_directly=True
+            ),
+            md_result_chunk_size=2,
+        )
+
+        for node in ["Alice", "Bob"]:
+            delivered = self._records(f"Netstack({node}", "md_pair_delivered")
+            assert [r[3]["pair_index"] for r in delivered] == list(range(num_pairs))
+
+        # The results of each pair are at the offset of that pair on both nodes.
+        assert self._outcomes(0) == self._outcomes(1)
+        self._assert_no_qubits_allocated(network)
+
+    def _assert_pool_size(self, network: StackNetwork, size: int) -> None:
+        alice = network.stacks["Alice"]
+        bob = network.stacks["Bob"]
+        assert alice.qnos.netstack.num_pooled_pairs(bob.node.ID) == size
+        assert bob.qnos.netstack.num_pooled_pairs(alice.node.ID) == size
+
+    def test_pair_pool(self):
+        network = self._run(
+            EprProgram("Bob", create=True, num_pairs=2, num_rounds=2),
+            EprProgram("Alice", create=False, num_pairs=2, num_rounds=2),
+            num_qubits=3,
+            pair_pool_size=1,
+        )
+
+        for node in ["Alice", "Bob"]:
+            taken = self._records(f"Netstack({node}", "pool_pair_taken")
+            added = self._records(f"Netstack({node}", "pool_pair_added")
+            # The pool was filled before the first request, which took a pair from
+            # it and generated the other one.
+            assert len(taken) >= 1
+            assert added[0][0] <= taken[0][0]
+            # The pool was refilled after each pair that was taken from it.
+            assert len(added) == len(taken) + 1
+
+        # Pooled pairs are served to the same request on both nodes.
+        assert self._outcomes(0) == self._outcomes(1)
+        self._assert_pool_size(network, 1)
+
+    def test_pair_pool_with_md(self):
+        # The pool holds all but one communication qubit, which the measure
+        # directly request has to share between its pairs.
+        network = self._run(
+            EprProgram("Bob", create=True, num_pairs=3, measure_directly=True),
+            EprProgram("Alice", create=False, num_pairs=3, measure_directly=True),
+            num_qubits=3,
+            pair_pool_size=2,
+        )
+
+        assert len(self._records("Netstack", "pool_pair_taken")) == 0
+        assert self._outcomes(0) == self._outcomes(1)
+        self._assert_pool_size(network, 2)
+
+    def test_pair_pool_with_sequential_ck(self):
+        # All pairs of a sequential request go to the same virtual qubit, so only
+        # the first pair may be taken from the pool, even if it holds more.
+        num_pairs = 3
+        network = self._run(
+            EprProgram("Bob", create=True, num_pairs=num_pairs, sequential=True),
+            EprProgram("Alice", create=False, num_pairs=num_pairs, sequential=True),
+            num_qubits=3,
+            pair_pool_size=2,
+        )
+
+        for node in ["Alice", "Bob"]:
+            [request] = self._records(f"Netstack({node}", "ck_request")
+            assert request[3]["num_pooled"] <= 1
+            assert len(self._records(f"Netstack({node}", "pool_pair_taken")) <= 1
+            delivered = self._records(f"Netstack({node}", "ck_pair_delivered")
+            assert [r[3]["pair_index"] for r in delivered] == list(range(num_pairs))
+
+        # Every pair was measured, and no qubit is held apart from the pool.
+        assert len(self._outcomes(0)[0]) == num_pairs
+        assert self._outcomes(0) == self._outcomes(1)
+        self._assert_pool_size(network, 2)
+        for stack in network.stacks.values():
+            memory = stack.qnos.physical_memory
+            assert memory.free_comm_qubit_count == memory.comm_qubit_count - 2
+
+    def test_create_then_receive_on_both_nodes(self):
+        # With scoreboarding, the processors issue the receive request without
+        # waiting for the create request, so both nodes have a create request for
+        # the other node queued before a receive request.
+        network = self._run(
+            CreateThenReceiveProgram("Bob"),
+            CreateThenReceiveProgram("Alice"),
+            scoreboarding=True,
+        )
+
+        for node in ["Alice", "Bob"]:
+            assert len(self._records(f"Netstack({node}", "request_done")) == 2
+
+        # The pair that Alice created is the pair that Bob received, and vice versa.
+        [[alice_created, alice_received]] = self._outcomes(0)
+        [[bob_created, bob_received]] = self._outcomes(1)
+        assert alice_created == bob_received
+        assert alice_received == bob_created
+        self._assert_no_qubits_allocated(network)
+
+    def test_session_mode_with_delayed_receiver(self):
+        num_rounds = 4
+        network = self._run(
+            EprProgram("Bob", create=True, num_pairs=1, num_rounds=num_rounds),
+            EprProgram("Alice", create=False, num_pairs=1, num_rounds=num_rounds),
+            session_mode=True,
+            bob_options={"host_latency": 1000},
+        )
+
+        # After the first request, Alice starts generating without waiting for Bob,
+        # whose requests reach his network stack later.
+        requests_alice = self._records("Netstack(Alice", "ck_request")
+        requests_bob = self._records("Netstack(Bob", "ck_request")
+        assert len(requests_alice) == len(requests_bob) == num_rounds
+        for request_alice, request_bob in zip(requests_alice[1:], requests_bob[1:]):
+            assert request_alice[0] < request_bob[0]
+
+        # Bob matched each request with Alice's request of the same round.
+        assert self._outcomes(0) == self._outcomes(1)
+        self._assert_no_qubits_allocated(network)
+
+    def test_processor_notified_once_per_time(self):
+        num_pairs = 4
+        self._run(
+            EprProgram("Bob", create=True, num_pairs=num_pairs),
+            EprProgram(
+                "Alice",
+                create=False,
+                num_pairs=num_pairs,
+                measure_on_delivery=False,
+            ),
+            num_qubits=num_pairs,
+            max_pipelined_pairs=None,
+        )
+
+        delivered = self._records("Netstack(Alice", "ck_pair_delivered")
+        assert len(delivered) == num_pairs
+        delivery_times = {r[0] for r in delivered}
+
+        # Pairs that are delivered at the same time lead to a single notification.
+        notified = [r[0] for r in self._records("Netstack(Alice", "processor_notified")]
+        assert sorted(notified) == sorted(delivery_times)
+
+        # The processor waits for the whole array at once, and only wakes up when
+        # it is notified.
+        wake_ups = self._records("GenericProcessor(Alice", "wait_all")
+        assert 1 <= len(wake_ups) <= len(notified)
+        assert self._outcomes(0) == self._outcomes(1)
+
+    def _run_with_seed(self, direct_channels: bool) -> List[TraceRecord]:
+        """Run the same CK and MD rounds with a fixed random state and return the
+        messages received by the handlers and network stacks."""
+        ns.sim_reset()
+        ns.set_random_state(seed=42)
+        self._sink.clear()
+        self._run(
+            EprProgram("Bob", create=True, num_pairs=3, num_rounds=2),
+            EprProgram("Alice", create=False, num_pairs=3, num_rounds=2),
+            num_qubits=3,
+            direct_channels=direct_channels,
+        )
+        return [
+            (time, component, event, str(fields["msg"]))
+            for time, component, event, fields in self._sink.records
+            if event in ["host_msg", "processor_msg"]
+        ]
+
+    def test_direct_channels(self):
+        msgs_ports = self._run_with_seed(direct_channels=False)
+        outcomes_ports = [self._outcomes(0), self._outcomes(1)]
+        msgs_direct = self._run_with_seed(direct_channels=True)
+        outcomes_direct = [self._outcomes(0), self._outcomes(1)]
+
+        # Direct channels deliver the same messages, in the same order and at the
+        # same times, as ports.
+        assert len(msgs_ports) > 0
+        assert msgs_direct == msgs_ports
+        assert outcomes_direct == outcomes_ports
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,12 @@
 import unittest
-from typing import Dict, Generator
+from typing import Any, Dict, Generator, List, Tuple
 
 import netsquid as ns
 from netqasm.lang.instr.flavour import NVFlavour
 from netqasm.lang.parsing import parse_text_subroutine
+from netqasm.sdk.qubit import Qubit
 from netsquid.components import QuantumProcessor
+from netsquid.components.instructions import INSTR_ROT_X
 from netsquid.qubits import ketstates, qubitapi
 from netsquid_netbuilder.modules.qdevices.nv import NVQDeviceConfig
 from netsquid_netbuilder.modules.qlinks.depolarise import DepolariseQLinkConfig
@@ -14,9 +16,19 @@ from netsquid_netbuilder.util.network_generation import (
 )
 
 from pydynaa import EventExpression
-from squidasm.run.stack.run import _run, _setup_network
+from squidasm.run.stack.config import (
+    DepolariseLinkConfig,
+    GenericQDeviceConfig,
+    LinkConfig,
+    StackConfig,
+    StackNetworkConfig,
+    _convert_stack_network_config,
+)
+from squidasm.run.stack.run import _configure_stacks, _run, _setup_network
 from squidasm.sim.stack.common import AppMemory
-from squidasm.sim.stack.processor import NVProcessor
+from squidasm.sim.stack.processor import GenericProcessor, NVProcessor
+from squidasm.sim.stack.program import Program, ProgramContext, ProgramMeta
+from squidasm.sim.stack.trace import RingBufferSink, Tracer, TraceRecord
 
 
 class TestProcessorTwoNodes(unittest.TestCase):
@@ -121,6 +133,7 @@ class TestProcessorSingleNode(unittest.TestCase):
         network_cfg = create_single_node_network(qdevice_typ="nv", qdevice_cfg=config)
         self.network = _setup_network(network_cfg)
         self._alice = self.network.stacks["Alice"]
+        self._check_processor = None
 
     def tearDown(self) -> None:
         _run(self.network)
@@ -129,6 +142,8 @@ class TestProcessorSingleNode(unittest.TestCase):
             self._check_qmem(self._alice.qdevice)
         if self._check_cmem:
             self._check_cmem(self._alice.qnos.app_memories)
+        if self._check_processor:
+            self._check_processor()
 
     def test0(self):
         APP_ID = 0
@@ -460,6 +475,372 @@ class TestProcessorSingleNode(unittest.TestCase):
             self._alice.qnos_comp.processor_comp, self._alice.qnos
         )
 
+    def _test_qubit_placement(self, qubit_placement: bool) -> NVProcessor:
+        APP_ID = 0
+
+        # Virtual qubit 1 is only measured, so it can be placed on the electron.
+        SUBRT = f"""
+        # NETQASM 1.0
+        # APPID {APP_ID}
+        set Q1 1
+        qalloc Q1
+        init Q1
+        rot_y Q1 16 4
+        meas Q1 M1
+        qfree Q1
+        """
+
+        class AliceProcessor(NVProcessor):
+            def run(self) -> Generator[EventExpression, None, None]:
+                subroutine = parse_text_subroutine(SUBRT, flavour=NVFlavour())
+                yield from self.execute_subroutine(subroutine)
+
+        def check_cmem(app_mems_alice: Dict[int, AppMemory]) -> None:
+            mem = app_mems_alice[0]
+            outcome = mem.get_reg_value("M1")
+            assert outcome == 1
+
+        self._check_qmem = None
+        self._check_cmem = check_cmem
+
+        self._alice.qnos.app_memories[APP_ID] = AppMemory(APP_ID, 2)
+        processor = AliceProcessor(
+            self._alice.qnos_comp.processor_comp, self._alice.qnos
+        )
+        processor.qubit_placement = qubit_placement
+        self._alice.qnos.processor = processor
+        return processor
+
+    def test_qubit_placement(self):
+        processor = self._test_qubit_placement(qubit_placement=True)
+
+        def check_processor() -> None:
+            assert processor.num_moves == 0
+            assert processor.num_moves_avoided == 1
+
+        self._check_processor = check_processor
+
+    def test_no_qubit_placement(self):
+        processor = self._test_qubit_placement(qubit_placement=False)
+
+        def check_processor() -> None:
+            assert processor.num_moves == 1
+            assert processor.num_moves_avoided == 0
+
+        self._check_processor = check_processor
+
+    def test_qubit_placement_with_pending_epr(self):
+        APP_ID = 0
+
+        # Virtual qubit 1 is only measured, but the entanglement request is still
+        # in progress the first time it is allocated.
+        SUBRT_1 = f"""
+        # NETQASM 1.0
+        # APPID {APP_ID}
+        set R0 0
+        set R1 1
+        set R2 10
+        array R2 @0
+        create_epr R1 R0 R0 R0 R0
+        set Q1 1
+        qalloc Q1
+        init Q1
+        meas Q1 M1
+        qfree Q1
+        """
+
+        SUBRT_2 = f"""
+        # NETQASM 1.0
+        # APPID {APP_ID}
+        set Q1 1
+        qalloc Q1
+        init Q1
+        meas Q1 M1
+        qfree Q1
+        """
+
+        class AliceProcessor(NVProcessor):
+            def _send_netstack_msg(self, msg: str) -> None:
+                # There is no peer, so the request is never handled.
+                pass
+
+            def run(self) -> Generator[EventExpression, None, None]:
+                subroutine = parse_text_subroutine(SUBRT_1, flavour=NVFlavour())
+                yield from self.execute_subroutine(subroutine)
+                assert self.num_moves == 1
+                assert self.num_moves_avoided == 0
+
+                # Complete the request by writing its whole result array.
+                for i in range(10):
+                    self.app_memories[APP_ID].set_array_value(0, i, 0)
+                subroutine = parse_text_subroutine(SUBRT_2, flavour=NVFlavour())
+                yield from self.execute_subroutine(subroutine)
+
+        self._check_qmem = None
+        self._check_cmem = None
+
+        self._alice.qnos.app_memories[APP_ID] = AppMemory(APP_ID, 2)
+        processor = AliceProcessor(
+            self._alice.qnos_comp.processor_comp, self._alice.qnos
+        )
+        processor.qubit_placement = True
+        self._alice.qnos.processor = processor
+
+        def check_processor() -> None:
+            assert processor.num_moves == 1
+            assert processor.num_moves_avoided == 1
+            assert processor._epr_result_arrays == {APP_ID: set()}
+
+        self._check_processor = check_processor
+
+    def test_programs_reused(self):
+        APP_ID = 0
+
+        # Repeated rotations of the electron, and two measurements of a carbon
+        # that each move it to the electron first.
+        SUBRT = f"""
+        # NETQASM 1.0
+        # APPID {APP_ID}
+        set Q0 0
+        qalloc Q0
+        init Q0
+        rot_x Q0 1 1
+        rot_x Q0 1 1
+        rot_x Q0 1 2
+        meas Q0 M0
+        qfree Q0
+        set Q1 1
+        qalloc Q1
+        init Q1
+        meas Q1 M1
+        qfree Q1
+        qalloc Q1
+        init Q1
+        meas Q1 M2
+        qfree Q1
+        """
+
+        class AliceProcessor(NVProcessor):
+            def run(self) -> Generator[EventExpression, None, None]:
+                subroutine = parse_text_subroutine(SUBRT, flavour=NVFlavour())
+                yield from self.execute_subroutine(subroutine)
+
+        self._check_qmem = None
+        self._check_cmem = None
+
+        self._alice.qnos.app_memories[APP_ID] = AppMemory(APP_ID, 2)
+        processor = AliceProcessor(
+            self._alice.qnos_comp.processor_comp, self._alice.qnos
+        )
+        processor.qubit_placement = False
+        self._alice.qnos.processor = processor
+
+        # Record the programs that are executed on the quantum device.
+        executed = []
+        qdevice = processor.qdevice
+        execute_program = qdevice.execute_program
+
+        def record_program(prog, *args, **kwargs):
+            executed.append(prog)
+            return execute_program(prog, *args, **kwargs)
+
+        qdevice.execute_program = record_program
+
+        def check_processor() -> None:
+            rot_x = processor._gate_programs[(INSTR_ROT_X, (0,), (1, 1))]
+            assert sum(prog is rot_x for prog in executed) == 2
+            assert len(processor._gate_programs) == 2
+
+            assert processor.num_moves == 2
+            [move] = processor._carbon_to_electron_progs.values()
+            assert sum(prog is move for prog in executed) == 2
+
+        self._check_processor = check_processor
+
+
+class TestParallelGates(unittest.TestCase):
+    # Six gates that can be executed in three layers.
+    SUBRT = """
+    # NETQASM 1.0
+    # APPID 0
+    set Q0 0
+    set Q1 1
+    set Q2 2
+    qalloc Q0
+    qalloc Q1
+    qalloc Q2
+    init Q0
+    init Q1
+    init Q2
+    x Q0
+    h Q1
+    cnot Q0 Q2
+    z Q1
+    h Q1
+    x Q2
+    meas Q0 M0
+    meas Q1 M1
+    meas Q2 M2
+    """
+
+    def tearDown(self) -> None:
+        Tracer.clear_sinks()
+
+    def _run(self, parallel_gates: bool) -> Tuple[List[int], List[TraceRecord]]:
+        ns.sim_reset()
+        config = GenericQDeviceConfig.perfect_config()
+        config.num_qubits = 3
+        network_cfg = create_single_node_network(
+            qdevice_typ="generic", qdevice_cfg=config
+        )
+        network = _setup_network(network_cfg)
+        alice = network.stacks["Alice"]
+
+        text = self.SUBRT
+
+        class AliceProcessor(GenericProcessor):
+            def run(self) -> Generator[EventExpression, None, None]:
+                subroutine = parse_text_subroutine(text)
+                yield from self.execute_subroutine(subroutine)
+
+        alice.qnos.app_memories[0] = AppMemory(0, 3)
+        alice.qnos.processor = AliceProcessor(
+            alice.qnos_comp.processor_comp, alice.qnos
+        )
+        alice.qnos.processor.parallel_gates = parallel_gates
+
+        sink = RingBufferSink()
+        Tracer.add_sink(sink)
+        _run(network)
+        Tracer.remove_sink(sink)
+
+        mem = alice.qnos.app_memories[0]
+        outcomes = [mem.get_reg_value(f"M{i}") for i in range(3)]
+        return outcomes, sink.records
+
+    def test_same_results_as_serial(self):
+        serial_outcomes, serial_records = self._run(parallel_gates=False)
+        parallel_outcomes, parallel_records = self._run(parallel_gates=True)
+
+        assert serial_outcomes == [1, 1, 0]
+        assert parallel_outcomes == serial_outcomes
+
+        assert all(r[2] != "gate_layers" for r in serial_records)
+        [layers] = [r[3] for r in parallel_records if r[2] == "gate_layers"]
+        assert layers == {"num_gates": 6, "num_layers": 3}
+
+
+class TestScoreboarding(unittest.TestCase):
+    def setUp(self) -> None:
+        ns.sim_reset()
+        self._sink = RingBufferSink()
+        Tracer.add_sink(self._sink)
+
+        qdevice_cfg = GenericQDeviceConfig.perfect_config()
+        qdevice_cfg.num_qubits = 2
+        stacks = [
+            StackConfig(
+                name=name,
+                qdevice_typ="generic",
+                qdevice_cfg=qdevice_cfg,
+                scoreboarding=True,
+            )
+            for name in ["Alice", "Bob"]
+        ]
+        # Generating a pair takes much longer than local gates and measurements.
+        link = LinkConfig(
+            stack1="Alice",
+            stack2="Bob",
+            typ="depolarise",
+            cfg=DepolariseLinkConfig(fidelity=1, prob_success=1, t_cycle=1e9),
+        )
+        config = StackNetworkConfig(stacks=stacks, links=[link])
+        self.network = _setup_network(_convert_stack_network_config(config))
+        _configure_stacks(self.network, stacks)
+
+        self._alice = self.network.stacks["Alice"]
+        self._bob = self.network.stacks["Bob"]
+        # don't clear app memory so that the processor state can be inspected
+        self._alice.qnos.handler.should_clear_memory = False
+
+    def tearDown(self) -> None:
+        Tracer.clear_sinks()
+
+    def _records(self, component: str, event: str):
+        return [
+            record
+            for record in self._sink.records
+            if record[1].startswith(component) and record[2] == event
+        ]
+
+    def test_independent_instructions_proceed(self):
+        class AliceProgram(Program):
+            @property
+            def meta(self) -> ProgramMeta:
+                return ProgramMeta(
+                    name="alice_program",
+                    csockets=["Bob"],
+                    epr_sockets=["Bob"],
+                    max_qubits=2,
+                )
+
+            def run(
+                self, context: ProgramContext
+            ) -> Generator[EventExpression, None, Dict[str, Any]]:
+                conn = context.connection
+                local = Qubit(conn)
+                epr = context.epr_sockets["Bob"].create_keep()[0]
+                # Does not depend on the pair.
+                local.X()
+                m_local = local.measure()
+                # Depends on the pair.
+                m_epr = epr.measure()
+                yield from conn.flush()
+                return {"m_local": int(m_local), "m_epr": int(m_epr)}
+
+        class BobProgram(Program):
+            @property
+            def meta(self) -> ProgramMeta:
+                return ProgramMeta(
+                    name="bob_program",
+                    csockets=["Alice"],
+                    epr_sockets=["Alice"],
+                    max_qubits=1,
+                )
+
+            def run(
+                self, context: ProgramContext
+            ) -> Generator[EventExpression, None, Dict[str, Any]]:
+                conn = context.connection
+                m_epr = context.epr_sockets["Alice"].recv_keep()[0].measure()
+                yield from conn.flush()
+                return {"m_epr": int(m_epr)}
+
+        self._alice.host.enqueue_program(AliceProgram())
+        self._bob.host.enqueue_program(BobProgram())
+        results = _run(self.network)
+
+        assert len(self._records("GenericProcessor(Alice", "wait_deferred")) == 1
+        [delivered] = self._records("Netstack(Alice", "ck_pair_delivered")
+        epr_phys_id = delivered[3]["phys_id"]
+        meas_times = {
+            r[3]["phys_id"]: r[0]
+            for r in self._records("GenericProcessor(Alice", "meas")
+        }
+
+        # The local qubit was measured before the pair was delivered, the EPR
+        # qubit only after it stalled until delivery.
+        local_phys_id = next(i for i in meas_times if i != epr_phys_id)
+        assert meas_times[local_phys_id] < delivered[0]
+        assert len(self._records("GenericProcessor(Alice", "stall")) > 0
+        assert meas_times[epr_phys_id] >= delivered[0]
+
+        assert results[0][0]["m_local"] == 1
+        assert results[0][0]["m_epr"] == results[1][0]["m_epr"]
+
+        # The completed request is no longer tracked.
+        assert self._alice.qnos.processor._epr_qubit_arrays == {}
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+
+import netsquid as ns
+
+from squidasm.sim.stack.trace import RingBufferSink, Tracer
+
+
+class TestTracer(unittest.TestCase):
+    def setUp(self) -> None:
+        ns.sim_reset()
+        Tracer.clear_sinks()
+
+    def tearDown(self) -> None:
+        Tracer.clear_sinks()
+
+    def test_enabled(self):
+        assert not Tracer("Processor(alice)").enabled
+
+        sink = RingBufferSink()
+        Tracer.add_sink(sink)
+        assert Tracer("Processor(alice)").enabled
+
+        Tracer.remove_sink(sink)
+        assert not Tracer("Processor(alice)").enabled
+
+    def test_ring_buffer(self):
+        sink = RingBufferSink(capacity=2)
+        Tracer.add_sink(sink)
+        tracer = Tracer("Netstack(alice)")
+        for i in range(3):
+            tracer.trace("egp_put", pair_index=i)
+
+        assert sink.records == [
+            (0, "Netstack(alice)", "egp_put", {"pair_index": 1}),
+            (0, "Netstack(alice)", "egp_put", {"pair_index": 2}),
+        ]
+
+        with self.assertRaises(ValueError):
+            RingBufferSink(capacity=0)
+
+    def test_dump(self):
+        sink = RingBufferSink()
+        Tracer.add_sink(sink)
+        Tracer("Netstack(alice)").trace("request_done", peer_id=1, duration=5.0)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trace.bin")
+            sink.dump(path)
+            assert RingBufferSink.load(path) == sink.records
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,7 @@
+import csv
+import json
+import os
+import tempfile
 import unittest
 from dataclasses import dataclass, field
 from typing import Any, List
@@ -275,6 +279,44 @@ class TestEPR(unittest.TestCase):
                 calculate_fidelity_epr(qubit_state, BellIndex.PHI_PLUS), 1, delta=1e-4
             )
 
+    def test_metrics_export(self):
+        """Test that run writes the metrics of all iterations to the given files"""
+        num_req = 2
+        num_times = 3
+
+        network_cfg = create_2_node_network(
+            qlink_typ="perfect",
+            qlink_cfg=PerfectQLinkConfig(state_delay=100),
+            clink_typ="instant",
+        )
+        alice_req = [EPRRequest("Bob", is_create=True) for _ in range(num_req)]
+        bob_req = [EPRRequest("Alice", is_create=False) for _ in range(num_req)]
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            json_path = os.path.join(tmp_dir, "metrics.json")
+            csv_path = os.path.join(tmp_dir, "metrics.csv")
+            run(
+                config=network_cfg,
+                programs={
+                    "Alice": EPRKeepProgram("Alice", alice_req),
+                    "Bob": EPRKeepProgram("Bob", bob_req),
+                },
+                num_times=num_times,
+                metrics_json=json_path,
+                metrics_csv=csv_path,
+            )
+
+            with open(json_path) as f:
+                data = json.load(f)
+            with open(csv_path) as f:
+                rows = list(csv.DictReader(f))
+
+        links = {(link["node"], link["peer"]): link for link in data["links"]}
+        self.assertEqual(set(links), {("Alice", "Bob"), ("Bob", "Alice")})
+        for link in links.values():
+            self.assertEqual(link["num_pairs"], num_req * num_times)
+        self.assertEqual(len(rows), 4)
+
     def test_depolarise_link(self):
         """Test that depolarise link with perfect settings generates a perfect phi+ state
         and after the exact delay specified"""
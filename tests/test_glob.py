@@ -0,0 +1,32 @@
+import threading
+import unittest
+
+from squidasm.sim.glob import (
+    get_running_backend,
+    pop_current_backend,
+    put_current_backend,
+)
+
+
+class TestRunningBackend(unittest.TestCase):
+    def tearDown(self) -> None:
+        pop_current_backend()
+
+    def test_timeout(self):
+        assert get_running_backend(block=False) is None
+        assert get_running_backend(timeout=0.01) is None
+
+    def test_wait_for_backend(self):
+        backend = object()
+        results = []
+        waiter = threading.Thread(
+            target=lambda: results.append(get_running_backend(timeout=10))
+        )
+        waiter.start()
+        put_current_backend(backend)
+        waiter.join()
+        assert results == [backend]
+
+
+if __name__ == "__main__":
+    unittest.main()
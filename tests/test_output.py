@@ -0,0 +1,111 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from netqasm.lang.instr import core, vanilla
+from netqasm.lang.operand import Register, RegisterName
+
+from squidasm.nqasm.output import InstrLogger
+
+Q0 = Register(RegisterName.Q, 0)
+M0 = Register(RegisterName.M, 0)
+
+
+class TestInstrLogger(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        executor = SimpleNamespace(_node=SimpleNamespace(name="Alice"))
+        self.logger = InstrLogger(os.path.join(self._tmp.name, "log.yaml"), executor)
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def _captured(self, instrs):
+        """Return for each instruction whether its qubit groups were captured."""
+        captured = []
+        with mock.patch(
+            "squidasm.nqasm.output.QubitInfo.get_qubit_groups", return_value={}
+        ) as get_groups:
+            for instr in instrs:
+                self.logger._current_instr = instr
+                self.logger._get_qubit_groups()
+                captured.append(get_groups.call_count > 0)
+                if get_groups.call_count > 0:
+                    get_groups.assert_called_with(as_arrays=True)
+                get_groups.reset_mock()
+        return captured
+
+    def test_capture_every_instruction(self):
+        h = vanilla.GateHInstruction(reg=Q0)
+        assert self._captured([h] * 3) == [True, True, True]
+
+    def test_capture_every_n(self):
+        self.logger.set_state_capture(every=3)
+        h = vanilla.GateHInstruction(reg=Q0)
+        assert self._captured([h] * 7) == [True, False, False] * 2 + [True]
+
+    def test_capture_at_instructions(self):
+        self.logger.set_state_capture(every=2, at_instructions=(core.MeasInstruction,))
+        h = vanilla.GateHInstruction(reg=Q0)
+        meas = core.MeasInstruction(reg0=Q0, reg1=M0)
+        assert self._captured([h, meas, h, h]) == [True, True, True, False]
+
+    def test_capture_none(self):
+        self.logger.set_state_capture(every=0)
+        h = vanilla.GateHInstruction(reg=Q0)
+        meas = core.MeasInstruction(reg0=Q0, reg1=M0)
+        assert self._captured([h, meas, h]) == [False, False, False]
+
+        self.logger.set_state_capture(every=0, at_instructions=(core.MeasInstruction,))
+        assert self._captured([h, meas, h]) == [False, True, False]
+
+    def test_capture_per_logger(self):
+        self.logger.set_state_capture(every=0)
+        other = InstrLogger(
+            os.path.join(self._tmp.name, "other.yaml"), self.logger._executor
+        )
+        assert other._capture_every == 1
+        assert other._capture_at == ()
+
+    def test_negative_every(self):
+        with self.assertRaises(ValueError):
+            self.logger.set_state_capture(every=-1)
+
+    def test_qubit_updates(self):
+        instrs = [
+            (core.InitInstruction(reg=Q0), True),
+            (vanilla.GateHInstruction(reg=Q0), None),
+            (core.MeasInstruction(reg0=Q0, reg1=M0), False),
+            (core.QFreeInstruction(reg=Q0), False),
+        ]
+        with mock.patch(
+            "squidasm.nqasm.output.QubitInfo.update_qubits_used"
+        ) as update_qubits_used:
+            for instr, used in instrs:
+                self.logger._update_qubits(
+                    subroutine_id=0, instr=instr, qubit_ids=[0, 1]
+                )
+                assert InstrLogger._QUBIT_UPDATES[type(instr)] is used
+                if used is None:
+                    update_qubits_used.assert_not_called()
+                else:
+                    assert update_qubits_used.call_args_list == [
+                        mock.call("Alice", 0, used),
+                        mock.call("Alice", 1, used),
+                    ]
+                update_qubits_used.reset_mock()
+
+            # The cached classification is used for later instructions of a type.
+            with mock.patch.dict(
+                InstrLogger._QUBIT_UPDATES, {core.InitInstruction: False}
+            ):
+                self.logger._update_qubits(
+                    subroutine_id=0, instr=core.InitInstruction(reg=Q0), qubit_ids=[0]
+                )
+            update_qubits_used.assert_called_once_with("Alice", 0, False)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import threading
+import unittest
+
+from squidasm.sim.queues import QueueManager, TaskQueue
+
+
+class TestTaskQueue(unittest.TestCase):
+    def setUp(self) -> None:
+        self.queue = TaskQueue()
+
+    def _finish(self, item: bytes) -> None:
+        self.queue.put(item)
+        assert self.queue.get() == item
+        self.queue.task_done(item)
+
+    def test_join_finished_task(self):
+        self._finish(b"msg")
+        self.queue.join_task(b"msg")
+        assert self.queue.empty()
+
+    def test_join_blocks_until_done(self):
+        joined = threading.Event()
+        self.queue.put(b"msg")
+
+        def join():
+            self.queue.join_task(b"msg")
+            joined.set()
+
+        thread = threading.Thread(target=join)
+        thread.start()
+        assert not joined.wait(timeout=0.05)
+
+        assert self.queue.get() == b"msg"
+        self.queue.task_done(b"msg")
+        assert joined.wait(timeout=10)
+        thread.join()
+
+    def test_duplicate_messages(self):
+        joined = []
+        self._finish(b"msg")
+        self.queue.join_task(b"msg")
+
+        # A finished task is only joined once.
+        thread = threading.Thread(
+            target=lambda: joined.append(self.queue.join_task(b"msg"))
+        )
+        thread.start()
+        thread.join(timeout=0.05)
+        assert joined == []
+
+        self._finish(b"msg")
+        thread.join(timeout=10)
+        assert joined == [None]
+
+
+class TestWaitForItem(unittest.TestCase):
+    def tearDown(self) -> None:
+        QueueManager.destroy_queues()
+
+    def test_wait_for_item(self):
+        queues = [QueueManager.create_queue(name) for name in ["alice", "bob"]]
+        results = []
+        thread = threading.Thread(
+            target=lambda: results.append(QueueManager.wait_for_item(queues))
+        )
+        thread.start()
+        queues[1].put(b"msg")
+        thread.join(timeout=10)
+        assert results == [True]
+
+    def test_interrupt(self):
+        queue = QueueManager.create_queue("alice")
+        QueueManager.interrupt_wait()
+        assert not QueueManager.wait_for_item([queue])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from netqasm.logging.glob import get_netqasm_logger
+
+from squidasm.run.multithread.results import ResultsWriter
+
+
+class TestResultsWriter(unittest.TestCase):
+    def test_write_and_read(self):
+        rounds = [
+            {"app_alice": {"m": 0}, "app_bob": {"m": 0}},
+            {"app_alice": {"m": 1}, "app_bob": {"m": 1}},
+        ]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "results.jsonl")
+            writer = ResultsWriter(path)
+            for result in rounds:
+                writer.write(result)
+            # Rounds are readable before the writer is closed.
+            assert ResultsWriter.read(path) == rounds
+            writer.close()
+
+            assert writer.num_rounds == 2
+            assert ResultsWriter.read_round(path, 1) == rounds[1]
+            assert ResultsWriter.read_round(path, 2) is None
+
+    def test_numpy_values(self):
+        result = {"app_alice": {"m": np.int64(1), "ms": np.array([0, 1])}}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "results.jsonl")
+            writer = ResultsWriter(path)
+            writer.write(result)
+            writer.close()
+
+            assert ResultsWriter.read(path) == [{"app_alice": {"m": 1, "ms": [0, 1]}}]
+
+    def test_unserializable_values(self):
+        result = {"app_alice": {"s": {1}, "b": b"x", 1: (2, 3)}}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "results.jsonl")
+            writer = ResultsWriter(path)
+            with self.assertLogs(get_netqasm_logger(), level="WARNING"):
+                writer.write(result)
+            writer.close()
+
+            # Values that JSON cannot represent are written as their repr.
+            assert ResultsWriter.read(path) == [
+                {"app_alice": {"s": "{1}", "b": "b'x'", "1": [2, 3]}}
+            ]
+
+
+if __name__ == "__main__":
+    unittest.main()